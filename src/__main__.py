@@ -1,5 +1,9 @@
-from sys import path as sys_path
+from argparse import ArgumentParser, Namespace
+from contextlib import ExitStack
+from datetime import datetime
+from sys import path as sys_path, exit as sys_exit
 from pathlib import Path
+from signal import signal, SIGTERM
 
 
 if not __package__:
@@ -8,17 +12,185 @@ if not __package__:
     sys_path.insert(0, root_path)
 
 
+def parse_args() -> Namespace:
+    """Parse the command line arguments, the defaults are read from the .env file."""
+
+    from src.utils.constants import METRICS_CONFIG, PROFILE_CONFIG, WORKER_CONFIG
+
+    parser: ArgumentParser = ArgumentParser(prog="src")
+    parser.add_argument(
+        "--shard-index",
+        type=int,
+        default=WORKER_CONFIG["shard_index"],
+        help="index of this worker's shard (WORKER_SHARD_INDEX)",
+    )
+    parser.add_argument(
+        "--shard-count",
+        type=int,
+        default=WORKER_CONFIG["shard_count"],
+        help="number of worker shards partitioning the event ids (WORKER_SHARD_COUNT)",
+    )
+
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        default=PROFILE_CONFIG["enabled"],
+        help="write the cpu & memory profile reports of the run to logs/profiles/ (PROFILE)",
+    )
+
+    subparsers = parser.add_subparsers(dest="command")
+    backfill_parser: ArgumentParser = subparsers.add_parser(
+        "backfill",
+        help="search a past time range in chunks, an interrupted backfill resumes when it is run again",
+    )
+    backfill_parser.add_argument(
+        "--start",
+        type=datetime.fromisoformat,
+        required=True,
+        help="start time in the qradar console's time zone (e.g. 2025-07-01T00:00)",
+    )
+    backfill_parser.add_argument(
+        "--end",
+        type=datetime.fromisoformat,
+        required=True,
+        help="end time in the qradar console's time zone (e.g. 2025-07-15T00:00)",
+    )
+    backfill_parser.add_argument(
+        "--chunk-minutes",
+        type=int,
+        default=60,
+        help="length of each searched chunk in minutes (default: 60)",
+    )
+    backfill_parser.add_argument(
+        "--parallelism",
+        type=int,
+        default=2,
+        help="maximum number of chunks searched at the same time (default: 2)",
+    )
+
+    replay_parser: ArgumentParser = subparsers.add_parser(
+        "replay",
+        help="replay a captured search (QRADAR_CAPTURE_FOLDER) through the matcher and a stubbed redmine",
+    )
+    replay_parser.add_argument(
+        "capture_path", type=Path, help="capture file (.ndjson.zst or .ndjson.gz)"
+    )
+    replay_parser.add_argument(
+        "--output",
+        type=Path,
+        default=None,
+        help="JSON file to write the matched events per event id",
+    )
+
+    loadtest_parser: ArgumentParser = subparsers.add_parser(
+        "loadtest",
+        help="run the full flow against local qradar & redmine stand-ins and report the throughput",
+    )
+    loadtest_parser.add_argument(
+        "--runs", type=int, default=10, help="number of runs (default: 10)"
+    )
+    loadtest_parser.add_argument(
+        "--rows",
+        type=int,
+        default=1000,
+        help="number of rows returned by each search (default: 1000)",
+    )
+    loadtest_parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.005,
+        help="seconds added to each stand-in response (default: 0.005)",
+    )
+    loadtest_parser.add_argument(
+        "--search-seconds",
+        type=float,
+        default=0.5,
+        help="seconds until a stand-in search is completed (default: 0.5)",
+    )
+    loadtest_parser.add_argument(
+        "--output", type=Path, default=None, help="JSON file to write the report"
+    )
+
+    benchmark_parser: ArgumentParser = subparsers.add_parser(
+        "benchmark",
+        help="run the hot path benchmarks and fail if any of them regressed from the stored baselines",
+    )
+    benchmark_parser.add_argument(
+        "--repeat",
+        type=int,
+        default=5,
+        help="number of timed runs of each benchmark (default: 5)",
+    )
+    benchmark_parser.add_argument(
+        "--filter",
+        default=None,
+        help="run only the benchmarks whose name contains it",
+    )
+    benchmark_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=20,
+        help="maximum allowed slowdown from the baselines in percent (default: 20)",
+    )
+    benchmark_parser.add_argument(
+        "--baseline",
+        type=Path,
+        default=None,
+        help="baselines JSON file (default: src/benchmarks/baselines.json)",
+    )
+    benchmark_parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="write the results as the new baselines instead of comparing them",
+    )
+
+    daemon_parser: ArgumentParser = subparsers.add_parser(
+        "daemon",
+        help="run every QRADAR_QUERY_INTERVAL minutes in one process and serve the prometheus metrics",
+    )
+    daemon_parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=METRICS_CONFIG["port"],
+        help="port of the /metrics endpoint (METRICS_PORT, default: 9108)",
+    )
+
+    args: Namespace = parser.parse_args()
+    if not 0 <= args.shard_index < args.shard_count:
+        parser.error(
+            f"--shard-index must be between 0 and {args.shard_count - 1}, got {args.shard_index}"
+        )
+    if args.command == "backfill" and args.start >= args.end:
+        parser.error("--start must be before --end")
+    return args
+
+
 if __name__ == "__main__":
+    args: Namespace = parse_args()
+
     # setup logging configuration
     from src.utils.logger import setup_logger
 
     setup_logger()
 
+    # exit gracefully on docker stop, so the open qradar searches are deleted
+    signal(SIGTERM, lambda *_: sys_exit(143))
+
     # run main app
     from src.services.msteams.teams import MsTeams, log_message
     from src.utils.constants import ENV, DEFAULT_ENV
     from src.app import main, update_config_key
 
+    # profile the command's cpu time & memory allocations, the reports are written when it is finished
+    profile_stack: ExitStack = ExitStack()
+    if args.profile:
+        from src.utils.constants import PROFILE_CONFIG
+        from src.utils.profiling import profile_run
+
+        profile_stack.enter_context(
+            profile_run(name=args.command or "main", top_count=PROFILE_CONFIG["top_count"])
+        )
+
     try:
         # check if the environment is valid
         if ENV not in ["dev", "prod"]:
@@ -30,9 +202,70 @@ if __name__ == "__main__":
             update_config_key(key="ENV", value=ENV)
 
         log_message(mode="info", msg=f"running on ⊱ {ENV} ⊰ mode")
-        main()
+        if args.shard_count > 1:
+            log_message(
+                mode="info",
+                msg=f"running as shard ⊱ {args.shard_index}/{args.shard_count} ⊰",
+            )
+        if args.command == "backfill":
+            from src.backfill import run_backfill
+
+            run_backfill(
+                start=args.start,
+                end=args.end,
+                chunk_minutes=args.chunk_minutes,
+                parallelism=args.parallelism,
+                shard_index=args.shard_index,
+                shard_count=args.shard_count,
+            )
+        elif args.command == "replay":
+            from src.replay import run_replay
+
+            run_replay(capture_path=args.capture_path, output_path=args.output)
+        elif args.command == "loadtest":
+            from src.loadtest.loadtest import run_load_test
+
+            run_load_test(
+                runs=args.runs,
+                rows=args.rows,
+                latency=args.latency,
+                search_seconds=args.search_seconds,
+                output_path=args.output,
+            )
+        elif args.command == "benchmark":
+            from src.benchmarks.benchmarks import run_benchmarks, BASELINE_FILE_PATH
+
+            is_passed: bool = run_benchmarks(
+                repeat=args.repeat,
+                name_filter=args.filter,
+                threshold=args.threshold,
+                baseline_path=args.baseline or BASELINE_FILE_PATH,
+                save_baseline=args.save_baseline,
+            )
+            if not is_passed:
+                sys_exit(1)
+        elif args.command == "daemon":
+            from src.daemon import run_daemon
+
+            run_daemon(
+                shard_index=args.shard_index,
+                shard_count=args.shard_count,
+                metrics_port=args.metrics_port,
+            )
+        else:
+            main(shard_index=args.shard_index, shard_count=args.shard_count)
     except Exception as e:
         log_message(mode="critical", msg=f"unexpected error occured ⊱ {e} ⊰")
         MsTeams.send_message(msg=f"critical error occurred ⊱ {e} ⊰")
     except KeyboardInterrupt:
         log_message(mode="info", msg="app interrupted by the user")
+    finally:
+        profile_stack.close()
+
+        # one-shot runs leave their metrics to the node exporter's textfile collector
+        from src.utils.constants import METRICS_CONFIG
+
+        if METRICS_CONFIG["textfile_path"] and args.command in (None, "backfill"):
+            from src.utils.metrics import write_metrics_textfile
+
+            write_metrics_textfile(file_path=Path(METRICS_CONFIG["textfile_path"]))
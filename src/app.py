@@ -1,72 +1,867 @@
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from itertools import repeat
+from pathlib import Path
+from threading import Event
+from time import time
+from typing import Callable
+
 from src.config.config import (
+    is_config_enabled,
     load_windows_security_events,
-    load_qradar_config,
+    load_qradar_targets,
     load_redmine_config,
     update_config_key,
 )
+from src.services.outbox.outbox import Outbox
+from src.services.qradar.aql import (
+    build_count_query,
+    build_lean_query,
+    build_log_query,
+    get_count_event_ids,
+    set_aql_query_last_minutes,
+)
+from src.services.qradar.matcher import RuleIndex
 from src.services.qradar.qradar import QRadar, PostArielSearchResultItem, Any
+from src.services.qradar.search_manager import SearchManager
 from src.services.redmine.redmine import Redmine, User, log_message
-from src.utils.constants import CONFIG
+from src.utils.constants import CONFIG, EVENT_SPILL_THRESHOLD, RUN_DEADLINE_SECONDS
+from src.utils.deadline import is_deadline_exceeded, run_deadline
+from src.utils.event_spill import EventSpill
+from src.utils.locks import file_lock
+from src.utils.metrics import MATCHED_ROWS
+from src.utils.rule_schedule import RuleSchedule, get_rule_cadences
+from src.utils.search_stats import SearchStats
+from src.utils.sharding import ShardRing
+from src.utils.tracing import trace_run, trace_span
 
 
-def main() -> None:
-    # read windows_security_events.json from data/ folder to match with the qradar's wse events
-    windows_security_events: list[dict[str, Any]] = load_windows_security_events()
-    if not windows_security_events:
-        return
+def warm_up_redmine(
+    issue_subjects: list[str], should_stop: Callable[[], bool] | None = None
+) -> tuple[Redmine, User] | None:
+    """Create the redmine instance, authenticate and prefetch the upsert lookups.
+
+    Parameters
+    ----------
+    issue_subjects : list[str]
+        Issue subjects of the windows security events that may be upserted.
+    should_stop : Callable[[], bool] | None, optional
+        Checked between the prefetch requests to stop the warm up of a run which has nothing to deliver.
+        Default is None.
 
-    # load qradar's config from CONFIG to use in qradar's instance
-    qradar_config: dict[str, str | None] = load_qradar_config(config=CONFIG)
-    if not qradar_config:
+    Returns
+    -------
+    tuple[Redmine, User] | None
+        Warmed up redmine instance and the current redmine user, None if the authentication failed.
+    """
+
+    # load redmine config from CONFIG to use in the redmine instance
+    redmine_config: dict[str, str | None] = load_redmine_config(config=CONFIG)
+    if not redmine_config:
         return
 
-    # create qradar's instance to search & parse events
-    qradar: QRadar = QRadar(
-        url=qradar_config["QRADAR_URL"],
-        username=qradar_config["QRADAR_USERNAME"],
-        password=qradar_config["QRADAR_PASSWORD"],
+    # create redmine instance to upsert wse issues for the parsed events
+    redmine: Redmine = Redmine(
+        url=redmine_config["REDMINE_URL"],
+        key=redmine_config["REDMINE_KEY"],
+        async_prefetch=is_config_enabled(config=redmine_config, key="REDMINE_ASYNC_PREFETCH"),
+    )
+
+    # check if the redmine user is logged in and prefetch the lookups of the upsert phase
+    redmine_user: User | None = redmine.warm_up(
+        issue_subjects=issue_subjects, should_stop=should_stop
     )
+    if not redmine_user:
+        return
 
-    # get query_interval from qradar_config to use in the AQL query.
-    query_interval_key: str = "QRADAR_QUERY_INTERVAL"
-    default_interval: int = 15
-    query_interval: int = int(qradar_config.get(query_interval_key, default_interval))
+    return redmine, redmine_user
+
+
+def build_event_ids_query(
+    qradar_config: dict[str, str | None],
+    event_ids: str,
+    time_range: tuple[datetime, datetime] | None = None,
+    last_minutes: int | None = None,
+) -> str:
+    """Build the target's AQL query of the event ids, with the time range or the last minutes if given."""
 
-    # get all event ids from the windows_security_events and join them with a comma to use in the AQL query
-    event_ids: str = ", ".join([wse["event_id"] for wse in windows_security_events])
     aql_query: str = qradar_config["QRADAR_EVENT_IDS_QUERY"]
     aql_query = aql_query.replace("{event_ids}", event_ids)
+    if time_range:
+        aql_query = QRadar.set_aql_query_time_range(
+            aql_query=aql_query, start=time_range[0], stop=time_range[1]
+        )
+    elif last_minutes:
+        aql_query = set_aql_query_last_minutes(aql_query=aql_query, minutes=last_minutes)
+    return aql_query
 
-    # create post search to get results
-    search_id: str | None = qradar.post_create_search_by_aql_query(aql_query=aql_query)
-    if not search_id:
-        log_message(mode="error", msg="search id not found")
+
+def create_search_manager(qradar: QRadar, qradar_config: dict[str, str | None]) -> SearchManager:
+    """Create the search manager of the target, shared by all searches of the target in a run."""
+
+    return SearchManager(
+        qradar=qradar,
+        reuse_ttl=int(qradar_config.get("QRADAR_SEARCH_REUSE_TTL") or 0),
+    )
+
+
+def run_qradar_search(
+    search_manager: SearchManager,
+    qradar_config: dict[str, str | None],
+    aql_query: str,
+    page_size: int | None = None,
+    search_stats: SearchStats | None = None,
+) -> list[PostArielSearchResultItem] | None:
+    """Create (or reuse) the search of the AQL query on the target, wait for it and get the searched events."""
+
+    return search_manager.run_search(
+        aql_query=aql_query,
+        request_delay=0.8,
+        timeout=int(qradar_config.get("QRADAR_SEARCH_TIMEOUT") or 0) or None,
+        page_size=page_size,
+        search_stats=search_stats,
+    )
+
+
+def probe_event_ids(
+    search_manager: SearchManager,
+    qradar_config: dict[str, str | None],
+    aql_query: str,
+    event_ids: str,
+) -> str | None:
+    """Search the rows' counts by event id in the AQL query's window, see build_count_query.
+
+    Parameters
+    ----------
+    search_manager : SearchManager
+        Search manager of the target in the run.
+    qradar_config : dict[str, str | None]
+        Configuration settings of the target.
+    aql_query : str
+        The target's AQL query of the event ids.
+    event_ids : str
+        Comma separated event ids of the AQL query.
+
+    Returns
+    -------
+    str | None
+        Comma separated event ids which have rows, empty if none of them has, None if the probe failed.
+    """
+
+    count_query: str | None = build_count_query(aql_query=aql_query)
+    if not count_query:
+        log_message(
+            mode="warning",
+            msg=f"AQL query of qradar target ⊱ {qradar_config['QRADAR_TARGET']} ⊰ has no event_id column, it is searched without the count probe",
+            sample_key="count_probe_query",
+        )
         return
 
-    # check if the search is completed to get the results
-    is_search_completed: bool = qradar.check_search_is_completed_by_search_id(
-        search_id=search_id, request_delay=0.8
+    counted_events: list[PostArielSearchResultItem] | None = run_qradar_search(
+        search_manager=search_manager, qradar_config=qradar_config, aql_query=count_query
     )
-    if not is_search_completed:
+    if counted_events is None:
+        log_message(
+            mode="warning",
+            msg=f"count probe failed on qradar target ⊱ {qradar_config['QRADAR_TARGET']} ⊰, all event ids are searched",
+        )
         return
 
-    # get the searched events and parse them to match with the windows security events
-    searched_events: list[PostArielSearchResultItem] = (
-        qradar.get_search_results_by_search_id(search_id=search_id)
+    counted_event_ids: set[str] = get_count_event_ids(counted_events=counted_events)
+    return ", ".join(
+        event_id for event_id in event_ids.split(", ") if event_id in counted_event_ids
     )
 
-    # process on the searched events to match with the windows security events and update the events list
-    for searched_event in searched_events:
-        qradar.parse_searched_events(
-            searched_event=searched_event,
-            windows_security_events=windows_security_events,
+
+def search_qradar_events(
+    search_manager: SearchManager,
+    qradar_config: dict[str, str | None],
+    event_ids: str,
+    time_range: tuple[datetime, datetime] | None = None,
+    last_minutes: int | None = None,
+) -> list[PostArielSearchResultItem] | None:
+    """Search the windows security events on the qradar target with the target's AQL query.
+
+    If QRADAR_COUNT_PROBE is enabled, only the event ids with rows in the count probe are searched.
+    If QRADAR_LEAN_FETCH is enabled, the query is searched without its **log** column, the logs of the
+    representative rows are searched afterwards with fetch_representative_logs.
+    If QRADAR_ADAPTIVE_SEARCH is enabled, the search is recorded in the search stats and its results are fetched
+    in pages sized from the target's recent searches.
+
+    Parameters
+    ----------
+    search_manager : SearchManager
+        Search manager of the target in the run, shared by the count probe & the search.
+    qradar_config : dict[str, str | None]
+        Configuration settings of the target.
+    event_ids : str
+        Comma separated event ids to replace with {event_ids} in the AQL query.
+    time_range : tuple[datetime, datetime] | None, optional
+        Start and stop time to search instead of the query's last minutes. Default is None.
+    last_minutes : int | None, optional
+        Minutes to search instead of the query's last minutes, e.g. the window of the due rules. Default is None.
+
+    Returns
+    -------
+    list[PostArielSearchResultItem] | None
+        The searched events if the search is completed, None otherwise.
+    """
+
+    if is_config_enabled(config=qradar_config, key="QRADAR_COUNT_PROBE"):
+        probed_event_ids: str | None = probe_event_ids(
+            search_manager=search_manager,
+            qradar_config=qradar_config,
+            aql_query=build_event_ids_query(
+                qradar_config=qradar_config,
+                event_ids=event_ids,
+                time_range=time_range,
+                last_minutes=last_minutes,
+            ),
+            event_ids=event_ids,
         )
+        if probed_event_ids == "":
+            log_message(
+                mode="info",
+                msg=f"no rows of the event ids on qradar target ⊱ {qradar_config['QRADAR_TARGET']} ⊰, the search is skipped",
+            )
+            return []
+        event_ids = probed_event_ids or event_ids
+
+    aql_query: str = build_event_ids_query(
+        qradar_config=qradar_config,
+        event_ids=event_ids,
+        time_range=time_range,
+        last_minutes=last_minutes,
+    )
+    if is_config_enabled(config=qradar_config, key="QRADAR_LEAN_FETCH"):
+        lean_query: str | None = build_lean_query(aql_query=aql_query)
+        if lean_query:
+            aql_query = lean_query
+        else:
+            log_message(
+                mode="warning",
+                msg=f"AQL query of qradar target ⊱ {qradar_config['QRADAR_TARGET']} ⊰ has no log column, it is searched as is",
+                sample_key="lean_fetch_query",
+            )
+
+    search_stats: SearchStats | None = None
+    page_size: int | None = None
+    if is_config_enabled(config=qradar_config, key="QRADAR_ADAPTIVE_SEARCH"):
+        search_stats = SearchStats()
+        page_size = search_stats.get_page_size(
+            qradar_url=search_manager.qradar.url,
+            target_seconds=float(qradar_config.get("QRADAR_TARGET_PAGE_SECONDS") or 5),
+        )
+
+    return run_qradar_search(
+        search_manager=search_manager,
+        qradar_config=qradar_config,
+        aql_query=aql_query,
+        page_size=page_size,
+        search_stats=search_stats,
+    )
+
+
+def fetch_representative_logs(
+    search_manager: SearchManager,
+    qradar_config: dict[str, str | None],
+    event_ids: str,
+    rule_index: RuleIndex,
+    time_range: tuple[datetime, datetime] | None = None,
+) -> int:
+    """Search the logs of the lean search's representative rows, the last matched row of each rule & fields.
+
+    The representatives are searched by their start time & qid in batches of QRADAR_LEAN_FETCH_BATCH_SIZE,
+    so only a row per distinct rule & src_user, dst_user, group_name is fetched with its payload.
+
+    Parameters
+    ----------
+    search_manager : SearchManager
+        Search manager of the target in the run, shared by the log batches.
+    qradar_config : dict[str, str | None]
+        Configuration settings of the target.
+    event_ids : str
+        Comma separated event ids to replace with {event_ids} in the AQL query.
+    rule_index : RuleIndex
+        Rule index of the target the lean rows are matched with.
+    time_range : tuple[datetime, datetime] | None, optional
+        Start and stop time of the lean search. Default is None.
+
+    Returns
+    -------
+    int
+        Number of the representatives whose log is found.
+    """
+
+    representatives: list[tuple[dict[str, Any], PostArielSearchResultItem]] = (
+        rule_index.pop_representatives()
+    )
+    if not representatives:
+        return 0
+
+    aql_query: str = build_event_ids_query(
+        qradar_config=qradar_config, event_ids=event_ids, time_range=time_range
+    )
+    batch_size: int = int(qradar_config.get("QRADAR_LEAN_FETCH_BATCH_SIZE") or 100)
+    found_count: int = 0
+    for index in range(0, len(representatives), batch_size):
+        batch: list[tuple[dict[str, Any], PostArielSearchResultItem]] = representatives[
+            index : index + batch_size
+        ]
+        log_query: str | None = build_log_query(
+            aql_query=aql_query, representatives=[row for _, row in batch]
+        )
+        if not log_query:
+            log_message(
+                mode="warning",
+                msg=f"logs of qradar target ⊱ {qradar_config['QRADAR_TARGET']} ⊰ can't be searched, the AQL query has no where clause or the rows have no starttime & qid",
+                sample_key="lean_fetch_logs",
+            )
+            break
+
+        searched_events: list[PostArielSearchResultItem] | None = run_qradar_search(
+            search_manager=search_manager, qradar_config=qradar_config, aql_query=log_query
+        )
+        if searched_events is None:
+            log_message(
+                mode="error",
+                msg=f"log search failed on qradar target ⊱ {qradar_config['QRADAR_TARGET']} ⊰ for ⊱ {len(batch)} ⊰ representatives",
+            )
+            continue
+
+        found_count += search_manager.qradar.parse_representative_logs(
+            rule_index=rule_index,
+            representatives=batch,
+            searched_events=searched_events,
+        )
+    return found_count
+
+
+def load_owned_windows_security_events(
+    shard_index: int = 0, shard_count: int = 1
+) -> list[dict[str, Any]]:
+    """Load the windows security events owned by the worker's shard.
+
+    Parameters
+    ----------
+    shard_index : int, optional
+        Index of the worker's shard, by default 0.
+    shard_count : int, optional
+        Number of worker shards, all windows security events are owned if it is 1. By default 1.
+
+    Returns
+    -------
+    list[dict[str, Any]]
+        Windows security events owned by the shard.
+    """
+
+    # read windows_security_events.json from data/ folder to match with the qradar's wse events
+    windows_security_events: list[dict[str, Any]] = load_windows_security_events()
+    if shard_count <= 1:
+        return windows_security_events
+
+    # keep only the windows security events owned by this worker's shard
+    owned_windows_security_events: list[dict[str, Any]] = ShardRing(
+        shard_count=shard_count
+    ).filter_owned_events(
+        windows_security_events=windows_security_events, shard_index=shard_index
+    )
+    if not owned_windows_security_events:
+        log_message(
+            mode="info",
+            msg=f"shard ⊱ {shard_index}/{shard_count} ⊰ owns no windows security events",
+        )
+    return owned_windows_security_events
+
+
+def get_rule_schedule(
+    windows_security_events: list[dict[str, Any]], default_interval: int = 15
+) -> RuleSchedule | None:
+    """Get the schedule of the rules' cadences, None if no rule has a cadence and all rules are searched in each run.
+
+    Parameters
+    ----------
+    windows_security_events : list[dict[str, Any]]
+        The windows security events of the worker's shard.
+    default_interval : int, optional
+        Cadence in minutes of the rules without a cadence, by default 15.
+
+    Returns
+    -------
+    RuleSchedule | None
+        Schedule of the event ids, None if neither RULE_PRIORITY_CADENCE nor a rule's query_interval_minutes is set.
+    """
+
+    cadences: dict[str, int] = get_rule_cadences(
+        windows_security_events=windows_security_events, default_minutes=default_interval
+    )
+    return RuleSchedule(cadences=cadences) if cadences else None
+
+
+def get_query_interval_key(shard_index: int = 0, shard_count: int = 1) -> str:
+    """Get the .env key of the worker's query interval, each shard keeps its own interval as its window differs.
+
+    Examples
+    --------
+    >>> get_query_interval_key(shard_index=1, shard_count=3)
+    ... "QRADAR_QUERY_INTERVAL_SHARD_1"
+    """
+
+    return "QRADAR_QUERY_INTERVAL" if shard_count <= 1 else f"QRADAR_QUERY_INTERVAL_SHARD_{shard_index}"
+
+
+def get_query_interval(shard_index: int = 0, shard_count: int = 1, default_interval: int = 15) -> int:
+    """Get the worker's query interval in minutes, a shard without its own interval starts from QRADAR_QUERY_INTERVAL."""
+
+    return int(
+        CONFIG.get(get_query_interval_key(shard_index=shard_index, shard_count=shard_count))
+        or CONFIG.get("QRADAR_QUERY_INTERVAL")
+        or default_interval
+    )
+
+
+def get_run_interval(default_interval: int = 15) -> int:
+    """Get the minutes between the runs, QRADAR_MIN_QUERY_INTERVAL (the cron interval of the one-shot runs).
+
+    The query interval grows after the empty runs to widen the next search's window back to the last
+    run with events, so the runs are not delayed by it.
+    """
+
+    return int(CONFIG.get("QRADAR_MIN_QUERY_INTERVAL") or default_interval)
 
-    # get the parsed events from the windows_security_events list that has events
-    parsed_events: list[dict[str, Any]] = [
-        wse for wse in windows_security_events if wse.get("events", [])
+
+def get_next_run_seconds(shard_index: int = 0, shard_count: int = 1) -> float:
+    """Get the seconds to wait until the next run, until the next due rule if the rules have cadences.
+
+    Parameters
+    ----------
+    shard_index : int, optional
+        Index of the worker's shard, by default 0.
+    shard_count : int, optional
+        Number of worker shards, by default 1.
+
+    Returns
+    -------
+    float
+        The run interval in seconds, or the seconds until the next due rule (at least a minute).
+    """
+
+    rule_schedule: RuleSchedule | None = get_rule_schedule(
+        windows_security_events=load_owned_windows_security_events(
+            shard_index=shard_index, shard_count=shard_count
+        )
+    )
+    if rule_schedule is None:
+        return get_run_interval() * 60
+
+    # a due rule whose search failed is tried again after a minute, not in a busy loop
+    return max(rule_schedule.get_seconds_until_due(), 60)
+
+
+def get_adaptive_query_interval(
+    qradars: list[QRadar],
+    qradar_configs: list[dict[str, str | None]],
+    query_interval: int,
+    default_interval: int = 15,
+) -> int | None:
+    """Get the next QRADAR_QUERY_INTERVAL sized from the targets' recent searches, see SearchStats.get_window_minutes.
+
+    Each target with QRADAR_ADAPTIVE_SEARCH sizes its window with its own settings (QRADAR_<TARGET>_* overrides
+    included) to complete & fetch its search in QRADAR_TARGET_SEARCH_SECONDS, between QRADAR_MIN_QUERY_INTERVAL
+    and QRADAR_MAX_QUERY_INTERVAL minutes. The interval is common for all targets, the slowest target's window is used.
+
+    Returns
+    -------
+    int | None
+        Minutes of the next query interval, None if none of the adaptive targets has a recorded search.
+    """
+
+    search_stats: SearchStats = SearchStats()
+    window_minutes: list[int] = [
+        minutes
+        for qradar, qradar_config in zip(qradars, qradar_configs)
+        if is_config_enabled(config=qradar_config, key="QRADAR_ADAPTIVE_SEARCH")
+        and (
+            minutes := search_stats.get_window_minutes(
+                qradar_url=qradar.url,
+                current_minutes=query_interval,
+                target_seconds=float(qradar_config.get("QRADAR_TARGET_SEARCH_SECONDS") or 60),
+                min_minutes=int(qradar_config.get("QRADAR_MIN_QUERY_INTERVAL") or default_interval),
+                max_minutes=int(qradar_config.get("QRADAR_MAX_QUERY_INTERVAL") or 1440),
+            )
+        )
+        is not None
+    ]
+    return min(window_minutes) if window_minutes else None
+
+
+def create_qradars(qradar_configs: list[dict[str, str | None]]) -> list[QRadar]:
+    """Create qradar's instance of each target to search & parse events."""
+
+    return [
+        QRadar(
+            url=qradar_config["QRADAR_URL"],
+            username=qradar_config["QRADAR_USERNAME"],
+            password=qradar_config["QRADAR_PASSWORD"],
+            capture_folder=(
+                Path(qradar_config["QRADAR_CAPTURE_FOLDER"])
+                if qradar_config.get("QRADAR_CAPTURE_FOLDER")
+                else None
+            ),
+            async_pages=is_config_enabled(config=qradar_config, key="QRADAR_ASYNC_PAGES"),
+        )
+        for qradar_config in qradar_configs
+    ]
+
+
+def search_and_parse_events(
+    qradars: list[QRadar],
+    qradar_configs: list[dict[str, str | None]],
+    windows_security_events: list[dict[str, Any]],
+    time_range: tuple[datetime, datetime] | None = None,
+    last_minutes: int | None = None,
+    event_spill: EventSpill | None = None,
+) -> tuple[list[dict[str, Any]] | None, list[str]]:
+    """Search all qradar targets concurrently and match the searched events with the windows security events.
+
+    Parameters
+    ----------
+    qradars : list[QRadar]
+        QRadar instance of each target.
+    qradar_configs : list[dict[str, str | None]]
+        Configuration settings of each target.
+    windows_security_events : list[dict[str, Any]]
+        The windows security events to match, their events lists are updated.
+    time_range : tuple[datetime, datetime] | None, optional
+        Start and stop time to search instead of the query's last minutes. Default is None.
+    last_minutes : int | None, optional
+        Minutes to search instead of the query's last minutes. Default is None.
+    event_spill : EventSpill | None, optional
+        Spill of the run (or backfill chunk) the rules' events over EVENT_SPILL_THRESHOLD are moved to,
+        see enqueue_parsed_events. The events are kept in memory if not given. Default is None.
+
+    Returns
+    -------
+    tuple[list[dict[str, Any]] | None, list[str]]
+        The windows security events which have matched events in memory or in the spill (None if the searches
+        of all targets failed), and the names of the targets whose search failed.
+    """
+
+    # get all event ids from the windows_security_events and join them with a comma to use in the AQL query
+    event_ids: str = ", ".join([wse["event_id"] for wse in windows_security_events])
+
+    # each target's searches in the run (count probe, search & lean log batches) share one search manager,
+    # so its state database is opened and the abandoned searches are cleaned up once per target
+    search_managers: list[SearchManager] = [
+        create_search_manager(qradar=qradar, qradar_config=qradar_config)
+        for qradar, qradar_config in zip(qradars, qradar_configs)
     ]
-    if not parsed_events:
+    try:
+        # search all qradar targets concurrently, so each console doesn't add its search time to the run
+        with ThreadPoolExecutor(
+            max_workers=len(qradars), thread_name_prefix="qradar-search"
+        ) as search_executor:
+            targets_searched_events: list[list[PostArielSearchResultItem] | None] = list(
+                search_executor.map(
+                    search_qradar_events,
+                    search_managers,
+                    qradar_configs,
+                    repeat(event_ids),
+                    repeat(time_range),
+                    repeat(last_minutes),
+                )
+            )
+        failed_targets: list[str] = [
+            qradar_config["QRADAR_TARGET"]
+            for qradar_config, searched_events in zip(qradar_configs, targets_searched_events)
+            if searched_events is None
+        ]
+        if len(failed_targets) == len(qradar_configs):
+            return None, failed_targets
+
+        # process on the searched events to match with the windows security events and update the events list,
+        # the events of all targets are merged per windows security event with the target names as sources
+        is_multi_target: bool = len(qradar_configs) > 1
+        for qradar, search_manager, qradar_config, searched_events in zip(
+            qradars, search_managers, qradar_configs, targets_searched_events
+        ):
+            if searched_events is None:
+                log_message(
+                    mode="error",
+                    msg=f"search failed on qradar target ⊱ {qradar_config['QRADAR_TARGET']} ⊰",
+                )
+                continue
+
+            with trace_span(
+                "match", target=qradar_config["QRADAR_TARGET"], rows=len(searched_events)
+            ) as span:
+                # each target (and backfill chunk) matches with its own index, it keeps the pending logs of its matches
+                rule_index: RuleIndex = qradar.build_rule_index(
+                    windows_security_events=windows_security_events
+                )
+                matched_rows: Counter[str] = Counter()
+                for searched_event in searched_events:
+                    is_matched: bool = qradar.parse_searched_events(
+                        searched_event=searched_event,
+                        rule_index=rule_index,
+                        source=qradar_config["QRADAR_TARGET"] if is_multi_target else None,
+                        event_spill=event_spill,
+                    )
+                    if is_matched:
+                        matched_rows[searched_event.get("event_id")] += 1
+
+                span["matched_rows"] = matched_rows.total()
+                if is_config_enabled(config=qradar_config, key="QRADAR_LEAN_FETCH"):
+                    # the lean rows have no log, only the representative rows' logs are searched
+                    span["fetched_logs"] = fetch_representative_logs(
+                        search_manager=search_manager,
+                        qradar_config=qradar_config,
+                        event_ids=event_ids,
+                        rule_index=rule_index,
+                        time_range=time_range,
+                    )
+                if event_spill is not None:
+                    # the spilled rules' events matched since their last spill are spilled too, they are enqueued in pages
+                    span["spilled_events"] = qradar.spill_pending_events(
+                        rule_index=rule_index, event_spill=event_spill
+                    )
+                # the matched events carry the digests of their raw logs instead of the logs
+                span["stored_logs"] = qradar.store_event_logs(rule_index=rule_index)
+                for event_id, row_count in matched_rows.items():
+                    MATCHED_ROWS.labels(event_id=event_id).inc(row_count)
+
+        # get the parsed events from the windows_security_events list that has events
+        return [
+            wse
+            for wse in windows_security_events
+            if wse.get("events", []) or (event_spill is not None and event_spill.is_spilled(wse=wse))
+        ], failed_targets
+    finally:
+        for search_manager in search_managers:
+            search_manager.close()
+
+
+def get_outbox(shard_index: int = 0, shard_count: int = 1) -> Outbox:
+    """Open the outbox of the worker's shard, each shard delivers only its own events."""
+
+    return Outbox(
+        file_name=(
+            f"outbox_shard_{shard_index}.sqlite3" if shard_count > 1 else "outbox.sqlite3"
+        )
+    )
+
+
+def enqueue_parsed_events(
+    outbox: Outbox, parsed_events: list[dict[str, Any]], event_spill: EventSpill
+) -> int:
+    """Persist the parsed events to the outbox, the spilled rules are enqueued from the spill in pages.
+
+    Each page of a spilled rule is a copy of the rule with at most EVENT_SPILL_THRESHOLD events, so its events
+    are never loaded in memory at once. The pages of a rule update the same issue, the events already upserted
+    by a page are skipped by the issue's description & journals check. The spill is closed when it is enqueued,
+    an enqueue failure raises after the spill is closed.
+
+    Parameters
+    ----------
+    outbox : Outbox
+        Outbox of the worker's shard.
+    parsed_events : list[dict[str, Any]]
+        The windows security events which have matched events, see search_and_parse_events.
+    event_spill : EventSpill
+        Spill of the run (or backfill chunk) the events are matched in.
+
+    Returns
+    -------
+    int
+        Number of the enqueued events, each page of a spilled rule is an event.
+    """
+
+    try:
+        in_memory_events: list[dict[str, Any]] = [
+            wse for wse in parsed_events if not event_spill.is_spilled(wse=wse)
+        ]
+        enqueued_count: int = outbox.enqueue(events=in_memory_events) if in_memory_events else 0
+        for wse in parsed_events:
+            if not event_spill.is_spilled(wse=wse):
+                continue
+
+            for events in event_spill.read_pages(wse=wse, page_size=max(EVENT_SPILL_THRESHOLD, 1)):
+                enqueued_count += outbox.enqueue(events=[{**wse, "events": events}])
+        return enqueued_count
+    finally:
+        event_spill.close()
+
+
+def stop_redmine_warm_up(executor: ThreadPoolExecutor, is_stopped: Event) -> None:
+    """Stop the warm up of a run which has nothing to deliver and wait for it, so it doesn't run into the next run."""
+
+    is_stopped.set()
+    executor.shutdown(wait=True, cancel_futures=True)
+
+
+def deliver_wse_event(
+    redmine: Redmine, redmine_user: User, event_to_upsert: dict[str, Any]
+) -> bool:
+    """Upsert the wse issue of the event while holding the lock of its issue subject.
+
+    The lock is shared through the state folder, so the worker shards never upsert the same issue subject at the same time.
+
+    Parameters
+    ----------
+    redmine : Redmine
+        Redmine instance to upsert the wse issue.
+    redmine_user : User
+        User to assign the issue.
+    event_to_upsert : dict[str, Any]
+        The parsed event to update or create the wse issue.
+
+    Returns
+    -------
+    bool
+        True if the event is delivered, False otherwise.
+    """
+
+    with (
+        trace_span(
+            "upsert",
+            event_id=event_to_upsert.get("event_id"),
+            events=len(event_to_upsert.get("events", [])),
+        ) as span,
+        file_lock(name=f"issue-subject:{event_to_upsert.get('redmine_issue_subject')}"),
+    ):
+        span["delivered"] = redmine.upsert_wse_event(
+            redmine_user=redmine_user, event_to_upsert=event_to_upsert
+        )
+        return span["delivered"]
+
+
+@trace_run(name="main")
+@run_deadline(seconds=RUN_DEADLINE_SECONDS)
+def main(shard_index: int = 0, shard_count: int = 1) -> None:
+    """Search the windows security events on qradar and upsert the matched ones to redmine.
+
+    Each phase is traced as a span of the run, a run summary record is logged when the run is finished.
+    The run stops its requests at the RUN_DEADLINE_SECONDS deadline, the undelivered events are kept in the outbox.
+
+    Parameters
+    ----------
+    shard_index : int, optional
+        Index of this worker's shard, by default 0.
+    shard_count : int, optional
+        Number of worker shards. If greater than 1, only the event ids owned by the shard
+        on the consistent hashing ring are searched and upserted. By default 1.
+    """
+
+    # read the windows security events owned by this worker's shard to match with the qradar's wse events
+    windows_security_events: list[dict[str, Any]] = load_owned_windows_security_events(
+        shard_index=shard_index, shard_count=shard_count
+    )
+    if not windows_security_events:
+        return
+
+    # load each qradar target's config from CONFIG, only the common QRADAR_* settings if QRADAR_TARGETS is not set
+    qradar_configs: list[dict[str, str | None]] = load_qradar_targets(config=CONFIG)
+    if not qradar_configs:
+        return
+
+    # create qradar's instance of each target to search & parse events
+    qradars: list[QRadar] = create_qradars(qradar_configs=qradar_configs)
+
+    # get query_interval of the worker to use in the AQL query, it is common for all targets.
+    # each shard reads & updates its own key, so a shard's empty runs don't change the other shards' windows
+    query_interval_key: str = get_query_interval_key(
+        shard_index=shard_index, shard_count=shard_count
+    )
+    default_interval: int = 15
+    query_interval: int = get_query_interval(
+        shard_index=shard_index, shard_count=shard_count, default_interval=default_interval
+    )
+
+    # with the rules' cadences only the due rules are searched, all together in one search of the window
+    # since they were last searched, instead of all rules every QRADAR_QUERY_INTERVAL minutes
+    rule_schedule: RuleSchedule | None = get_rule_schedule(
+        windows_security_events=windows_security_events, default_interval=default_interval
+    )
+    due_event_ids: set[str] = set()
+    # the AQL query's last minutes are the common QRADAR_QUERY_INTERVAL, a shard searches its own interval
+    last_minutes: int | None = query_interval if shard_count > 1 else None
+    if rule_schedule is not None:
+        due_event_ids = rule_schedule.get_due_event_ids()
+        if not due_event_ids:
+            log_message(mode="info", msg="no rules are due to be searched in this run")
+            return
+
+        last_minutes = rule_schedule.get_window_minutes(event_ids=due_event_ids)
+        windows_security_events = [
+            wse for wse in windows_security_events if wse["event_id"] in due_event_ids
+        ]
+        log_message(
+            mode="info",
+            msg=f"⊱ {len(due_event_ids)} ⊰ due event ids are searched in the last ⊱ {last_minutes} ⊰ minutes",
+        )
+    searched_at: float = time()
+
+    # warm up redmine in the background while qradar is searching, so the upsert phase starts hot,
+    # it is stopped if the run returns without anything to deliver
+    is_warm_up_stopped: Event = Event()
+    executor: ThreadPoolExecutor = ThreadPoolExecutor(
+        max_workers=1, thread_name_prefix="redmine-warm-up"
+    )
+    redmine_warm_up: Future[tuple[Redmine, User] | None] = executor.submit(
+        warm_up_redmine,
+        issue_subjects=[wse["redmine_issue_subject"] for wse in windows_security_events],
+        should_stop=is_warm_up_stopped.is_set,
+    )
+
+    # search all qradar targets and get the windows security events that have matched events,
+    # the rules' events over the memory budget are spilled to disk until they are enqueued
+    event_spill: EventSpill = EventSpill()
+    parsed_events, failed_targets = search_and_parse_events(
+        qradars=qradars,
+        qradar_configs=qradar_configs,
+        windows_security_events=windows_security_events,
+        last_minutes=last_minutes,
+        event_spill=event_spill,
+    )
+    if parsed_events is None:
+        stop_redmine_warm_up(executor=executor, is_stopped=is_warm_up_stopped)
+        return
+
+    # open the outbox to persist the parsed events before any redmine call, they must survive a redmine failure
+    # before the rules' schedule or the query interval moves on. An enqueue failure raises here and the next run
+    # searches the same window again
+    outbox: Outbox = get_outbox(shard_index=shard_index, shard_count=shard_count)
+    if parsed_events:
+        enqueue_parsed_events(outbox=outbox, parsed_events=parsed_events, event_spill=event_spill)
+
+    # with the adaptive search the next window is sized from the observed volume instead of the empty runs
+    adaptive_interval: int | None = None
+    if rule_schedule is None and any(
+        is_config_enabled(config=qradar_config, key="QRADAR_ADAPTIVE_SEARCH")
+        for qradar_config in qradar_configs
+    ):
+        adaptive_interval = get_adaptive_query_interval(
+            qradars=qradars,
+            qradar_configs=qradar_configs,
+            query_interval=query_interval,
+            default_interval=default_interval,
+        )
+
+    if rule_schedule is not None:
+        # the next window of the due rules starts from this search, the window of a failed target
+        # is searched again by the next run. The query interval is not used
+        if not failed_targets:
+            rule_schedule.mark_searched(event_ids=due_event_ids, searched_at=searched_at)
+    elif adaptive_interval is not None:
+        # the next search completes in about QRADAR_TARGET_SEARCH_SECONDS with the observed volume
+        if adaptive_interval != query_interval:
+            update_config_key(key=query_interval_key, value=str(adaptive_interval))
+            log_message(
+                mode="info",
+                msg=f"query_interval is sized from ⊱ {query_interval} ⊰ to ⊱ {adaptive_interval} ⊰ minutes by the search stats",
+            )
+    elif not parsed_events:
         # no wse events found, add 15 minutes to the query_interval to search in the next run
         query_interval += default_interval
         # check if the query_interval is less than 1 day, if not, set it to default_interval
@@ -83,29 +878,34 @@ def main() -> None:
                 mode="warning",
                 msg=f"no windows security events were found for 1 day, query_interval is set to {default_interval} minutes",
             )
-        return
-
-    # wse events found, reset the QRADAR_QUERY_INTERVAL to the default_interval
-    update_config_key(key=query_interval_key, value=str(default_interval))
+    else:
+        # wse events found, reset the QRADAR_QUERY_INTERVAL to the default_interval
+        update_config_key(key=query_interval_key, value=str(default_interval))
 
-    # load redmine config from CONFIG to use in the redmine instance
-    redmine_config: dict[str, str | None] = load_redmine_config(config=CONFIG)
-    if not redmine_config:
+    # nothing to deliver unless the previous runs left undelivered events in the outbox
+    if not parsed_events and not outbox.count_pending():
+        stop_redmine_warm_up(executor=executor, is_stopped=is_warm_up_stopped)
         return
 
-    # create redmine instance to upsert wse issues for the parsed events
-    redmine: Redmine = Redmine(
-        url=redmine_config["REDMINE_URL"], key=redmine_config["REDMINE_KEY"]
-    )
-
-    # check if the redmine user is logged in with the given credentials
-    redmine_user: User | None = redmine.auth()
-    if not redmine_user:
-        log_message(mode="error", msg="redmine authentication failed")
+    # wait for the redmine warm up which has been running since the search is created
+    redmine_session: tuple[Redmine, User] | None = redmine_warm_up.result()
+    executor.shutdown(wait=False)
+    if not redmine_session:
+        log_message(
+            mode="error",
+            msg=f"redmine authentication failed, ⊱ {outbox.count_pending()} ⊰ events are kept in the outbox",
+        )
         return
 
-    # process on the parsed events to create or update the wse issues
-    for parsed_event in parsed_events:
-        redmine.upsert_wse_event(
-            redmine_user=redmine_user, event_to_upsert=parsed_event
-        )
+    redmine, redmine_user = redmine_session
+
+    # deliver the due outbox events (this and the previous runs) to create or update the wse issues
+    outbox.drain(
+        deliver=lambda event: deliver_wse_event(
+            redmine=redmine, redmine_user=redmine_user, event_to_upsert=event
+        ),
+        # keep the rest of the events without an attempt when the deadline is passed or redmine is failing fast
+        should_stop=lambda: is_deadline_exceeded() or redmine.circuit_breaker.is_open(),
+        # upsert in parallel up to the limit adapted to redmine's latency & throttling
+        limiter=redmine.rate_controller,
+    )
@@ -0,0 +1,262 @@
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from copy import deepcopy
+from datetime import datetime, timedelta
+from hashlib import sha256
+from json import dumps as json_dumps
+from threading import Lock
+from time import time
+import sqlite3
+
+from src.app import (
+    create_qradars,
+    deliver_wse_event,
+    enqueue_parsed_events,
+    get_outbox,
+    load_owned_windows_security_events,
+    search_and_parse_events,
+    warm_up_redmine,
+)
+from src.config.config import load_qradar_targets
+from src.services.outbox.outbox import Outbox
+from src.services.qradar.qradar import QRadar, Any
+from src.services.redmine.redmine import Redmine, User, log_message
+from src.utils.constants import CONFIG
+from src.utils.event_spill import EventSpill
+from src.utils.state import connect_state_db
+from src.utils.tracing import trace_run
+
+
+class BackfillCheckpoint:
+    """Completed chunks of a backfill, kept in the state folder to resume an interrupted backfill.
+
+    Attributes
+    ----------
+    backfill_id : str
+        Identifier of the backfill, same for the same range, chunk size, event ids and qradar targets.
+    connection : sqlite3.Connection
+        Connection to the backfill database.
+
+    Methods
+    -------
+    - get_completed_chunk_starts() -> set[str]
+    - complete_chunk(chunk: tuple[datetime, datetime], event_count: int) -> None
+    """
+
+    def __init__(self, backfill_id: str, file_name: str = "backfill.sqlite3") -> None:
+        self.backfill_id: str = backfill_id
+
+        self._lock: Lock = Lock()
+        self.connection: sqlite3.Connection = connect_state_db(file_name=file_name)
+        with self.connection:
+            self.connection.execute(
+                """
+                create table if not exists backfill_chunks (
+                    backfill_id text not null,
+                    chunk_start text not null,
+                    chunk_stop text not null,
+                    event_count integer not null,
+                    completed_at real not null,
+                    primary key (backfill_id, chunk_start)
+                )
+                """
+            )
+
+    def get_completed_chunk_starts(self) -> set[str]:
+        """Get the start times (ISO format) of the completed chunks."""
+
+        with self._lock:
+            rows: list[sqlite3.Row] = self.connection.execute(
+                "select chunk_start from backfill_chunks where backfill_id = ?",
+                (self.backfill_id,),
+            ).fetchall()
+        return {row["chunk_start"] for row in rows}
+
+    def complete_chunk(self, chunk: tuple[datetime, datetime], event_count: int) -> None:
+        """Mark the chunk as completed, its events must already be in the outbox."""
+
+        with self._lock, self.connection:
+            self.connection.execute(
+                "insert or replace into backfill_chunks values (?, ?, ?, ?, ?)",
+                (
+                    self.backfill_id,
+                    chunk[0].isoformat(),
+                    chunk[1].isoformat(),
+                    event_count,
+                    time(),
+                ),
+            )
+
+
+def split_time_range(
+    start: datetime, end: datetime, chunk_minutes: int
+) -> list[tuple[datetime, datetime]]:
+    """Split the time range into consecutive chunks, the last chunk may be shorter.
+
+    Parameters
+    ----------
+    start : datetime
+        Start time of the range.
+    end : datetime
+        End time of the range.
+    chunk_minutes : int
+        Length of each chunk in minutes.
+
+    Returns
+    -------
+    list[tuple[datetime, datetime]]
+        Start and stop time of each chunk.
+    """
+
+    chunk_size: timedelta = timedelta(minutes=chunk_minutes)
+    chunks: list[tuple[datetime, datetime]] = []
+    chunk_start: datetime = start
+    while chunk_start < end:
+        chunk_stop: datetime = min(chunk_start + chunk_size, end)
+        chunks.append((chunk_start, chunk_stop))
+        chunk_start = chunk_stop
+    return chunks
+
+
+@trace_run(name="backfill")
+def run_backfill(
+    start: datetime,
+    end: datetime,
+    chunk_minutes: int = 60,
+    parallelism: int = 2,
+    shard_index: int = 0,
+    shard_count: int = 1,
+) -> None:
+    """Search a past time range chunk by chunk and upsert the matched events as the regular runs do.
+
+    Completed chunks are checkpointed after their events are persisted to the outbox, so running the same
+    backfill again resumes from the chunks which are not completed yet.
+
+    Parameters
+    ----------
+    start : datetime
+        Start time of the range, in the QRadar console's time zone.
+    end : datetime
+        End time of the range, in the QRadar console's time zone.
+    chunk_minutes : int, optional
+        Length of each searched chunk in minutes, by default 60.
+    parallelism : int, optional
+        Maximum number of chunks searched at the same time, by default 2.
+    shard_index : int, optional
+        Index of this worker's shard, by default 0.
+    shard_count : int, optional
+        Number of worker shards, by default 1.
+    """
+
+    windows_security_events: list[dict[str, Any]] = load_owned_windows_security_events(
+        shard_index=shard_index, shard_count=shard_count
+    )
+    if not windows_security_events:
+        return
+
+    qradar_configs: list[dict[str, str | None]] = load_qradar_targets(config=CONFIG)
+    qradars: list[QRadar] = create_qradars(qradar_configs=qradar_configs)
+
+    # the same backfill is identified by its range, chunks, event ids and targets to resume it
+    backfill_id: str = sha256(
+        json_dumps(
+            [
+                start.isoformat(),
+                end.isoformat(),
+                chunk_minutes,
+                sorted(wse["event_id"] for wse in windows_security_events),
+                [qradar_config["QRADAR_TARGET"] for qradar_config in qradar_configs],
+            ]
+        ).encode("utf-8")
+    ).hexdigest()[:16]
+    checkpoint: BackfillCheckpoint = BackfillCheckpoint(backfill_id=backfill_id)
+
+    chunks: list[tuple[datetime, datetime]] = split_time_range(
+        start=start, end=end, chunk_minutes=chunk_minutes
+    )
+    completed_chunk_starts: set[str] = checkpoint.get_completed_chunk_starts()
+    remaining_chunks: list[tuple[datetime, datetime]] = [
+        chunk for chunk in chunks if chunk[0].isoformat() not in completed_chunk_starts
+    ]
+    log_message(
+        mode="info",
+        msg=f"backfill ⊱ {backfill_id} ⊰ from ⊱ {start} ⊰ to ⊱ {end} ⊰, ⊱ {len(remaining_chunks)} ⊰ of ⊱ {len(chunks)} ⊰ chunks remaining",
+    )
+    if not remaining_chunks:
+        return
+
+    outbox: Outbox = get_outbox(shard_index=shard_index, shard_count=shard_count)
+
+    # events are still persisted to the outbox if redmine is not available
+    redmine_session: tuple[Redmine, User] | None = warm_up_redmine(
+        issue_subjects=[wse["redmine_issue_subject"] for wse in windows_security_events]
+    )
+    if not redmine_session:
+        log_message(
+            mode="error",
+            msg="redmine authentication failed, backfilled events are kept in the outbox",
+        )
+
+    def backfill_chunk(chunk: tuple[datetime, datetime]) -> bool:
+        # each chunk is matched on its own copy with its own spill, the events lists are updated while parsing
+        event_spill: EventSpill = EventSpill()
+        parsed_events, failed_targets = search_and_parse_events(
+            qradars=qradars,
+            qradar_configs=qradar_configs,
+            windows_security_events=deepcopy(windows_security_events),
+            time_range=chunk,
+            event_spill=event_spill,
+        )
+        if parsed_events is None:
+            return False
+
+        if parsed_events:
+            enqueue_parsed_events(
+                outbox=outbox, parsed_events=parsed_events, event_spill=event_spill
+            )
+        # the chunk is searched again on all targets when the backfill is resumed, the events already
+        # upserted from the succeeded targets are skipped by the issues' journal check
+        if failed_targets:
+            return False
+
+        checkpoint.complete_chunk(chunk=chunk, event_count=len(parsed_events))
+        return True
+
+    failed_chunk_count: int = 0
+    with ThreadPoolExecutor(
+        max_workers=max(parallelism, 1), thread_name_prefix="backfill"
+    ) as executor:
+        futures: dict[Future[bool], tuple[datetime, datetime]] = {
+            executor.submit(backfill_chunk, chunk): chunk for chunk in remaining_chunks
+        }
+        for future in as_completed(futures):
+            chunk: tuple[datetime, datetime] = futures[future]
+            try:
+                is_chunk_completed: bool = future.result()
+            except Exception as e:
+                log_message(
+                    mode="error",
+                    msg=f"unexpected error occured ⊱ {e} ⊰ while backfilling chunk ⊱ {chunk[0]} - {chunk[1]} ⊰",
+                )
+                is_chunk_completed = False
+
+            if not is_chunk_completed:
+                failed_chunk_count += 1
+                log_message(
+                    mode="error",
+                    msg=f"chunk ⊱ {chunk[0]} - {chunk[1]} ⊰ failed, it will be retried when the backfill is resumed",
+                )
+
+            # deliver from the main thread only, so an outbox event is never upserted twice
+            if redmine_session:
+                redmine, redmine_user = redmine_session
+                outbox.drain(
+                    deliver=lambda event: deliver_wse_event(
+                        redmine=redmine, redmine_user=redmine_user, event_to_upsert=event
+                    ),
+                    limiter=redmine.rate_controller,
+                )
+
+    log_message(
+        mode="info" if not failed_chunk_count else "warning",
+        msg=f"backfill ⊱ {backfill_id} ⊰ finished, ⊱ {len(remaining_chunks) - failed_chunk_count} ⊰ chunks completed, ⊱ {failed_chunk_count} ⊰ failed",
+    )
@@ -0,0 +1,320 @@
+from copy import deepcopy
+from dataclasses import dataclass
+from datetime import datetime
+from json import dump as json_dump, load as json_load
+from pathlib import Path
+from platform import python_version
+from statistics import median
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import Any, Callable
+import gc
+import logging
+
+from src.config.config import load_windows_security_events
+from src.services.qradar.matcher import RuleIndex
+from src.services.qradar.normalizer import FieldNormalizer
+from src.services.qradar.qradar import QRadar
+from src.services.redmine.redmine import log_message
+from src.services.redmine.stub import StubRedmine
+from .generators import (
+    generate_event_texts,
+    generate_searched_events,
+    generate_windows_security_events,
+    generate_wse_issue,
+)
+
+
+BASELINE_FILE_PATH: Path = Path(__file__).parent / "baselines.json"
+
+
+@dataclass
+class BenchmarkCase:
+    """A hot path benchmark, setup prepares fresh arguments for each repeat and only run is timed.
+
+    Attributes
+    ----------
+    name : str
+        Benchmark name with its parameters, e.g. **parse_searched_events[rows=1000,rules=10,list=10]**
+    setup : Callable[[], Any]
+        Prepare the arguments of a repeat, it is not timed.
+    run : Callable[[Any], Any]
+        The timed hot path call with the prepared arguments.
+    """
+
+    name: str
+    setup: Callable[[], Any]
+    run: Callable[[Any], Any]
+
+
+def parse_searched_events_case(rows: int, rules: int, list_size: int) -> BenchmarkCase:
+    """Match the generated rows with the generated rules, as the search results are matched in app.main."""
+
+    qradar: QRadar = QRadar(url="http://qradar.benchmark", username="", password="")
+    windows_security_events: list[dict[str, Any]] = generate_windows_security_events(
+        rule_count=rules, list_size=list_size
+    )
+    searched_events: list[dict[str, Any]] = generate_searched_events(
+        row_count=rows, windows_security_events=windows_security_events
+    )
+
+    def run(wse: list[dict[str, Any]]) -> None:
+        rule_index: RuleIndex = qradar.build_rule_index(windows_security_events=wse)
+        for searched_event in searched_events:
+            qradar.parse_searched_events(searched_event=searched_event, rule_index=rule_index)
+
+    return BenchmarkCase(
+        name=f"parse_searched_events[rows={rows},rules={rules},list={list_size}]",
+        setup=lambda: deepcopy(windows_security_events),
+        run=run,
+    )
+
+
+def is_field_value_empty_case(values: int) -> BenchmarkCase:
+    """Check the emptiness of the row fields, it is called 4 times per searched row."""
+
+    fields: list[Any] = (["user", "", None, "N/A", "-", 0, "group"] * values)[:values]
+
+    def run(_) -> None:
+        for field in fields:
+            QRadar.is_field_value_empty(field=field)
+
+    return BenchmarkCase(
+        name=f"is_field_value_empty[values={values}]", setup=lambda: None, run=run
+    )
+
+
+def normalize_fields_case(values: int) -> BenchmarkCase:
+    """Normalise the users of the rows with case folding, domain stripping and empty sentinels, 3 times per searched row."""
+
+    fields: list[Any] = (
+        ["CORP\\Alice", "alice@corp.example.com", "ALICE", "", None, "N/A", "-", "bob"] * values
+    )[:values]
+
+    def run(field_normalizer: FieldNormalizer) -> None:
+        for field in fields:
+            field_normalizer.normalize_user(value=field)
+
+    return BenchmarkCase(
+        name=f"normalize_fields[values={values}]",
+        setup=lambda: FieldNormalizer(
+            case_fold=True, user_format="name", empty_values=("N/A", "-", "None")
+        ),
+        run=run,
+    )
+
+
+def load_issue_template_case(events: int) -> BenchmarkCase:
+    """Render the issue description template with the events, as each created or updated issue does."""
+
+    redmine: StubRedmine = StubRedmine()
+    event_texts: list[str] = generate_event_texts(event_count=events)
+
+    return BenchmarkCase(
+        name=f"load_issue_template[events={events}]",
+        setup=lambda: None,
+        run=lambda _: redmine.load_issue_template(
+            subject="Benchmark Event (Event Id: 4000)",
+            user="Benchmark User",
+            priority_id=2,
+            event_id="4000",
+            event_desc="A Windows event with ID 4000 was observed.",
+            events=event_texts,
+            event_log="<13>4000 Microsoft-Windows-Security-Auditing " + "x" * 600,
+            issue_id=1,
+            sources=["eu", "us"],
+        ),
+    )
+
+
+def upsert_journal_dedup_case(events: int, journals: int) -> BenchmarkCase:
+    """Upsert events which are all in the issue journals, so only the description & journal dedup runs."""
+
+    redmine: StubRedmine = StubRedmine()
+    redmine_user = redmine.auth()
+    event_texts: list[str] = generate_event_texts(event_count=events)
+    issue_subject: str = "Benchmark Event (Event Id: 4000)"
+    event_to_upsert: dict[str, Any] = {
+        "event_id": "4000",
+        "redmine_issue_subject": issue_subject,
+        "redmine_issue_description": "A Windows event with ID 4000 was observed.",
+        "redmine_issue_priority_id": 2,
+        "events": event_texts,
+        "event_log": "",
+    }
+
+    def setup() -> None:
+        # the prefetched issue is popped by the upsert, so it is prepared for each repeat
+        redmine.prefetched_wse_issues = {
+            issue_subject: [generate_wse_issue(events=event_texts, journal_count=journals)]
+        }
+
+    return BenchmarkCase(
+        name=f"upsert_journal_dedup[events={events},journals={journals}]",
+        setup=setup,
+        run=lambda _: redmine.upsert_wse_event(
+            redmine_user=redmine_user, event_to_upsert=event_to_upsert
+        ),
+    )
+
+
+def load_windows_security_events_case(rules: int, list_size: int) -> BenchmarkCase:
+    """Load a generated rule file, as each run and each backfill chunk does."""
+
+    temp_dir: TemporaryDirectory = TemporaryDirectory(prefix="wse-benchmark-")
+    file_path: Path = Path(temp_dir.name) / "windows_security_events.json"
+    with open(file=file_path, mode="w", encoding="utf-8") as f:
+        json_dump(
+            generate_windows_security_events(rule_count=rules, list_size=list_size), f
+        )
+
+    return BenchmarkCase(
+        name=f"load_windows_security_events[rules={rules},list={list_size}]",
+        # keep a reference of the temporary folder, so it is removed with the case
+        setup=lambda: temp_dir,
+        # an absolute file name replaces the data/ folder in the joined path
+        run=lambda _: load_windows_security_events(file_name=file_path.as_posix()),
+    )
+
+
+def get_benchmark_cases() -> list[BenchmarkCase]:
+    """Get the benchmark cases of the hot paths with the synthetic data sizes."""
+
+    return [
+        parse_searched_events_case(rows=1000, rules=10, list_size=10),
+        parse_searched_events_case(rows=10000, rules=10, list_size=10),
+        parse_searched_events_case(rows=1000, rules=100, list_size=1000),
+        is_field_value_empty_case(values=10000),
+        normalize_fields_case(values=10000),
+        load_issue_template_case(events=10),
+        load_issue_template_case(events=1000),
+        upsert_journal_dedup_case(events=100, journals=10),
+        upsert_journal_dedup_case(events=500, journals=200),
+        load_windows_security_events_case(rules=10, list_size=10),
+        load_windows_security_events_case(rules=1000, list_size=100),
+    ]
+
+
+def measure(case: BenchmarkCase, repeat: int = 5) -> dict[str, float]:
+    """Time the benchmark case's run in each repeat after a warm-up run.
+
+    Parameters
+    ----------
+    case : BenchmarkCase
+        The benchmark case to time.
+    repeat : int, optional
+        Number of timed runs, by default 5.
+
+    Returns
+    -------
+    dict[str, float]
+        Minimum and median run durations in milliseconds.
+    """
+
+    # an untimed run first, so the imports & caches of the first call are not measured
+    case.run(case.setup())
+
+    durations: list[float] = []
+    for _ in range(repeat):
+        args: Any = case.setup()
+        # the garbage collection of the setup's allocations is not a part of the hot path, as in timeit
+        gc.collect()
+        gc.disable()
+        try:
+            started_at: float = perf_counter()
+            case.run(args)
+            durations.append(perf_counter() - started_at)
+        finally:
+            gc.enable()
+
+    return {
+        "min_ms": round(min(durations) * 1000, 4),
+        "median_ms": round(median(durations) * 1000, 4),
+    }
+
+
+def run_benchmarks(
+    repeat: int = 5,
+    name_filter: str | None = None,
+    threshold: float = 20,
+    baseline_path: Path = BASELINE_FILE_PATH,
+    save_baseline: bool = False,
+) -> bool:
+    """Run the hot path benchmarks and compare them with the stored baselines.
+
+    Parameters
+    ----------
+    repeat : int, optional
+        Number of timed runs of each benchmark, by default 5.
+    name_filter : str | None, optional
+        Run only the benchmarks whose name contains it, by default None.
+    threshold : float, optional
+        Maximum allowed slowdown of the minimum duration in percent, by default 20.
+    baseline_path : Path, optional
+        Baselines JSON file, by default **src/benchmarks/baselines.json**
+    save_baseline : bool, optional
+        Write the results as the new baselines instead of comparing them, by default False.
+
+    Returns
+    -------
+    bool
+        False if any benchmark regressed more than the threshold, True otherwise.
+    """
+
+    baselines: dict[str, dict[str, float]] = {}
+    if baseline_path.exists():
+        with open(file=baseline_path, encoding="utf-8") as f:
+            baselines = json_load(f).get("benchmarks", {})
+
+    # the upserts log each call, keep the timings free of the console output
+    logging.disable(level=logging.WARNING)
+    try:
+        results: dict[str, dict[str, float]] = {
+            case.name: measure(case=case, repeat=repeat)
+            for case in get_benchmark_cases()
+            if not name_filter or name_filter in case.name
+        }
+    finally:
+        logging.disable(level=logging.NOTSET)
+
+    if save_baseline:
+        with open(file=baseline_path, mode="w", encoding="utf-8") as f:
+            json_dump(
+                {
+                    "created_at": datetime.now().isoformat(timespec="seconds"),
+                    "python": python_version(),
+                    "benchmarks": baselines | results,
+                },
+                f,
+                indent=2,
+            )
+        log_message(
+            mode="info",
+            msg=f"⊱ {len(results)} ⊰ benchmark baselines saved to ⊱ {baseline_path} ⊰",
+        )
+        return True
+
+    is_passed: bool = True
+    for name, result in results.items():
+        baseline: dict[str, float] | None = baselines.get(name)
+        if not baseline:
+            log_message(
+                mode="info",
+                msg=f"{name} ⊱ {result['min_ms']} ms ⊰ (no baseline)",
+            )
+            continue
+
+        change: float = (result["min_ms"] / baseline["min_ms"] - 1) * 100
+        if change > threshold:
+            is_passed = False
+            log_message(
+                mode="error",
+                msg=f"{name} ⊱ {result['min_ms']} ms ⊰ regressed ⊱ {change:+.1f}% ⊰ from the baseline ⊱ {baseline['min_ms']} ms ⊰",
+            )
+        else:
+            log_message(
+                mode="info",
+                msg=f"{name} ⊱ {result['min_ms']} ms ⊰ ({change:+.1f}% from the baseline)",
+            )
+
+    return is_passed
@@ -0,0 +1,150 @@
+from random import Random
+from types import SimpleNamespace
+from typing import Any
+
+from src.services.qradar.qradar import PostArielSearchResultItem
+
+
+EVENT_TEXT: str = "<li>User <b>{dst_user}</b> was added to the group <b>{group_name}</b> by <b>{src_user}</b>.</li>"
+
+
+def generate_windows_security_events(
+    rule_count: int, list_size: int, seed: int = 0
+) -> list[dict[str, Any]]:
+    """Generate windows security event rules with excluded (and on every other rule, included) lists.
+
+    Parameters
+    ----------
+    rule_count : int
+        Number of rules, each one with its own event id.
+    list_size : int
+        Number of users/groups in each excluded & included list.
+    seed : int, optional
+        Random seed, by default 0.
+
+    Returns
+    -------
+    list[dict[str, Any]]
+        Rules in the windows_security_events.json format.
+    """
+
+    random: Random = Random(seed)
+    windows_security_events: list[dict[str, Any]] = []
+    for i in range(rule_count):
+        event_id: str = str(4000 + i)
+        wse: dict[str, Any] = {
+            "event_id": event_id,
+            "event_name": f"benchmark event {event_id}",
+            "redmine_issue_subject": f"Benchmark Event (Event Id: {event_id})",
+            "redmine_issue_description": f"A Windows event with ID {event_id} was observed.",
+            "redmine_issue_priority_id": random.randint(1, 5),
+            "event_text": EVENT_TEXT,
+            "events": [],
+            "event_log": "",
+            "excluded_src_users": [f"excluded-admin{j}" for j in range(list_size)],
+            "excluded_dst_users": [f"excluded-user{j}" for j in range(list_size)],
+            "excluded_groups": [f"excluded-group{j}" for j in range(list_size)],
+        }
+        if i % 2:
+            wse["included_groups"] = [f"group{j}" for j in range(list_size)]
+        windows_security_events.append(wse)
+
+    return windows_security_events
+
+
+def generate_searched_events(
+    row_count: int,
+    windows_security_events: list[dict[str, Any]],
+    user_count: int = 500,
+    seed: int = 0,
+) -> list[PostArielSearchResultItem]:
+    """Generate searched event rows for the rules, a part of them hit the excluded & included lists.
+
+    Parameters
+    ----------
+    row_count : int
+        Number of rows.
+    windows_security_events : list[dict[str, Any]]
+        Rules to generate the rows for.
+    user_count : int, optional
+        Number of distinct users, so the number of distinct matched events, by default 500.
+    seed : int, optional
+        Random seed, by default 0.
+
+    Returns
+    -------
+    list[PostArielSearchResultItem]
+        Rows as returned by the ariel search results.
+    """
+
+    random: Random = Random(seed)
+    searched_events: list[PostArielSearchResultItem] = []
+    for _ in range(row_count):
+        wse: dict[str, Any] = random.choice(windows_security_events)
+        excluded_users: list[str] = wse.get("excluded_dst_users", [])
+        included_groups: list[str] = wse.get("included_groups", [])
+        searched_events.append(
+            {
+                "event_id": wse["event_id"],
+                "src_user": f"admin{random.randint(1, 20)}",
+                "dst_user": (
+                    random.choice(excluded_users)
+                    if excluded_users and random.random() < 0.1
+                    else f"user{random.randint(1, user_count)}"
+                ),
+                "group_name": (
+                    random.choice(included_groups)
+                    if included_groups and random.random() < 0.8
+                    else f"group{random.randint(1, 50)}"
+                ),
+                "log": f"<13>{wse['event_id']} Microsoft-Windows-Security-Auditing " + "x" * 600,
+            }
+        )
+
+    return searched_events
+
+
+def generate_event_texts(event_count: int, seed: int = 0) -> list[str]:
+    """Generate distinct formatted event texts as they are in the matched events lists."""
+
+    random: Random = Random(seed)
+    return [
+        EVENT_TEXT.format(
+            dst_user=f"user{i}",
+            group_name=f"group{random.randint(1, 50)}",
+            src_user=f"admin{random.randint(1, 20)}",
+        )
+        for i in range(event_count)
+    ]
+
+
+def generate_wse_issue(
+    events: list[str], journal_count: int, issue_id: int = 1
+) -> SimpleNamespace:
+    """Generate a wse issue whose journal notes contain all the events, split between the journals.
+
+    Parameters
+    ----------
+    events : list[str]
+        Event texts to write to the journal notes.
+    journal_count : int
+        Number of journals.
+    issue_id : int, optional
+        Issue id, by default 1.
+
+    Returns
+    -------
+    SimpleNamespace
+        Issue with the id, description and journals attributes used by the upsert.
+    """
+
+    journal_count = max(journal_count, 1)
+    chunk_size: int = -(-len(events) // journal_count)
+    return SimpleNamespace(
+        id=issue_id,
+        description="<p>benchmark issue description</p>\r\n" * 20,
+        journals=[
+            SimpleNamespace(notes="".join(events[i * chunk_size : (i + 1) * chunk_size]))
+            for i in range(journal_count)
+        ],
+    )
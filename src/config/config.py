@@ -1,9 +1,13 @@
+from fcntl import flock, LOCK_EX, LOCK_UN
 from json import load as json_load, JSONDecodeError
 from pathlib import Path
 from typing import Any
+from urllib.parse import urlparse
 
 from dotenv import dotenv_values, set_key
 
+from src.services.qradar.matcher import validate_rule_patterns
+
 
 ROOT_FOLDER_PATH: Path = Path(__file__).parent.parent.parent
 
@@ -13,6 +17,8 @@ CONFIG_FOLDER_PATH: Path = PROJECT_FOLDER_PATH / "config"
 
 ENV_FOLDER_PATH: Path = CONFIG_FOLDER_PATH / ".env"
 
+ENV_LOCK_FILE_PATH: Path = CONFIG_FOLDER_PATH / ".env.lock"
+
 DATA_FOLDER_PATH: Path = PROJECT_FOLDER_PATH / "data"
 
 
@@ -28,6 +34,12 @@ def load_config() -> dict[str, str | None]:
     return dict(dotenv_values(dotenv_path=ENV_FOLDER_PATH))
 
 
+def is_config_enabled(config: dict[str, str | None], key: str) -> bool:
+    """Is the boolean setting enabled in the config, e.g. PROFILE or a target's QRADAR_LEAN_FETCH ("1", "true" or "yes")."""
+
+    return (config.get(key) or "").lower() in ("1", "true", "yes")
+
+
 def update_config_key(key: str, value: str) -> None:
     """Update the value of a key in the .env file.
 
@@ -37,28 +49,40 @@ def update_config_key(key: str, value: str) -> None:
         Key to set.
     value : str
         Value to set for the key.
+
+    - The .env file is rewritten under an exclusive file lock, so the worker shards can update it at the same time.
     """
 
-    set_key(
-        dotenv_path=ENV_FOLDER_PATH,
-        key_to_set=key,
-        value_to_set=value,
-        quote_mode="never",
-    )
+    with open(file=ENV_LOCK_FILE_PATH, mode="a") as lock_file:
+        flock(lock_file.fileno(), LOCK_EX)
+        try:
+            set_key(
+                dotenv_path=ENV_FOLDER_PATH,
+                key_to_set=key,
+                value_to_set=value,
+                quote_mode="never",
+            )
+        finally:
+            flock(lock_file.fileno(), LOCK_UN)
 
 
-def load_qradar_config(config: dict[str, str | None]) -> dict[str, str | None]:
+def load_qradar_config(
+    config: dict[str, str | None], target: str | None = None
+) -> dict[str, str | None]:
     """Load qradar configuration with the given config parameter.
 
     Parameters
     ----------
     config : dict[str, str | None]
         The configuration settings as a dictionary from the .env file.
+    target : str | None, optional
+        Name of the qradar target (console) in QRADAR_TARGETS. If given, the target's QRADAR_<TARGET>_* keys
+        override the common QRADAR_* keys, e.g. QRADAR_EU_URL overrides QRADAR_URL. Default is None.
 
     Returns
     -------
     dict[str, str | None]
-        qradar configuration settings, if all the expected parameters are found. Otherwise, raises ValueError.
+        qradar configuration settings with the QRADAR_TARGET name, if all the expected parameters are found. Otherwise, raises ValueError.
 
     Raises
     ------
@@ -70,6 +94,14 @@ def load_qradar_config(config: dict[str, str | None]) -> dict[str, str | None]:
         k: v for k, v in config.items() if k.startswith("QRADAR_")
     }
 
+    if target:
+        target_prefix: str = f"QRADAR_{target.upper()}_"
+        qradar_config |= {
+            f"QRADAR_{k.removeprefix(target_prefix)}": v
+            for k, v in config.items()
+            if k.startswith(target_prefix) and v
+        }
+
     required_config_keys: list[str] = [
         "QRADAR_URL",
         "QRADAR_USERNAME",
@@ -77,15 +109,49 @@ def load_qradar_config(config: dict[str, str | None]) -> dict[str, str | None]:
         "QRADAR_EVENT_IDS_QUERY",
     ]
     missing_config_keys: list[str] = [
-        k for k in required_config_keys if not config.get(k)
+        k for k in required_config_keys if not qradar_config.get(k)
     ]
     if missing_config_keys:
+        if target:
+            missing_config_keys = [
+                k.replace("QRADAR_", f"QRADAR_{target.upper()}_", 1)
+                for k in missing_config_keys
+            ]
         error_msg: str = f"{', '.join(missing_config_keys)} not found in .env file"
         raise ValueError(error_msg)
 
+    qradar_config["QRADAR_TARGET"] = target or urlparse(qradar_config["QRADAR_URL"]).hostname
     return qradar_config
 
 
+def load_qradar_targets(config: dict[str, str | None]) -> list[dict[str, str | None]]:
+    """Load the configuration of each qradar target (console) in QRADAR_TARGETS to search them in one run.
+
+    Parameters
+    ----------
+    config : dict[str, str | None]
+        The configuration settings as a dictionary from the .env file.
+
+    Returns
+    -------
+    list[dict[str, str | None]]
+        qradar configuration settings of each target, only the common QRADAR_* settings if QRADAR_TARGETS is not set.
+
+    Raises
+    ------
+    ValueError
+        - If the required keys of any target are not found in .env file.
+    """
+
+    targets: list[str] = [
+        t.strip() for t in (config.get("QRADAR_TARGETS") or "").split(",") if t.strip()
+    ]
+    if not targets:
+        return [load_qradar_config(config=config)]
+
+    return [load_qradar_config(config=config, target=target) for target in targets]
+
+
 def load_redmine_config(config: dict[str, str | None]) -> dict[str, str | None]:
     """Load redmine configuration with the given config parameter.
 
@@ -140,7 +206,7 @@ def load_windows_security_events(
     FileNotFoundError
         If the file is not found in data/ folder.
     ValueError
-        If the file is empty.
+        If the file is empty or a rule has an invalid include/exclude pattern.
     JSONDecodeError
         If the file is not a valid JSON file.
     """
@@ -154,6 +220,8 @@ def load_windows_security_events(
             file_content: list[dict[str, Any]] = json_load(fp=f)
             if not file_content:
                 raise ValueError(f"{file_name} not contains any data")
+            # report the invalid include/exclude patterns before any search
+            validate_rule_patterns(windows_security_events=file_content)
             return file_content
         except JSONDecodeError as e:
             raise JSONDecodeError(
@@ -0,0 +1,56 @@
+from time import sleep
+
+from src.app import get_next_run_seconds, get_run_interval, main
+from src.config.config import load_config
+from src.services.msteams.teams import MsTeams, log_message
+from src.utils.constants import CONFIG
+from src.utils.metrics import start_metrics_server
+
+
+def run_daemon(shard_index: int = 0, shard_count: int = 1, metrics_port: int = 9108) -> None:
+    """Run the app in a loop in one process and serve the metrics on /metrics while it is running.
+
+    The runs are started every QRADAR_MIN_QUERY_INTERVAL minutes (15 by default), as the one-shot runs
+    started by cron are. The .env file is read again before each run, so the QRADAR_QUERY_INTERVAL updated
+    by the previous run is used as the search window, its growth after the empty runs doesn't delay the runs.
+    If the rules have cadences, the daemon waits until the next rule is due instead.
+
+    Only the keys read from CONFIG during the run are reloaded (the QRADAR_* keys of the targets, the
+    REDMINE_URL & REDMINE_KEY and the query intervals). The settings of src.utils.constants are read once
+    when the daemon is started (e.g. RUN_DEADLINE_SECONDS, OUTBOX_*, REDMINE_*_PROJECT_*, TEAMS_*,
+    RULE_PRIORITY_CADENCE, FIELD_*), the daemon must be restarted to change them.
+
+    Parameters
+    ----------
+    shard_index : int, optional
+        Index of this worker's shard, by default 0.
+    shard_count : int, optional
+        Number of worker shards, by default 1.
+    metrics_port : int, optional
+        Port of the metrics endpoint, by default 9108.
+    """
+
+    start_metrics_server(port=metrics_port)
+    log_message(
+        mode="info",
+        msg=f"daemon started, metrics are served on ⊱ :{metrics_port}/metrics ⊰",
+    )
+
+    while True:
+        # reload the .env file in place for the keys read from CONFIG during the run,
+        # the constants derived from it at import time keep their values until the daemon is restarted
+        CONFIG.clear()
+        CONFIG.update(load_config())
+
+        try:
+            main(shard_index=shard_index, shard_count=shard_count)
+            next_run_seconds: float = get_next_run_seconds(
+                shard_index=shard_index, shard_count=shard_count
+            )
+        except Exception as e:
+            # a failed run must not stop the daemon, the next run is tried after the run interval
+            log_message(mode="critical", msg=f"unexpected error occured ⊱ {e} ⊰")
+            MsTeams.send_message(msg=f"critical error occurred ⊱ {e} ⊰")
+            next_run_seconds = get_run_interval() * 60
+
+        sleep(next_run_seconds)
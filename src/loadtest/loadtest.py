@@ -0,0 +1,188 @@
+from collections import defaultdict
+from contextlib import contextmanager, ExitStack
+from functools import wraps
+from json import dump as json_dump
+from statistics import quantiles
+from tempfile import TemporaryDirectory
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Callable, Iterator
+
+from src import app
+from src.config.config import load_windows_security_events
+from src.services.qradar.qradar import QRadar
+from src.services.redmine.redmine import Redmine, log_message
+from src.utils.constants import CONFIG
+from src.utils.state import use_state_folder
+from .standins import QRadarStandIn, RedmineStandIn
+
+
+# phase name > (owner of the timed function, function name)
+TIMED_PHASES: dict[str, tuple[Any, str]] = {
+    "search_create": (QRadar, "post_create_search_by_aql_query"),
+    "search_poll": (QRadar, "wait_for_search_by_search_id"),
+    "search_fetch": (QRadar, "get_search_results_by_search_id"),
+    "match_row": (QRadar, "parse_searched_events"),
+    "redmine_warm_up": (app, "warm_up_redmine"),
+    "upsert": (Redmine, "upsert_wse_event"),
+}
+
+
+@contextmanager
+def time_phases(durations: dict[str, list[float]]) -> Iterator[dict[str, list[float]]]:
+    """Record the duration of each call of the phase functions in TIMED_PHASES while in the context.
+
+    Parameters
+    ----------
+    durations : dict[str, list[float]]
+        Durations in seconds per phase name, appended by the wrapped functions.
+    """
+
+    def timed(phase: str, func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(*args, **kwargs) -> Any:
+            started_at: float = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                durations[phase].append(perf_counter() - started_at)
+
+        return wrapper
+
+    originals: list[tuple[Any, str, Callable]] = []
+    try:
+        for phase, (owner, name) in TIMED_PHASES.items():
+            func: Callable = getattr(owner, name)
+            originals.append((owner, name, func))
+            setattr(owner, name, timed(phase=phase, func=func))
+        yield durations
+    finally:
+        for owner, name, func in originals:
+            setattr(owner, name, func)
+
+
+def get_percentiles(durations: list[float]) -> dict[str, float]:
+    """Get the call count, p50 and p99 of the durations in milliseconds."""
+
+    if len(durations) < 2:
+        p50 = p99 = durations[0] if durations else 0.0
+    else:
+        cut_points: list[float] = quantiles(durations, n=100, method="inclusive")
+        p50, p99 = cut_points[49], cut_points[98]
+
+    return {
+        "calls": len(durations),
+        "p50_ms": round(p50 * 1000, 3),
+        "p99_ms": round(p99 * 1000, 3),
+    }
+
+
+def run_load_test(
+    runs: int = 10,
+    rows: int = 1000,
+    latency: float = 0.005,
+    search_seconds: float = 0.5,
+    output_path: Path | None = None,
+) -> dict[str, Any]:
+    """Drive the full app.main flow against the local QRadar and Redmine stand-ins and measure its throughput.
+
+    The configuration is pointed to the stand-ins in memory, the .env file is not updated and the
+    state (outbox, searches, locks) is kept in a temporary folder, so the real state is not touched.
+
+    Parameters
+    ----------
+    runs : int, optional
+        Number of app.main runs. Default is 10.
+    rows : int, optional
+        Number of rows returned by each search. Default is 1000.
+    latency : float, optional
+        Seconds added to each stand-in response. Default is 0.005.
+    search_seconds : float, optional
+        Seconds until a search of the QRadar stand-in is completed. Default is 0.5.
+    output_path : Path | None, optional
+        JSON file to write the report. Default is None.
+
+    Returns
+    -------
+    dict[str, Any]
+        Report with the runs/sec, rows/sec and the p50/p99 of each phase.
+    """
+
+    qradar_stand_in: QRadarStandIn = QRadarStandIn(
+        windows_security_events=load_windows_security_events(),
+        row_count=rows,
+        search_seconds=search_seconds,
+        latency=latency,
+    ).start()
+    redmine_stand_in: RedmineStandIn = RedmineStandIn(latency=latency).start()
+
+    overrides: dict[str, str] = {
+        "QRADAR_URL": qradar_stand_in.url,
+        "QRADAR_USERNAME": "loadtest",
+        "QRADAR_PASSWORD": "loadtest",
+        "QRADAR_TARGETS": "",
+        "QRADAR_CAPTURE_FOLDER": "",
+        "QRADAR_SEARCH_REUSE_TTL": "0",
+        "QRADAR_EVENT_IDS_QUERY": CONFIG.get("QRADAR_EVENT_IDS_QUERY")
+        or 'select "Event ID" as event_id from events where "Event ID" in ({event_ids}) last 15 minutes',
+        "REDMINE_URL": redmine_stand_in.url,
+        "REDMINE_KEY": "loadtest",
+    }
+    original_config: dict[str, str | None] = dict(CONFIG)
+    original_update_config_key: Callable = app.update_config_key
+    durations: dict[str, list[float]] = defaultdict(list)
+
+    log_message(
+        mode="info",
+        msg=f"load test started ⊱ {runs} ⊰ runs of ⊱ {rows} ⊰ rows with ⊱ {latency} ⊰ seconds latency",
+    )
+    try:
+        with ExitStack() as stack:
+            state_folder: str = stack.enter_context(
+                TemporaryDirectory(prefix="wse-loadtest-")
+            )
+            stack.enter_context(use_state_folder(folder_path=Path(state_folder)))
+            stack.enter_context(time_phases(durations=durations))
+
+            CONFIG.update(overrides)
+            # keep the query interval updates in memory, the .env file is not rewritten by the load test
+            app.update_config_key = lambda key, value: CONFIG.update({key: value})
+
+            started_at: float = perf_counter()
+            for _ in range(runs):
+                run_started_at: float = perf_counter()
+                app.main()
+                durations["run"].append(perf_counter() - run_started_at)
+            total_duration: float = perf_counter() - started_at
+    finally:
+        app.update_config_key = original_update_config_key
+        CONFIG.clear()
+        CONFIG.update(original_config)
+        qradar_stand_in.stop()
+        redmine_stand_in.stop()
+
+    report: dict[str, Any] = {
+        "runs": runs,
+        "rows_per_run": rows,
+        "latency_seconds": latency,
+        "total_seconds": round(total_duration, 3),
+        "runs_per_second": round(runs / total_duration, 3),
+        "rows_per_second": round(runs * rows / total_duration, 1),
+        "phases": {
+            phase: get_percentiles(durations=phase_durations)
+            for phase, phase_durations in durations.items()
+        },
+        "requests": {
+            "qradar": qradar_stand_in.request_count,
+            "redmine": redmine_stand_in.request_count,
+        },
+        "redmine_issues": len(redmine_stand_in.issues),
+        "redmine_uploaded_bytes": redmine_stand_in.uploaded_bytes,
+    }
+    log_message(mode="info", msg=f"load test finished ⊱ {report} ⊰")
+
+    if output_path:
+        with open(file=output_path, mode="w", encoding="utf-8") as f:
+            json_dump(report, f, ensure_ascii=False, indent=2)
+
+    return report
@@ -0,0 +1,350 @@
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import count
+from json import dumps as json_dumps, loads as json_loads
+from random import Random
+from re import compile as re_compile, IGNORECASE, Pattern
+from threading import Lock, Thread
+from time import monotonic, sleep
+from typing import Any, Iterator
+from urllib.parse import parse_qs, urlparse
+from uuid import uuid4
+
+
+# the identifiers of a log search, see build_log_query
+LOG_SEARCH_IDENTIFIER_PATTERN: Pattern = re_compile(r"starttime = (\d+) and qid = (\d+)")
+# a lean search selects the identifiers without the log column, see build_lean_query
+LEAN_SEARCH_PATTERN: Pattern = re_compile(r"^\s*select\s+starttime\s*,\s*qid\s*,", flags=IGNORECASE)
+LOG_ITEM_PATTERN: Pattern = re_compile(r"\s+as\s+\"?log\"?\s*(,|from\s)", flags=IGNORECASE)
+# a count probe selects the rows' counts by event id, see build_count_query
+COUNT_SEARCH_PATTERN: Pattern = re_compile(r"count\(\*\)\s+as\s+event_count", flags=IGNORECASE)
+
+
+class StandInServer:
+    """Local HTTP server in a daemon thread, base of the QRadar and Redmine stand-ins.
+
+    Attributes
+    ----------
+    latency : float
+        Seconds to wait before answering each request.
+    request_count : int
+        Number of handled requests.
+    server : ThreadingHTTPServer
+        Underlying HTTP server, listening on a random local port.
+
+    Methods
+    -------
+    - start() -> StandInServer
+    - stop() -> None
+    - handle(method: str, path: str, query: dict[str, list[str]], headers: dict[str, str], body: Any) -> tuple[int, Any]
+    """
+
+    def __init__(self, latency: float = 0) -> None:
+        self.latency: float = latency
+        self.request_count: int = 0
+        self._lock: Lock = Lock()
+
+        stand_in: StandInServer = self
+
+        class RequestHandler(BaseHTTPRequestHandler):
+            def log_message(self, *_) -> None:
+                pass
+
+            def do_request(self) -> None:
+                if stand_in.latency:
+                    sleep(stand_in.latency)
+
+                content_length: int = int(self.headers.get("Content-Length") or 0)
+                raw_body: bytes = self.rfile.read(content_length) if content_length else b""
+                parsed_url = urlparse(self.path)
+                with stand_in._lock:
+                    stand_in.request_count += 1
+                    status_code, data = stand_in.handle(
+                        method=self.command,
+                        path=parsed_url.path,
+                        query=parse_qs(parsed_url.query),
+                        headers=dict(self.headers),
+                        # the uploads are sent as application/octet-stream, their body is passed as bytes
+                        body=(
+                            json_loads(raw_body)
+                            if raw_body and "json" in (self.headers.get("Content-Type") or "")
+                            else raw_body or None
+                        ),
+                    )
+
+                content: bytes = json_dumps(data).encode("utf-8") if data is not None else b""
+                self.send_response(status_code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            do_GET = do_POST = do_PUT = do_DELETE = do_request
+
+        self.server: ThreadingHTTPServer = ThreadingHTTPServer(
+            ("127.0.0.1", 0), RequestHandler
+        )
+        self.server.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def start(self) -> "StandInServer":
+        Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def handle(
+        self,
+        method: str,
+        path: str,
+        query: dict[str, list[str]],
+        headers: dict[str, str],
+        body: Any,
+    ) -> tuple[int, Any]:
+        raise NotImplementedError
+
+
+class QRadarStandIn(StandInServer):
+    """QRadar Ariel API stand-in, searches complete after a delay and return rows generated from the rules.
+
+    Handled endpoints: POST /api/ariel/searches, GET & DELETE /api/ariel/searches/{search_id},
+    GET /api/ariel/searches/{search_id}/results (with the Range header). The rows have unique starttime & qid
+    identifiers, a query of them without a **log** column returns the rows without the log (lean search) and a query of
+    **starttime = X and qid = Y** conditions returns the generated rows of the identifiers (log search), and a query of
+    **count(*) as event_count** returns the generated rows' counts by event id (count probe).
+
+    Attributes
+    ----------
+    windows_security_events : list[dict[str, Any]]
+        Rules to generate the rows from, some rows use their excluded & included users and groups.
+    row_count : int
+        Number of rows of each search.
+    search_seconds : float
+        Seconds until a created search is completed.
+    """
+
+    def __init__(
+        self,
+        windows_security_events: list[dict[str, Any]],
+        row_count: int = 1000,
+        search_seconds: float = 0.5,
+        latency: float = 0,
+        seed: int = 0,
+    ) -> None:
+        super().__init__(latency=latency)
+        self.windows_security_events: list[dict[str, Any]] = windows_security_events
+        self.row_count: int = row_count
+        self.search_seconds: float = search_seconds
+        self.searches: dict[str, dict[str, Any]] = {}
+        # generated rows by their starttime & qid, for the log searches of the representative rows
+        self.rows: dict[tuple[int, int], dict[str, Any]] = {}
+        self._random: Random = Random(seed)
+        self._row_ids: Iterator[int] = count()
+
+    def handle(self, method, path, query, headers, body) -> tuple[int, Any]:
+        parts: list[str] = [p for p in path.split("/") if p]
+        if parts[:3] != ["api", "ariel", "searches"]:
+            return 404, {"message": "not found"}
+
+        if method == "POST" and len(parts) == 3:
+            search_id: str = str(uuid4())
+            self.searches[search_id] = {
+                "created_at": monotonic(),
+                "query_string": query.get("query_expression", [""])[0],
+            }
+            return 201, self._get_search(search_id=search_id)
+
+        search_id = parts[3] if len(parts) > 3 else ""
+        if search_id not in self.searches:
+            return 404, {"message": f"search {search_id} not found"}
+
+        if method == "DELETE":
+            self.searches.pop(search_id)
+            return 202, self._get_search(search_id=search_id, is_deleted=True)
+
+        if len(parts) == 5 and parts[4] == "results":
+            rows: list[dict[str, str]] = self._get_rows(search_id=search_id)
+            item_range: str | None = headers.get("Range")
+            if item_range:
+                first_item, last_item = map(int, item_range.split("=")[1].split("-"))
+                rows = rows[first_item : last_item + 1]
+            return 200, {"events": rows}
+
+        return 200, self._get_search(search_id=search_id)
+
+    def _get_search(self, search_id: str, is_deleted: bool = False) -> dict[str, Any]:
+        search: dict[str, Any] = self.searches.get(search_id, {})
+        is_completed: bool = is_deleted or (
+            monotonic() - search.get("created_at", 0) >= self.search_seconds
+        )
+        return {
+            "search_id": search_id,
+            "status": "COMPLETED" if is_completed else "EXECUTE",
+            "completed": is_completed,
+            "progress": 100 if is_completed else 50,
+            "record_count": (
+                len(self._get_rows(search_id=search_id)) if is_completed and search else 0
+            ),
+            "query_execution_time": int(self.search_seconds * 1000),
+            "query_string": search.get("query_string", ""),
+        }
+
+    def _get_rows(self, search_id: str) -> list[dict[str, Any]]:
+        search: dict[str, Any] = self.searches[search_id]
+        if "rows" in search:
+            return search["rows"]
+
+        query_string: str = search["query_string"]
+        if "starttime = " in query_string:
+            search["rows"] = [
+                self.rows[identifier]
+                for identifier in (
+                    (int(start_time), int(qid))
+                    for start_time, qid in LOG_SEARCH_IDENTIFIER_PATTERN.findall(query_string)
+                )
+                if identifier in self.rows
+            ]
+            return search["rows"]
+
+        rows: list[dict[str, Any]] = [self._generate_row() for _ in range(self.row_count)]
+        if COUNT_SEARCH_PATTERN.search(query_string):
+            event_counts: Counter[str] = Counter(row["event_id"] for row in rows)
+            search["rows"] = [
+                {"event_id": event_id, "event_count": event_count}
+                for event_id, event_count in event_counts.items()
+            ]
+            return search["rows"]
+
+        self.rows.update(((row["starttime"], row["qid"]), row) for row in rows)
+        is_lean: bool = bool(LEAN_SEARCH_PATTERN.match(query_string)) and not LOG_ITEM_PATTERN.search(
+            query_string
+        )
+        search["rows"] = (
+            [{k: v for k, v in row.items() if k != "log"} for row in rows] if is_lean else rows
+        )
+        return search["rows"]
+
+    def _generate_row(self) -> dict[str, Any]:
+        wse: dict[str, Any] = self._random.choice(self.windows_security_events)
+
+        def pick(key: str, default: str) -> str:
+            # use the rule's own users & groups in a part of the rows to exercise the include/exclude checks
+            values: list[str] = wse.get(f"included_{key}", []) + wse.get(f"excluded_{key}", [])
+            if values and self._random.random() < 0.3:
+                return self._random.choice(values)
+            return default
+
+        row_id: int = next(self._row_ids)
+        return {
+            "starttime": 1_700_000_000_000 + row_id,
+            "qid": 5_000_000 + int(wse["event_id"]),
+            "event_id": wse["event_id"],
+            "src_user": pick(key="src_users", default=f"admin{self._random.randint(1, 20)}"),
+            "dst_user": pick(key="dst_users", default=f"user{self._random.randint(1, 500)}"),
+            "group_name": pick(key="groups", default=f"group{self._random.randint(1, 50)}"),
+            "log": f"<13>{wse['event_id']} Microsoft-Windows-Security-Auditing " + "x" * 600,
+        }
+
+
+class RedmineStandIn(StandInServer):
+    """Redmine REST API stand-in for the calls of redminelib and the async redmine client.
+
+    Handled endpoints: GET /users/current.json, GET /issues.json, POST /issues.json & /projects/{id}/issues.json,
+    GET & PUT /issues/{id}.json, GET /enumerations/issue_priorities.json, POST /uploads.json
+    """
+
+    ISSUE_PRIORITIES: list[dict[str, Any]] = [
+        {"id": 1, "name": "Low"},
+        {"id": 2, "name": "Medium", "is_default": True},
+        {"id": 3, "name": "High"},
+        {"id": 4, "name": "Urgent"},
+        {"id": 5, "name": "Immediate"},
+    ]
+
+    def __init__(self, latency: float = 0) -> None:
+        super().__init__(latency=latency)
+        self.issues: dict[int, dict[str, Any]] = {}
+        self.uploaded_bytes: int = 0
+        self._issue_ids: Iterator[int] = count(start=1)
+
+    def handle(self, method, path, query, headers, body) -> tuple[int, Any]:
+        if path == "/users/current.json":
+            return 200, {
+                "user": {"id": 1, "login": "loadtest", "firstname": "Load", "lastname": "Test"}
+            }
+
+        if path == "/enumerations/issue_priorities.json":
+            return 200, {"issue_priorities": self.ISSUE_PRIORITIES}
+
+        if path == "/uploads.json" and method == "POST":
+            self.uploaded_bytes += len(body or b"")
+            return 201, {"upload": {"id": self.request_count, "token": uuid4().hex}}
+
+        if path == "/issues.json" and method == "GET":
+            subject: str | None = query.get("subject", [None])[0]
+            offset: int = int(query.get("offset", [0])[0])
+            limit: int = int(query.get("limit", [25])[0])
+            issues: list[dict[str, Any]] = sorted(
+                (
+                    self._to_issue(issue=issue)
+                    for issue in self.issues.values()
+                    if subject is None or issue["subject"] == subject
+                ),
+                key=lambda issue: issue["id"],
+                reverse=True,
+            )
+            return 200, {
+                "issues": issues[offset : offset + limit],
+                "total_count": len(issues),
+                "offset": offset,
+                "limit": limit,
+            }
+
+        # redminelib creates the issues of a project on /projects/{project_id}/issues.json
+        if path.endswith("/issues.json") and method == "POST":
+            issue_id: int = next(self._issue_ids)
+            self.issues[issue_id] = {**body["issue"], "id": issue_id, "journals": []}
+            return 201, {"issue": self._to_issue(issue=self.issues[issue_id])}
+
+        if path.startswith("/issues/") and path.endswith(".json"):
+            issue_id = int(path.removeprefix("/issues/").removesuffix(".json"))
+            if issue_id not in self.issues:
+                return 404, None
+
+            if method == "PUT":
+                fields: dict[str, Any] = dict(body["issue"])
+                notes: str | None = fields.pop("notes", None)
+                if notes:
+                    self.issues[issue_id]["journals"].append(
+                        {"id": len(self.issues[issue_id]["journals"]) + 1, "notes": notes}
+                    )
+                self.issues[issue_id].update(fields)
+                return 204, None
+
+            is_journal_included: bool = "journals" in query.get("include", [""])[0]
+            return 200, {
+                "issue": self._to_issue(
+                    issue=self.issues[issue_id], is_journal_included=is_journal_included
+                )
+            }
+
+        return 404, None
+
+    def _to_issue(
+        self, issue: dict[str, Any], is_journal_included: bool = False
+    ) -> dict[str, Any]:
+        return {
+            "id": issue["id"],
+            "subject": issue.get("subject", ""),
+            "description": issue.get("description", ""),
+            "project": {"id": issue.get("project_id"), "name": "loadtest"},
+            "tracker": {"id": issue.get("tracker_id"), "name": "Windows Security Events"},
+            "status": {"id": issue.get("status_id"), "name": "New"},
+            "priority": {"id": issue.get("priority_id"), "name": "Medium"},
+            **({"journals": issue["journals"]} if is_journal_included else {}),
+        }
@@ -0,0 +1,96 @@
+from copy import deepcopy
+from json import dump as json_dump
+from pathlib import Path
+from time import perf_counter
+
+from src.config.config import load_windows_security_events
+from src.services.qradar.capture import read_capture
+from src.services.qradar.matcher import RuleIndex
+from src.services.qradar.qradar import QRadar, PostArielSearchResultItem, Any
+from src.services.redmine.redmine import log_message
+from src.services.redmine.stub import StubRedmine, StubUser
+from src.utils.event_spill import EventSpill
+
+
+def run_replay(capture_path: Path, output_path: Path | None = None) -> dict[str, Any]:
+    """Replay a captured search through the matcher and a stubbed redmine, without qradar or redmine.
+
+    Parameters
+    ----------
+    capture_path : Path
+        Capture file written by QRadar.capture_search_results.
+    output_path : Path | None, optional
+        JSON file to write the matched events per event id, to compare the matcher's output between versions. Default is None.
+
+    Returns
+    -------
+    dict[str, Any]
+        Replay summary with the row count, matched events per event id, stub issue counts and phase durations.
+    """
+
+    header, searched_events = read_capture(file_path=capture_path)
+    capture: dict[str, Any] = header["capture"]
+    log_message(
+        mode="info",
+        msg=f"replaying ⊱ {header.get('event_count')} ⊰ events captured at ⊱ {capture.get('captured_at')} ⊰ ({capture.get('time_window')})",
+    )
+
+    windows_security_events: list[dict[str, Any]] = deepcopy(
+        load_windows_security_events()
+    )
+    qradar: QRadar = QRadar(url=capture.get("qradar_url", ""), username="", password="")
+
+    # match the captured events as the search results would be matched
+    parse_started_at: float = perf_counter()
+    row_count: int = 0
+    rule_index: RuleIndex = qradar.build_rule_index(
+        windows_security_events=windows_security_events
+    )
+    # the replay reports & upserts the whole events lists, the spilled events are merged back to memory
+    event_spill: EventSpill = EventSpill()
+    try:
+        searched_event: PostArielSearchResultItem
+        for searched_event in searched_events:
+            qradar.parse_searched_events(
+                searched_event=searched_event, rule_index=rule_index, event_spill=event_spill
+            )
+            row_count += 1
+        qradar.merge_spilled_events(rule_index=rule_index, event_spill=event_spill)
+    finally:
+        event_spill.close()
+    parse_duration: float = perf_counter() - parse_started_at
+
+    parsed_events: list[dict[str, Any]] = [
+        wse for wse in windows_security_events if wse.get("events", [])
+    ]
+
+    # upsert the matched events through the real upsert path on the in-memory redmine
+    upsert_started_at: float = perf_counter()
+    redmine: StubRedmine = StubRedmine()
+    redmine_user: StubUser = redmine.auth()
+    for parsed_event in parsed_events:
+        redmine.upsert_wse_event(redmine_user=redmine_user, event_to_upsert=parsed_event)
+    upsert_duration: float = perf_counter() - upsert_started_at
+
+    summary: dict[str, Any] = {
+        "rows": row_count,
+        "matched_events": {
+            wse["event_id"]: len(wse["events"]) for wse in parsed_events
+        },
+        "redmine": redmine.get_issue_stats(),
+        "parse_seconds": round(parse_duration, 4),
+        "upsert_seconds": round(upsert_duration, 4),
+        "rows_per_second": round(row_count / parse_duration) if parse_duration else None,
+    }
+    log_message(mode="info", msg=f"replay finished ⊱ {summary} ⊰")
+
+    if output_path:
+        with open(file=output_path, mode="w", encoding="utf-8") as f:
+            json_dump(
+                {wse["event_id"]: sorted(wse["events"]) for wse in parsed_events},
+                f,
+                ensure_ascii=False,
+                indent=2,
+            )
+
+    return summary
@@ -0,0 +1,248 @@
+from asyncio import AbstractEventLoop, new_event_loop, run_coroutine_threadsafe
+from dataclasses import dataclass, field
+from functools import wraps
+from inspect import iscoroutinefunction
+from json import loads as json_loads
+from threading import Lock, Thread
+from typing import Any, Callable, Coroutine, TypeVar
+from urllib.parse import urljoin
+
+try:
+    from aiohttp import (
+        BasicAuth,
+        ClientError,
+        ClientSession,
+        ClientTimeout,
+        TCPConnector,
+    )
+except ImportError:  # aiohttp is optional, the async clients are only used if they are enabled
+    ClientSession = None
+
+from src.utils.deadline import get_timeout
+from src.utils.logger import log_message
+
+
+T = TypeVar("T")
+
+
+@dataclass
+class AsyncResponse:
+    """HTTP response read by the async HTTP client, mirrors the used parts of requests.Response."""
+
+    status_code: int
+    headers: dict[str, str] = field(default_factory=dict)
+    content: bytes = b""
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code < 400
+
+    def __bool__(self) -> bool:
+        return self.ok
+
+    def json(self) -> Any:
+        return json_loads(self.content) if self.content else None
+
+
+class AsyncHttpClient:
+    """Asyncio HTTP client to make concurrent requests from one event loop.
+
+    Attributes
+    ----------
+    url : str
+        Base URL to make requests.
+    max_connections : int
+        Maximum number of simultaneous connections of the session.
+    session : ClientSession | None
+        Session object to make requests, created on the first request in the running event loop.
+
+    Methods
+    -------
+    - request(method: str, url: str = None, endpoint: str = None, **request_kwargs) -> AsyncResponse | None
+    - get_full_url(url: str, endpoint: str = None) -> str
+    - close() -> None
+
+    Raises
+    ------
+    ValueError
+        If aiohttp is not installed.
+    """
+
+    def __init__(self, url: str, max_connections: int = 20, **session_kwargs) -> None:
+        """Initialize the async HTTP client.
+
+        Parameters
+        ----------
+        url : str
+            Base URL to make requests.
+        max_connections : int, optional
+            Maximum number of simultaneous connections. Default is 20.
+        **session_kwargs
+            Session keyword arguments (headers, auth, verify) same as the HttpClient.
+        """
+
+        if ClientSession is None:
+            raise ValueError("aiohttp must be installed to use the async clients")
+
+        self.url: str = url
+        self.max_connections: int = max_connections
+        self.session: ClientSession | None = None
+
+        self._headers: dict[str, str] = {
+            "Content-Type": "application/json",
+            "Accept": "application/json",
+        } | session_kwargs.get("headers", {})
+        auth: tuple[str, str] | None = session_kwargs.get("auth", None)
+        self._auth: BasicAuth | None = BasicAuth(*auth) if auth else None
+        self._verify: bool = session_kwargs.get("verify", False)
+
+    async def __aenter__(self) -> "AsyncHttpClient":
+        return self
+
+    async def __aexit__(self, *_) -> None:
+        await self.close()
+
+    async def request(
+        self, method: str, url: str = None, endpoint: str = None, **request_kwargs
+    ) -> AsyncResponse | None:
+        """Make an HTTP request.
+
+        Parameters
+        ----------
+        method : str
+            HTTP method to use (get, post, put, delete, etc.)
+        url : str, optional
+            URL to make the request. If not provided, it will use the base URL. Default is None.
+        endpoint : str, optional
+            Endpoint to append to the base URL. If not provided, it will use the base URL. Default is None.
+        **request_kwargs
+            Request keyword arguments to pass to the aiohttp request method (params, json, headers, etc.)
+
+        Returns
+        -------
+        AsyncResponse | None
+            HTTP response object with the read content if the request is successful, otherwise None.
+        """
+
+        full_url: str = self.get_full_url(url=url if url else self.url, endpoint=endpoint)
+        try:
+            if self.session is None or self.session.closed:
+                self.session = ClientSession(
+                    headers=self._headers,
+                    auth=self._auth,
+                    timeout=ClientTimeout(total=30),
+                    connector=TCPConnector(
+                        limit=self.max_connections, ssl=None if self._verify else False
+                    ),
+                )
+
+            # the request timeout is limited with the run's deadline, same as the HttpClient
+            async with self.session.request(
+                method=method.upper(),
+                url=full_url,
+                timeout=ClientTimeout(total=get_timeout(timeout=30)),
+                **request_kwargs,
+            ) as res:
+                return AsyncResponse(
+                    status_code=res.status,
+                    headers=dict(res.headers),
+                    content=await res.read(),
+                )
+        except (ClientError, TimeoutError) as e:
+            log_message(
+                mode="error",
+                msg=f"request error occured ⊱ {e!r} ⊰ while requesting to {full_url}",
+            )
+        except Exception as e:
+            log_message(
+                mode="error",
+                msg=f"unexpected error occured ⊱ {e} ⊰ while requesting to {full_url}",
+            )
+
+    def get_full_url(self, url: str, endpoint: str = None) -> str:
+        """Join the base URL with the endpoint, same as the HttpClient.get_full_url."""
+
+        return urljoin(base=url, url=endpoint) if endpoint else url
+
+    async def close(self) -> None:
+        """Close the session and its connections."""
+
+        if self.session and not self.session.closed:
+            await self.session.close()
+
+
+_background_loop: AbstractEventLoop | None = None
+_background_loop_lock: Lock = Lock()
+
+
+def get_background_loop() -> AbstractEventLoop:
+    """Get the event loop running in a daemon thread, it is shared by all sync facades of the process."""
+
+    global _background_loop
+
+    with _background_loop_lock:
+        if _background_loop is None:
+            _background_loop = new_event_loop()
+            Thread(
+                target=_background_loop.run_forever,
+                name="async-background-loop",
+                daemon=True,
+            ).start()
+        return _background_loop
+
+
+def run_sync(coroutine: Coroutine[Any, Any, T]) -> T:
+    """Run the coroutine on the background event loop and wait for its result from synchronous code.
+
+    Parameters
+    ----------
+    coroutine : Coroutine[Any, Any, T]
+        Coroutine to run.
+
+    Returns
+    -------
+    T
+        Result of the coroutine, its exceptions are raised in the caller thread.
+    """
+
+    return run_coroutine_threadsafe(coroutine, get_background_loop()).result()
+
+
+class SyncFacade:
+    """Synchronous facade of an async client, each coroutine method is run with run_sync.
+
+    The async clients keep their sessions on the shared background event loop, so the facade can be used
+    from the current sync app flow (and its threads) without creating a new event loop per call.
+
+    Examples
+    --------
+    >>> qradar = SyncFacade(AsyncQRadar(url=url, username=username, password=password))
+    >>> results = qradar.run_searches(aql_queries=[aql_query_1, aql_query_2])
+    """
+
+    def __init__(self, async_client: Any) -> None:
+        self._async_client: Any = async_client
+
+    def __getattr__(self, name: str) -> Any:
+        attribute: Any = getattr(self._async_client, name)
+        if not iscoroutinefunction(attribute):
+            return attribute
+
+        @wraps(attribute)
+        def sync_method(*args, **kwargs) -> Any:
+            return run_sync(attribute(*args, **kwargs))
+
+        return sync_method
+
+    def __enter__(self) -> "SyncFacade":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Close the sessions of the async client."""
+
+        close: Callable[[], Coroutine] | None = getattr(self._async_client, "close", None)
+        if close:
+            run_sync(close())
@@ -1,7 +1,98 @@
-from urllib.parse import urljoin
-from requests import Session, Response, RequestException
+from urllib.parse import urljoin, urlparse
+from requests import PreparedRequest, Session, Response, RequestException
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
+from src.utils.circuit_breaker import CircuitBreaker, get_circuit_breaker
+from src.utils.deadline import get_timeout, is_deadline_exceeded
 from src.utils.logger import log_message
+from src.utils.metrics import HTTP_CLIENT_RETRIES, HTTP_POOL_COLLECTOR
+from src.utils.tracing import add_trace_counts, count_traced_response
+
+
+class CountedRetry(Retry):
+    """urllib3 retry configuration which counts the retries in the HttpClient retries metric."""
+
+    def increment(self, *args, **kwargs) -> "CountedRetry":
+        # raises MaxRetryError if the retries are exhausted, so only the real retries are counted
+        new_retry: CountedRetry = super().increment(*args, **kwargs)
+        pool = kwargs.get("_pool")
+        HTTP_CLIENT_RETRIES.labels(host=pool.host if pool else "unknown").inc()
+        return new_retry
+
+
+class DeadlineExceededError(RequestException):
+    """The request is not sent, the run's deadline is passed."""
+
+
+class CircuitOpenError(RequestException):
+    """The request is not sent, the service's circuit is open."""
+
+
+class GuardedAdapter(HTTPAdapter):
+    """HTTP adapter which limits the request timeouts with the run's deadline and fails fast on an open circuit.
+
+    The errors are raised as RequestException, so the callers handle them as any other request error.
+
+    - Connection errors, timeouts and 5xx responses are the service's failures, the other responses are its successes.
+    - The requests failed after the deadline are not counted as failures, their timeouts were shortened by the deadline.
+
+    Attributes
+    ----------
+    circuit_breaker_name : str
+        Name of the service's circuit breaker, it is loaded from the state folder on the first request.
+    """
+
+    def __init__(self, circuit_breaker_name: str, **adapter_kwargs) -> None:
+        super().__init__(**adapter_kwargs)
+        self.circuit_breaker_name: str = circuit_breaker_name
+
+    def send(self, request: PreparedRequest, timeout=None, **send_kwargs) -> Response:
+        if is_deadline_exceeded():
+            raise DeadlineExceededError("run deadline exceeded", request=request)
+
+        circuit_breaker: CircuitBreaker = get_circuit_breaker(name=self.circuit_breaker_name)
+        if not circuit_breaker.allow_request():
+            raise CircuitOpenError(
+                f"circuit {self.circuit_breaker_name} is open", request=request
+            )
+
+        # a (connect, read) timeout tuple is limited as a whole, the deadline is the upper bound of both
+        if not isinstance(timeout, tuple):
+            timeout = get_timeout(timeout=timeout)
+
+        try:
+            response: Response = super().send(request, timeout=timeout, **send_kwargs)
+        except RequestException:
+            if not is_deadline_exceeded():
+                circuit_breaker.record_failure()
+            raise
+
+        if response.status_code >= 500:
+            circuit_breaker.record_failure()
+        else:
+            circuit_breaker.record_success()
+        return response
+
+
+def mount_guarded_adapters(session: Session, name: str, retry: Retry | int = 0) -> None:
+    """Mount the guarded adapters to the session with the circuit breaker of the service.
+
+    Parameters
+    ----------
+    session : Session
+        Session of the service's client.
+    name : str
+        Name of the service's circuit breaker, e.g. **http:qradar.example.com**
+    retry : Retry | int, optional
+        Retry configuration of the adapters, by default 0.
+    """
+
+    for prefix in ("https://", "http://"):
+        session.mount(
+            prefix=prefix,
+            adapter=GuardedAdapter(circuit_breaker_name=name, max_retries=retry),
+        )
 
 
 class HttpClient:
@@ -16,17 +107,20 @@ class HttpClient:
 
     Methods
     -------
-    - request(method: str, url: str = None, endpoint: str = None, **request_kwargs) -> Response
+    - request(method: str, url: str = None, endpoint: str = None, **request_kwargs) -> Response | None
     - get_full_url(url: str, endpoint: str = None) -> str
     """
 
-    def __init__(self, url: str, **session_kwargs) -> None:
+    def __init__(self, url: str, retries: int = 2, **session_kwargs) -> None:
         """Initialize the HTTP client.
 
         Parameters
         ----------
         url : str
             Base URL to make requests.
+        retries : int, optional
+            Number of retries of the idempotent requests (GET, HEAD, DELETE) on connection errors
+            and 429, 502, 503, 504 responses with an exponential backoff. Default is 2.
         **session_kwargs
             Request keyword arguments to pass to the session object.
         """
@@ -41,6 +135,21 @@ class HttpClient:
             } | session_kwargs.get("headers", {})
             self.session.auth = session_kwargs.get("auth", None)
             self.session.verify = session_kwargs.get("verify", False)
+            # count the requests & response bytes in the traced run's spans
+            self.session.hooks["response"].append(count_traced_response)
+
+            retry: CountedRetry = CountedRetry(
+                total=retries,
+                backoff_factor=0.5,
+                status_forcelist=(429, 502, 503, 504),
+                allowed_methods=frozenset({"GET", "HEAD", "DELETE"}),
+                raise_on_status=False,
+            )
+            # the timeouts are limited with the run's deadline and the service's circuit is shared by its clients
+            mount_guarded_adapters(
+                session=self.session, name=f"http:{urlparse(url or '').netloc}", retry=retry
+            )
+            HTTP_POOL_COLLECTOR.register(session=self.session)
 
     def request(
         self, method: str, url: str = None, endpoint: str = None, **request_kwargs
@@ -74,12 +183,20 @@ class HttpClient:
                 timeout=30,
                 **request_kwargs,
             )
+        except (DeadlineExceededError, CircuitOpenError) as e:
+            add_trace_counts(errors=1)
+            log_message(
+                mode="warning",
+                msg=f"request is not sent ⊱ {e} ⊰ to {full_url}",
+            )
         except RequestException as e:
+            add_trace_counts(errors=1)
             log_message(
                 mode="error",
                 msg=f"request error occured ⊱ {e} ⊰ while requesting to {full_url}",
             )
         except Exception as e:
+            add_trace_counts(errors=1)
             log_message(
                 mode="error",
                 msg=f"unexpected error occured ⊱ {e} ⊰ while requesting to {full_url}",
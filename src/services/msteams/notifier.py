@@ -0,0 +1,152 @@
+from atexit import register as atexit_register
+from queue import Empty, Full, Queue
+from threading import Lock, Thread
+from time import monotonic, sleep
+from typing import Callable
+
+from ..http_client import log_message
+
+
+# the digests of a title, message > number of times it is sent in the digest window
+Digest = dict[str, int]
+
+
+class TeamsNotifier:
+    """Send the messages of a webhook from a background thread, so the callers never wait for the webhook.
+
+    - The messages are put to a bounded queue, the messages which don't fit are dropped and counted.
+    - The messages of a burst are collected for **window** seconds and sent as one digest per title,
+      identical messages are sent once with their count.
+    - The digests are sent at most once per **min_interval** seconds, to stay under the webhook's rate limit.
+    - The queued messages are sent when the process exits.
+
+    Attributes
+    ----------
+    deliver : Callable[[str, Digest, int], bool]
+        Send a digest of a title with the number of dropped messages, returns True if it is sent.
+    window : float
+        Seconds to collect the messages after the first message of a burst.
+    min_interval : float
+        Minimum seconds between two digests.
+    queue : Queue[tuple[str, str] | None]
+        Bounded queue of the (title, message) pairs, None stops the thread.
+    dropped_count : int
+        Messages dropped because the queue was full, since the last digest.
+
+    Methods
+    -------
+    - notify(title: str, msg: str) -> bool
+    - start() -> None
+    - stop(timeout: float = 30) -> None
+    """
+
+    def __init__(
+        self,
+        deliver: Callable[[str, Digest, int], bool],
+        window: float = 10,
+        min_interval: float = 5,
+        queue_size: int = 100,
+    ) -> None:
+        self.deliver: Callable[[str, Digest, int], bool] = deliver
+        self.window: float = window
+        self.min_interval: float = min_interval
+        self.queue: Queue[tuple[str, str] | None] = Queue(maxsize=queue_size)
+        self.dropped_count: int = 0
+        self._last_sent_at: float | None = None
+        self._thread: Thread | None = None
+        self._lock: Lock = Lock()
+
+    def notify(self, title: str, msg: str) -> bool:
+        """Queue a message to send, the thread is started with the first message.
+
+        Returns
+        -------
+        bool
+            False if the queue is full and the message is dropped, True otherwise.
+        """
+
+        self.start()
+        try:
+            self.queue.put_nowait((title, msg))
+            return True
+        except Full:
+            with self._lock:
+                self.dropped_count += 1
+            return False
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None:
+                return
+
+            self._thread = Thread(target=self._run, name="teams-notifier", daemon=True)
+            self._thread.start()
+            # the exit handlers run in reverse order, so the logger is still running while the queue is flushed
+            atexit_register(self.stop)
+
+    def stop(self, timeout: float = 30) -> None:
+        """Send the queued messages without waiting for the window and stop the thread."""
+
+        with self._lock:
+            thread: Thread | None = self._thread
+            self._thread = None
+
+        if thread is None:
+            return
+
+        # the stop signal must not be dropped, it waits for a free slot unlike the messages
+        self.queue.put(None)
+        thread.join(timeout=timeout)
+
+    def _run(self) -> None:
+        while True:
+            item: tuple[str, str] | None = self.queue.get()
+            if item is None:
+                return
+
+            digests: dict[str, Digest] = {}
+            is_stopped: bool = self._collect(item=item, digests=digests)
+            self._send(digests=digests, is_stopped=is_stopped)
+            if is_stopped:
+                return
+
+    def _collect(self, item: tuple[str, str], digests: dict[str, Digest]) -> bool:
+        """Collect the messages of the window to the digests, returns True if the thread is stopped."""
+
+        deadline: float = monotonic() + self.window
+        while item is not None:
+            title, msg = item
+            digest: Digest = digests.setdefault(title, {})
+            digest[msg] = digest.get(msg, 0) + 1
+
+            timeout: float = deadline - monotonic()
+            if timeout <= 0:
+                return False
+
+            try:
+                item = self.queue.get(timeout=timeout)
+            except Empty:
+                return False
+
+        return True
+
+    def _send(self, digests: dict[str, Digest], is_stopped: bool) -> None:
+        for title, digest in digests.items():
+            # keep the webhook's rate limit, unless the process is exiting
+            if self._last_sent_at is not None and not is_stopped:
+                wait_seconds: float = self._last_sent_at + self.min_interval - monotonic()
+                if wait_seconds > 0:
+                    sleep(wait_seconds)
+
+            with self._lock:
+                dropped_count: int = self.dropped_count
+                self.dropped_count = 0
+
+            try:
+                self.deliver(title, digest, dropped_count)
+            except Exception as e:
+                log_message(
+                    mode="error",
+                    msg=f"unexpected error occured ⊱ {e} ⊰ while sending message to teams",
+                )
+            self._last_sent_at = monotonic()
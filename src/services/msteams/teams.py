@@ -1,5 +1,6 @@
 from ..http_client import HttpClient, Response, log_message
-from src.utils.constants import IS_PROD, TEAMS_WORKFLOW_CONFIG
+from .notifier import Digest, TeamsNotifier
+from src.utils.constants import IS_PROD, TEAMS_NOTIFIER_CONFIG, TEAMS_WORKFLOW_CONFIG
 
 
 class MsTeams:
@@ -11,14 +12,27 @@ class MsTeams:
         URL of the Microsoft Teams workflow to send messages to.
     http_client : HttpClient
         HTTP client to make requests.
+    notifier : TeamsNotifier
+        Background notifier of the workflow, it sends the queued messages as digests.
 
     Static Methods
     --------------
     - send_message(msg: str, title=TEAMS_WORKFLOW_CONFIG["title"]) -> None
+    - deliver_digest(title: str, digest: Digest, dropped_count: int) -> bool
+    - build_message_body(msg: str, title: str) -> dict
+    - build_digest_body(digest: Digest, title: str, dropped_count: int = 0) -> dict
     """
 
     workflow_url: str | None = TEAMS_WORKFLOW_CONFIG["url"]
     http_client: HttpClient = HttpClient(url=workflow_url, verify=True)
+    notifier: TeamsNotifier = TeamsNotifier(
+        deliver=lambda title, digest, dropped_count: MsTeams.deliver_digest(
+            title=title, digest=digest, dropped_count=dropped_count
+        ),
+        window=TEAMS_NOTIFIER_CONFIG["digest_window_seconds"],
+        min_interval=TEAMS_NOTIFIER_CONFIG["min_interval_seconds"],
+        queue_size=TEAMS_NOTIFIER_CONFIG["queue_size"],
+    )
 
     @classmethod
     def send_message(
@@ -27,7 +41,9 @@ class MsTeams:
         title: str = TEAMS_WORKFLOW_CONFIG["title"],
         send_on_dev: bool = False,
     ) -> None:
-        """Send a message to Microsoft Teams with the given message and title using the workflow URL.
+        """Queue a message to send to Microsoft Teams with the given message and title using the workflow URL.
+
+        It doesn't wait for the workflow, the messages of a burst are sent as a digest by the notifier's thread.
 
         Parameters
         ----------
@@ -49,7 +65,66 @@ class MsTeams:
             )
             return
 
-        json_body = {
+        if not cls.notifier.notify(title=title, msg=msg):
+            log_message(
+                mode="warning",
+                msg="teams notifier queue is full, message will be counted in the next digest",
+            )
+
+    @classmethod
+    def deliver_digest(cls, title: str, digest: Digest, dropped_count: int) -> bool:
+        """Send the notifier's digest of a title to the workflow, a single message is sent as is.
+
+        Parameters
+        ----------
+        title : str
+            Title of the messages.
+        digest : Digest
+            Messages of the title with the number of times they are sent.
+        dropped_count : int
+            Number of messages dropped since the last digest.
+
+        Returns
+        -------
+        bool
+            True if the digest is sent, False otherwise.
+        """
+
+        if len(digest) == 1 and not dropped_count and sum(digest.values()) == 1:
+            json_body: dict = cls.build_message_body(msg=next(iter(digest)), title=title)
+        else:
+            json_body: dict = cls.build_digest_body(
+                digest=digest, title=title, dropped_count=dropped_count
+            )
+
+        res: Response | None = cls.http_client.request(method="post", json=json_body)
+
+        is_error: bool = not res or res.status_code > 299
+        if is_error:
+            log_message(
+                mode="error",
+                msg="error occurred while sending message to teams",
+            )
+        return not is_error
+
+    @staticmethod
+    def build_message_body(msg: str, title: str) -> dict:
+        """Build the adaptive card message body of the workflow request.
+
+        Parameters
+        ----------
+        msg : str
+            Message to send.
+        title : str
+            Title of the message.
+
+        Returns
+        -------
+        dict
+            Workflow request body with the adaptive card attachment.
+        """
+
+        return {
             "type": "message",
             "attachments": [
                 {
@@ -76,11 +151,48 @@ class MsTeams:
             ],
         }
 
-        res: Response | None = cls.http_client.request(method="post", json=json_body)
+    @staticmethod
+    def build_digest_body(digest: Digest, title: str, dropped_count: int = 0) -> dict:
+        """Build the adaptive card message body of a digest, each unique message is a text block with its count.
 
-        is_error: bool = not res or res.status_code > 299
-        if is_error:
-            log_message(
-                mode="error",
-                msg="error occurred while sending message to teams",
-            )
\ No newline at end of file
+        Parameters
+        ----------
+        digest : Digest
+            Messages with the number of times they are sent.
+        title : str
+            Title of the messages.
+        dropped_count : int, optional
+            Number of messages dropped since the last digest, by default 0.
+
+        Returns
+        -------
+        dict
+            Workflow request body with the adaptive card attachment.
+        """
+
+        message_count: int = sum(digest.values()) + dropped_count
+        body: dict = MsTeams.build_message_body(
+            msg=f"⊱ {message_count} ⊰ messages",
+            title=title,
+        )
+        card_body: list[dict] = body["attachments"][0]["content"]["body"]
+        card_body.extend(
+            {
+                "type": "TextBlock",
+                "text": f"{msg} (x{count})" if count > 1 else msg,
+                "wrap": True,
+                "separator": True,
+            }
+            for msg, count in digest.items()
+        )
+        if dropped_count:
+            card_body.append(
+                {
+                    "type": "TextBlock",
+                    "text": f"⊱ {dropped_count} ⊰ messages dropped, the notifier queue was full",
+                    "wrap": True,
+                    "separator": True,
+                    "color": "attention",
+                }
+            )
+        return body
@@ -0,0 +1,274 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from json import dumps as json_dumps, loads as json_loads
+from threading import Lock
+from time import time
+from typing import Any, Callable
+import sqlite3
+
+from src.utils.constants import OUTBOX_CONFIG
+from src.utils.rate_controller import AdaptiveConcurrencyLimiter
+from src.utils.state import connect_state_db
+from ..msteams.teams import MsTeams, log_message
+
+
+class Outbox:
+    """Persistent outbox between the QRadar and Redmine stages.
+
+    Matched & rendered windows security events are written to a SQLite (WAL) database in the state folder
+    before any Redmine call, so a Redmine outage never forces QRadar to be searched again for the same events.
+    Undelivered events are retried on the next drains with an exponential backoff.
+
+    Attributes
+    ----------
+    connection : sqlite3.Connection
+        Connection to the outbox database.
+    max_attempts : int
+        Delivery attempts before an event is marked as dead.
+    backoff_seconds : int
+        Base delay in seconds before retrying a failed event, doubled on each failed attempt.
+    max_backoff_seconds : int
+        Upper bound of the retry delay in seconds.
+
+    Methods
+    -------
+    - enqueue(events: list[dict[str, Any]]) -> int
+    - count_pending() -> int
+    - drain(deliver: Callable[[dict[str, Any]], bool], should_stop: Callable[[], bool] | None = None, limiter: AdaptiveConcurrencyLimiter | None = None) -> tuple[int, int]
+    - get_backoff_seconds(attempts: int) -> int
+    """
+
+    def __init__(
+        self,
+        file_name: str = "outbox.sqlite3",
+        max_attempts: int = OUTBOX_CONFIG["max_attempts"],
+        backoff_seconds: int = OUTBOX_CONFIG["backoff_seconds"],
+        max_backoff_seconds: int = OUTBOX_CONFIG["max_backoff_seconds"],
+    ) -> None:
+        self.max_attempts: int = max_attempts
+        self.backoff_seconds: int = backoff_seconds
+        self.max_backoff_seconds: int = max_backoff_seconds
+
+        self._lock: Lock = Lock()
+        self.connection: sqlite3.Connection = connect_state_db(file_name=file_name)
+        with self.connection:
+            self.connection.execute(
+                """
+                create table if not exists outbox (
+                    id integer primary key autoincrement,
+                    event_id text not null,
+                    payload text not null,
+                    status text not null default 'pending',
+                    attempts integer not null default 0,
+                    created_at real not null,
+                    next_attempt_at real not null,
+                    last_error text
+                )
+                """
+            )
+            self.connection.execute(
+                "create index if not exists outbox_due on outbox (status, next_attempt_at)"
+            )
+
+    def enqueue(self, events: list[dict[str, Any]]) -> int:
+        """Persist the given parsed events to deliver them later.
+
+        Parameters
+        ----------
+        events : list[dict[str, Any]]
+            Parsed windows security events which have matched events.
+
+        Returns
+        -------
+        int
+            Number of enqueued events.
+        """
+
+        now: float = time()
+        rows: list[tuple[str, str, float, float]] = [
+            (
+                str(event.get("event_id")),
+                json_dumps(event, ensure_ascii=False),
+                now,
+                now,
+            )
+            for event in events
+        ]
+
+        with self._lock, self.connection:
+            self.connection.executemany(
+                "insert into outbox (event_id, payload, created_at, next_attempt_at) values (?, ?, ?, ?)",
+                rows,
+            )
+
+        log_message(mode="info", msg=f"⊱ {len(rows)} ⊰ events enqueued to the outbox")
+        return len(rows)
+
+    def count_pending(self) -> int:
+        """Count the events waiting for delivery, including the ones waiting for their backoff.
+
+        Returns
+        -------
+        int
+            Number of pending events.
+        """
+
+        with self._lock:
+            row: sqlite3.Row = self.connection.execute(
+                "select count(*) from outbox where status = 'pending'"
+            ).fetchone()
+        return row[0]
+
+    def drain(
+        self,
+        deliver: Callable[[dict[str, Any]], bool],
+        should_stop: Callable[[], bool] | None = None,
+        limiter: AdaptiveConcurrencyLimiter | None = None,
+    ) -> tuple[int, int]:
+        """Deliver the due events in the enqueue order.
+
+        Delivered events are removed from the outbox. Failed events are rescheduled with an exponential backoff,
+        and marked as dead when they reach the maximum attempts.
+
+        Parameters
+        ----------
+        deliver : Callable[[dict[str, Any]], bool]
+            Delivery function which returns True if the event is delivered, False otherwise.
+        should_stop : Callable[[], bool] | None, optional
+            Checked before each delivery, the rest of the events are kept for the next drain without
+            an attempt if it returns True (e.g. the run's deadline is passed). Default is None.
+        limiter : AdaptiveConcurrencyLimiter | None, optional
+            Concurrency limit of the deliveries, the events are delivered in parallel up to its current limit
+            (started in the enqueue order). The events are delivered one by one if None. Default is None.
+
+        Returns
+        -------
+        tuple[int, int]
+            Number of delivered and failed events.
+        """
+
+        with self._lock:
+            due_rows: list[sqlite3.Row] = self.connection.execute(
+                "select id, event_id, payload, attempts from outbox where status = 'pending' and next_attempt_at <= ? order by id",
+                (time(),),
+            ).fetchall()
+
+        results: list[bool] = []
+        futures: list[Future[bool]] = []
+        executor: ThreadPoolExecutor | None = (
+            ThreadPoolExecutor(max_workers=limiter.max_limit, thread_name_prefix="outbox-drain")
+            if limiter and len(due_rows) > 1
+            else None
+        )
+        try:
+            for index, row in enumerate(due_rows):
+                is_stopped: bool = bool(should_stop and should_stop())
+                # wait for a slot under the limiter, the stop condition is checked again while waiting
+                while executor is not None and not is_stopped and not limiter.acquire(timeout=1):
+                    is_stopped = bool(should_stop and should_stop())
+                if is_stopped:
+                    log_message(
+                        mode="warning",
+                        msg=f"outbox drain stopped, ⊱ {len(due_rows) - index} ⊰ events are kept for the next run",
+                    )
+                    break
+
+                if executor is None:
+                    results.append(self._deliver_row(deliver=deliver, row=row))
+                    continue
+
+                futures.append(
+                    executor.submit(self._deliver_row, deliver=deliver, row=row, limiter=limiter)
+                )
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True)
+        results.extend(future.result() for future in futures)
+
+        delivered_count: int = results.count(True)
+        failed_count: int = results.count(False)
+        if due_rows:
+            log_message(
+                mode="info",
+                msg=f"outbox drained, ⊱ {delivered_count} ⊰ delivered, ⊱ {failed_count} ⊰ failed",
+            )
+        return delivered_count, failed_count
+
+    def _deliver_row(
+        self,
+        deliver: Callable[[dict[str, Any]], bool],
+        row: sqlite3.Row,
+        limiter: AdaptiveConcurrencyLimiter | None = None,
+    ) -> bool:
+        """Deliver an outbox event, remove it if delivered or reschedule it, the limiter's slot is released at the end."""
+
+        error: str | None = None
+        try:
+            is_delivered: bool = deliver(json_loads(row["payload"]))
+        except Exception as e:
+            is_delivered, error = False, str(e)
+        finally:
+            if limiter:
+                limiter.release()
+
+        if is_delivered:
+            with self._lock, self.connection:
+                self.connection.execute("delete from outbox where id = ?", (row["id"],))
+            return True
+
+        self._reschedule(
+            row_id=row["id"],
+            event_id=row["event_id"],
+            attempts=row["attempts"] + 1,
+            error=error,
+        )
+        return False
+
+    def get_backoff_seconds(self, attempts: int) -> int:
+        """Get the delay before the next attempt for the given number of failed attempts.
+
+        Parameters
+        ----------
+        attempts : int
+            Number of failed attempts so far.
+
+        Returns
+        -------
+        int
+            Delay in seconds, doubled on each attempt and capped with max_backoff_seconds.
+        """
+
+        return min(self.backoff_seconds * 2 ** max(attempts - 1, 0), self.max_backoff_seconds)
+
+    def _reschedule(
+        self, row_id: int, event_id: str, attempts: int, error: str | None
+    ) -> None:
+        """Reschedule a failed event or mark it as dead if it reached the maximum attempts."""
+
+        is_dead: bool = attempts >= self.max_attempts
+        with self._lock, self.connection:
+            self.connection.execute(
+                "update outbox set status = ?, attempts = ?, next_attempt_at = ?, last_error = ? where id = ?",
+                (
+                    "dead" if is_dead else "pending",
+                    attempts,
+                    time() + self.get_backoff_seconds(attempts=attempts),
+                    error,
+                    row_id,
+                ),
+            )
+
+        if not is_dead:
+            log_message(
+                mode="warning",
+                msg=f"delivery failed for event id ⊱ {event_id} ⊰, retrying in ⊱ {self.get_backoff_seconds(attempts=attempts)} ⊰ seconds",
+                sample_key="outbox_retry",
+            )
+            return
+
+        log_message(
+            mode="error",
+            msg=f"delivery failed ⊱ {attempts} ⊰ times for event id ⊱ {event_id} ⊰, event is marked as dead in the outbox",
+        )
+        MsTeams.send_message(
+            msg=f"delivery failed ⊱ {attempts} ⊰ times for event id ⊱ {event_id} ⊰, event is marked as dead in the outbox"
+        )
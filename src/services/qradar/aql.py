@@ -0,0 +1,315 @@
+from datetime import datetime
+from math import ceil
+from re import compile as re_compile, IGNORECASE, Match, Pattern
+from time import time
+from typing import Any
+
+from .types import PostArielSearchResultItem
+
+
+# identifier columns of the lean rows, a representative row's log is searched again with them
+IDENTIFIER_FIELDS: tuple[str, ...] = ("starttime", "qid")
+
+# the searched fields of a row, the rows of the log search are matched with the representatives by them
+ROW_KEY_FIELDS: tuple[str, ...] = (
+    "starttime",
+    "qid",
+    "event_id",
+    "src_user",
+    "dst_user",
+    "group_name",
+)
+
+AQL_TIME_CLAUSE_PATTERN: Pattern = re_compile(
+    r"\s+(last\s+\d+\s+(minutes?|hours?|days?)|start\s+'[^']*'\s+stop\s+'[^']*')\s*$",
+    flags=IGNORECASE,
+)
+AQL_SELECT_PATTERN: Pattern = re_compile(r"^\s*select\s+", flags=IGNORECASE)
+AQL_LOG_ITEM_PATTERN: Pattern = re_compile(r"\s+as\s+\"?log\"?\s*$", flags=IGNORECASE)
+AQL_WHERE_PATTERN: Pattern = re_compile(r"\s+where\s+", flags=IGNORECASE)
+AQL_WHERE_END_PATTERN: Pattern = re_compile(
+    r"\s+(group\s+by|order\s+by|having|limit)\s+", flags=IGNORECASE
+)
+AQL_LAST_MINUTES_PATTERN: Pattern = re_compile(
+    r"\s+last\s+\d+\s+(minutes?|hours?|days?)\s*$", flags=IGNORECASE
+)
+AQL_LAST_PATTERN: Pattern = re_compile(
+    r"\s+last\s+(\d+)\s+(minute|hour|day)s?\s*$", flags=IGNORECASE
+)
+AQL_START_STOP_PATTERN: Pattern = re_compile(
+    r"\s+start\s+'([^']*)'\s+stop\s+'([^']*)'\s*$", flags=IGNORECASE
+)
+AQL_EVENT_ID_ITEM_PATTERN: Pattern = re_compile(r"\s+as\s+\"?event_id\"?\s*$", flags=IGNORECASE)
+
+# minutes of a time clause's unit
+AQL_UNIT_MINUTES: dict[str, int] = {"minute": 1, "hour": 60, "day": 1440}
+
+
+def split_select_items(aql_query: str) -> tuple[list[str], str] | None:
+    """Split the select list of an AQL query into its items, the commas in the parentheses & quotes are kept.
+
+    Returns
+    -------
+    tuple[list[str], str] | None
+        Select items and the rest of the query from its **from** keyword, None if the query is not a select query.
+    """
+
+    select_match: Match | None = AQL_SELECT_PATTERN.match(aql_query)
+    if not select_match:
+        return None
+
+    items: list[str] = []
+    depth: int = 0
+    quote: str | None = None
+    item_start: int = select_match.end()
+    for index in range(select_match.end(), len(aql_query)):
+        char: str = aql_query[index]
+        if quote:
+            quote = None if char == quote else quote
+        elif char in "'\"":
+            quote = char
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "," and not depth:
+            items.append(aql_query[item_start:index].strip())
+            item_start = index + 1
+        elif not depth and aql_query[index : index + 6].lower() == " from ":
+            items.append(aql_query[item_start:index].strip())
+            return items, aql_query[index + 1 :]
+    return None
+
+
+def build_lean_query(aql_query: str) -> str | None:
+    """Build the lean search of an AQL query, without its **log** column and with the identifier columns.
+
+    Parameters
+    ----------
+    aql_query : str
+        The AQL query selecting the matcher's fields and the payload as **log**
+
+    Returns
+    -------
+    str | None
+        Lean AQL query, None if the query has no **log** column.
+
+    Examples
+    --------
+    >>> build_lean_query(aql_query='select "Event ID" as event_id, utf8(payload) as log from events last 15 minutes')
+    ... 'select starttime, qid, "Event ID" as event_id from events last 15 minutes'
+    """
+
+    select: tuple[list[str], str] | None = split_select_items(aql_query=aql_query)
+    if not select:
+        return None
+
+    items, from_clause = select
+    lean_items: list[str] = [item for item in items if not AQL_LOG_ITEM_PATTERN.search(item)]
+    if len(lean_items) == len(items):
+        return None
+
+    identifier_items: list[str] = [
+        field for field in IDENTIFIER_FIELDS if field not in (item.lower() for item in lean_items)
+    ]
+    return f"select {', '.join(identifier_items + lean_items)} {from_clause}"
+
+
+def build_log_query(
+    aql_query: str, representatives: list[PostArielSearchResultItem]
+) -> str | None:
+    """Build the targeted search of the representative rows' logs from the full AQL query.
+
+    The representatives are searched by their identifiers in the original conditions, the rows are limited to
+    their start times, and a **last N minutes** time clause is extended to the oldest representative since the
+    lean search's window has moved on. A **start/stop** time clause is kept as is.
+
+    Parameters
+    ----------
+    aql_query : str
+        The full AQL query with the **log** column.
+    representatives : list[PostArielSearchResultItem]
+        Lean rows to search the logs of.
+
+    Returns
+    -------
+    str | None
+        AQL query of the representatives' logs, None if the query has no where clause or no representative
+        has the identifiers.
+    """
+
+    identifiers: set[tuple[int, int]] = set()
+    for representative in representatives:
+        try:
+            identifiers.add(
+                (int(representative.get("starttime")), int(representative.get("qid")))
+            )
+        except (TypeError, ValueError):
+            continue
+    if not identifiers:
+        return None
+
+    select: tuple[list[str], str] | None = split_select_items(aql_query=aql_query)
+    if not select:
+        return None
+
+    items, from_clause = select
+    where_match: Match | None = AQL_WHERE_PATTERN.search(from_clause)
+    if not where_match:
+        return None
+
+    where_end_match: Match | None = AQL_WHERE_END_PATTERN.search(from_clause, where_match.end())
+    time_clause_match: Match | None = AQL_TIME_CLAUSE_PATTERN.search(from_clause)
+    where_end: int = (
+        where_end_match.start()
+        if where_end_match
+        else time_clause_match.start() if time_clause_match else len(from_clause)
+    )
+    source: str = from_clause[: where_match.start()]
+    conditions: str = from_clause[where_match.end() : where_end].strip()
+    tail: str = from_clause[where_end:]
+    identifier_items: list[str] = [
+        field for field in IDENTIFIER_FIELDS if field not in (item.lower() for item in items)
+    ]
+
+    start_times: list[int] = [start_time for start_time, _ in identifiers]
+    identifier_conditions: str = " or ".join(
+        f"(starttime = {start_time} and qid = {qid})" for start_time, qid in sorted(identifiers)
+    )
+    if AQL_LAST_MINUTES_PATTERN.search(tail):
+        minutes: int = ceil((time() * 1000 - min(start_times)) / 60000) + 1
+        tail = AQL_LAST_MINUTES_PATTERN.sub(f" last {minutes} minutes", tail)
+
+    return (
+        f"select {', '.join(identifier_items + items)} {source}"
+        f" where starttime between {min(start_times)} and {max(start_times)}"
+        f" and ({identifier_conditions}) and ({conditions}){tail}"
+    )
+
+
+def set_aql_query_last_minutes(aql_query: str, minutes: int) -> str:
+    """Replace the **last N minutes/hours/days** clause at the end of the AQL query with the given minutes.
+
+    A query with a **start/stop** time clause or without a time clause is returned as is.
+
+    Examples
+    --------
+    >>> set_aql_query_last_minutes(aql_query="select * from events limit 10 last 15 minutes", minutes=5)
+    ... "select * from events limit 10 last 5 minutes"
+    """
+
+    return AQL_LAST_MINUTES_PATTERN.sub(f" last {minutes} minutes", aql_query)
+
+
+def has_absolute_time_range(aql_query: str) -> bool:
+    """Does the AQL query end with a **start/stop** time clause, its results don't change with the search time.
+
+    Examples
+    --------
+    >>> has_absolute_time_range(aql_query="select * from events start '2024-01-01 00:00:00' stop '2024-01-02 00:00:00'")
+    ... True
+    >>> has_absolute_time_range(aql_query="select * from events last 15 minutes")
+    ... False
+    """
+
+    return AQL_START_STOP_PATTERN.search(aql_query) is not None
+
+
+def build_count_query(aql_query: str) -> str | None:
+    """Build the count probe of an AQL query, the number of rows of each event id in its conditions & time clause.
+
+    The probe selects no payload, it is a cheap aggregate to skip the detailed search of the event ids without rows.
+
+    Parameters
+    ----------
+    aql_query : str
+        The AQL query selecting the event id as **event_id**
+
+    Returns
+    -------
+    str | None
+        AQL query of the rows' counts by **event_id** as **event_count**, None if the query has no **event_id** column.
+
+    Examples
+    --------
+    >>> build_count_query(aql_query='select "Event ID" as event_id, utf8(payload) as log from events where "Event ID" in (4720) limit 1000 last 15 minutes')
+    ... 'select "Event ID" as event_id, count(*) as event_count from events where "Event ID" in (4720) group by "Event ID" last 15 minutes'
+    """
+
+    select: tuple[list[str], str] | None = split_select_items(aql_query=aql_query)
+    if not select:
+        return None
+
+    items, from_clause = select
+    event_id_expressions: list[str] = [
+        item[: match.start()].strip()
+        for item in items
+        if (match := AQL_EVENT_ID_ITEM_PATTERN.search(item))
+    ]
+    if not event_id_expressions:
+        return None
+
+    time_clause_match: Match | None = AQL_TIME_CLAUSE_PATTERN.search(from_clause)
+    body_end: int = time_clause_match.start() if time_clause_match else len(from_clause)
+    # the group by, order by & limit of the detailed search don't apply to the counts
+    body_end_match: Match | None = AQL_WHERE_END_PATTERN.search(from_clause[:body_end])
+    body: str = from_clause[: body_end_match.start() if body_end_match else body_end]
+    time_clause: str = from_clause[time_clause_match.start() :] if time_clause_match else ""
+
+    event_id_expression: str = event_id_expressions[0]
+    return (
+        f"select {event_id_expression} as event_id, count(*) as event_count {body}"
+        f" group by {event_id_expression}{time_clause}"
+    )
+
+
+def get_count_event_ids(counted_events: list[PostArielSearchResultItem]) -> set[str]:
+    """Get the event ids which have rows in the results of a count probe, see build_count_query."""
+
+    event_ids: set[str] = set()
+    for counted_event in counted_events:
+        try:
+            if float(counted_event.get("event_count") or 0) <= 0:
+                continue
+        except (TypeError, ValueError):
+            # a count which could not be read is treated as a hit, the event id is searched
+            pass
+
+        event_id: Any = counted_event.get("event_id")
+        # the console may return the numeric event ids as floats, e.g. 4720.0
+        event_ids.add(
+            str(int(event_id)) if isinstance(event_id, float) and event_id.is_integer() else str(event_id)
+        )
+    return event_ids
+
+
+def get_aql_query_window_minutes(aql_query: str) -> float | None:
+    """Get the minutes searched by the time clause at the end of the AQL query, None if it has no time clause.
+
+    Examples
+    --------
+    >>> get_aql_query_window_minutes(aql_query="select * from events last 2 hours")
+    ... 120.0
+    """
+
+    last_match: Match | None = AQL_LAST_PATTERN.search(aql_query)
+    if last_match:
+        return float(int(last_match.group(1)) * AQL_UNIT_MINUTES[last_match.group(2).lower()])
+
+    start_stop_match: Match | None = AQL_START_STOP_PATTERN.search(aql_query)
+    if not start_stop_match:
+        return None
+
+    time_format: str = "%Y-%m-%d %H:%M:%S"
+    try:
+        start: datetime = datetime.strptime(start_stop_match.group(1), time_format)
+        stop: datetime = datetime.strptime(start_stop_match.group(2), time_format)
+    except ValueError:
+        return None
+    return max((stop - start).total_seconds() / 60, 0)
+
+
+def get_row_key(searched_event: PostArielSearchResultItem) -> tuple[Any, ...]:
+    """Get the key of a searched row to match the rows of the log search with the representatives."""
+
+    return tuple(searched_event.get(field) for field in ROW_KEY_FIELDS)
@@ -0,0 +1,289 @@
+from atexit import register as atexit_register
+from asyncio import gather, sleep
+from threading import Lock
+from time import monotonic
+
+from ..async_http_client import AsyncHttpClient, AsyncResponse, SyncFacade, log_message
+from .types import (
+    PostArielSearchResponse,
+    PostArielSearchResultItem,
+    PostArielSearchResultsResponse,
+)
+
+
+class AsyncQRadar:
+    """Asyncio variant of the QRadar class to drive many searches and result pages from one event loop.
+
+    For more details, see [QRadar API Documentation](https://ibmsecuritydocs.github.io/qradar_api_16.0)
+
+    Attributes
+    ----------
+    url : str
+        QRadar console URL.
+    http_client : AsyncHttpClient
+        Async HTTP client to make requests.
+
+    Methods
+    -------
+    - post_create_search_by_aql_query(aql_query: str) -> str | None
+    - check_search_is_completed_by_search_id(search_id: str, request_delay: float | int = 1, timeout: float | int | None = None) -> bool
+    - get_search_by_search_id(search_id: str) -> PostArielSearchResponse | None
+    - get_search_results_by_search_id(search_id: str, page_size: int | None = None, record_count: int = 0) -> list[PostArielSearchResultItem]
+    - delete_search_by_search_id(search_id: str) -> bool
+    - run_search(aql_query: str, request_delay: float | int = 1, timeout: float | int | None = None, page_size: int | None = None) -> list[PostArielSearchResultItem] | None
+    - run_searches(aql_queries: list[str], **search_kwargs) -> list[list[PostArielSearchResultItem] | None]
+    - close() -> None
+    """
+
+    def __init__(
+        self, url: str, username: str, password: str, max_connections: int = 20
+    ) -> None:
+        self.url: str = url
+        self.http_client: AsyncHttpClient = AsyncHttpClient(
+            url=url, max_connections=max_connections, auth=(username, password)
+        )
+
+    async def post_create_search_by_aql_query(self, aql_query: str) -> str | None:
+        """Create a new search based on the given AQL query, same as QRadar.post_create_search_by_aql_query."""
+
+        res: AsyncResponse | None = await self.http_client.request(
+            method="post",
+            endpoint="/api/ariel/searches",
+            params={"query_expression": aql_query},
+        )
+        if not res:
+            return
+
+        data: PostArielSearchResponse = res.json()
+        return data.get("search_id")
+
+    async def check_search_is_completed_by_search_id(
+        self,
+        search_id: str,
+        request_delay: float | int = 1,
+        timeout: float | int | None = None,
+    ) -> bool:
+        """Check if the search is completed without blocking the event loop, same as QRadar.check_search_is_completed_by_search_id."""
+
+        started_at: float = monotonic()
+        while True:
+            if timeout is not None and monotonic() - started_at > timeout:
+                log_message(
+                    mode="warning",
+                    msg=f"search ⊱ {search_id} ⊰ is not completed in ⊱ {timeout} ⊰ seconds",
+                )
+                return False
+
+            data: PostArielSearchResponse | None = await self.get_search_by_search_id(
+                search_id=search_id
+            )
+            if not data:
+                return False
+
+            if data.get("completed", True):
+                return True
+
+            await sleep(request_delay)
+
+    async def get_search_by_search_id(
+        self, search_id: str
+    ) -> PostArielSearchResponse | None:
+        """Get the search information by search_id, same as QRadar.get_search_by_search_id."""
+
+        res: AsyncResponse | None = await self.http_client.request(
+            method="get", endpoint=f"/api/ariel/searches/{search_id}"
+        )
+        if not res:
+            return
+
+        data: PostArielSearchResponse = res.json()
+        return data
+
+    async def get_search_results_by_search_id(
+        self, search_id: str, page_size: int | None = None, record_count: int = 0
+    ) -> list[PostArielSearchResultItem]:
+        """Get the searched results by search_id, the pages are requested concurrently.
+
+        For more details, see [GET /ariel/searches/{search_id}/results](https://ibmsecuritydocs.github.io/qradar_api_16.0/16.0--ariel-searches-search_id-results-GET.html)
+
+        Parameters
+        ----------
+        search_id : str
+            The search_id to get the results.
+        page_size : int | None, optional
+            Number of results per request with the Range header, all results at once if None. Default is None.
+        record_count : int, optional
+            Number of the search's results, the results are requested at once if it is not more than a page.
+            Default is 0.
+
+        Returns
+        -------
+        list[PostArielSearchResultItem]
+            The searched results in the search order, empty if a request failed.
+        """
+
+        if not page_size or record_count <= page_size:
+            return await self._get_search_results_page(search_id=search_id) or []
+
+        pages: list[list[PostArielSearchResultItem] | None] = await gather(
+            *[
+                self._get_search_results_page(
+                    search_id=search_id,
+                    first_item=first_item,
+                    last_item=min(first_item + page_size, record_count) - 1,
+                )
+                for first_item in range(0, record_count, page_size)
+            ]
+        )
+        # a missing page would drop its events silently, the results are fetched again by the next run
+        if any(page is None for page in pages):
+            return []
+        return [event for page in pages for event in page]
+
+    async def delete_search_by_search_id(self, search_id: str) -> bool:
+        """Delete the search, same as QRadar.delete_search_by_search_id."""
+
+        res: AsyncResponse | None = await self.http_client.request(
+            method="delete", endpoint=f"/api/ariel/searches/{search_id}"
+        )
+        return res is not None and (res.ok or res.status_code == 404)
+
+    async def run_search(
+        self,
+        aql_query: str,
+        request_delay: float | int = 1,
+        timeout: float | int | None = None,
+        page_size: int | None = None,
+    ) -> list[PostArielSearchResultItem] | None:
+        """Create a search, wait for its completion, get its results and delete it.
+
+        Parameters
+        ----------
+        aql_query : str
+            The AQL query to search.
+        request_delay : float | int, optional
+            Delay in seconds between each status request. Default is 1.
+        timeout : float | int | None, optional
+            Maximum seconds to wait for the search. Default is None.
+        page_size : int | None, optional
+            Number of results per results request. Default is None.
+
+        Returns
+        -------
+        list[PostArielSearchResultItem] | None
+            The searched results if the search is completed, None otherwise.
+        """
+
+        search_id: str | None = await self.post_create_search_by_aql_query(
+            aql_query=aql_query
+        )
+        if not search_id:
+            log_message(mode="error", msg="search id not found")
+            return
+
+        try:
+            is_search_completed: bool = await self.check_search_is_completed_by_search_id(
+                search_id=search_id, request_delay=request_delay, timeout=timeout
+            )
+            if not is_search_completed:
+                return
+
+            record_count: int = 0
+            if page_size:
+                search: PostArielSearchResponse | None = await self.get_search_by_search_id(
+                    search_id=search_id
+                )
+                record_count = search.get("record_count", 0) if search else 0
+            return await self.get_search_results_by_search_id(
+                search_id=search_id, page_size=page_size, record_count=record_count
+            )
+        finally:
+            await self.delete_search_by_search_id(search_id=search_id)
+
+    async def run_searches(
+        self, aql_queries: list[str], **search_kwargs
+    ) -> list[list[PostArielSearchResultItem] | None]:
+        """Run the searches of the given AQL queries concurrently.
+
+        Parameters
+        ----------
+        aql_queries : list[str]
+            The AQL queries to search.
+        **search_kwargs
+            Keyword arguments to pass to the run_search method (request_delay, timeout, page_size).
+
+        Returns
+        -------
+        list[list[PostArielSearchResultItem] | None]
+            The searched results of each query in the given order.
+        """
+
+        return await gather(
+            *[
+                self.run_search(aql_query=aql_query, **search_kwargs)
+                for aql_query in aql_queries
+            ]
+        )
+
+    async def close(self) -> None:
+        """Close the HTTP session."""
+
+        await self.http_client.close()
+
+    async def _get_search_results_page(
+        self,
+        search_id: str,
+        first_item: int | None = None,
+        last_item: int | None = None,
+    ) -> list[PostArielSearchResultItem] | None:
+        """Get a page of the searched results, all results if the item range is not given, None if the request failed."""
+
+        headers: dict[str, str] = (
+            {"Range": f"items={first_item}-{last_item}"}
+            if first_item is not None
+            else {}
+        )
+        res: AsyncResponse | None = await self.http_client.request(
+            method="get",
+            endpoint=f"/api/ariel/searches/{search_id}/results",
+            headers=headers,
+        )
+        if not res:
+            return
+
+        data: PostArielSearchResultsResponse = res.json()
+        return data.get("events", [])
+
+
+_async_qradars: dict[tuple[str, str], SyncFacade] = {}
+_async_qradars_lock: Lock = Lock()
+
+
+def get_async_qradar(url: str, username: str, password: str) -> SyncFacade:
+    """Get the sync facade of the console's async client, the qradar instances of the same console share it,
+    so its session (and connections) is kept on the background event loop between the runs.
+
+    Parameters
+    ----------
+    url : str
+        QRadar console URL.
+    username : str
+        Username of the console.
+    password : str
+        Password of the console.
+
+    Returns
+    -------
+    SyncFacade
+        AsyncQRadar of the console whose coroutine methods are called synchronously.
+    """
+
+    key: tuple[str, str] = (url, username)
+    with _async_qradars_lock:
+        if key not in _async_qradars:
+            _async_qradars[key] = SyncFacade(
+                AsyncQRadar(url=url, username=username, password=password)
+            )
+            # the shared session is kept open between the runs, it is closed at exit
+            atexit_register(_async_qradars[key].close)
+        return _async_qradars[key]
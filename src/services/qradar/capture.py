@@ -0,0 +1,122 @@
+from datetime import datetime
+from gzip import open as gzip_open
+from io import TextIOWrapper
+from json import dumps as json_dumps, loads as json_loads
+from os import makedirs as os_makedirs
+from pathlib import Path
+from typing import IO, Any, Iterator
+
+try:
+    import zstandard
+except ImportError:  # zstandard is optional, captures are written with gzip without it
+    zstandard = None
+
+from .types import PostArielSearchResultItem
+
+
+def open_capture_file(file_path: Path, mode: str) -> IO[str]:
+    """Open a capture file as text, compressed with zstd (.zst) or gzip (.gz) by its extension.
+
+    Parameters
+    ----------
+    file_path : Path
+        Capture file path.
+    mode : str
+        "r" to read, "w" to write.
+
+    Returns
+    -------
+    IO[str]
+        Text stream of the decompressed NDJSON content.
+
+    Raises
+    ------
+    ValueError
+        If the file is a zstd capture and zstandard is not installed.
+    """
+
+    if file_path.suffix != ".zst":
+        return gzip_open(filename=file_path, mode=f"{mode}t", encoding="utf-8")
+
+    if zstandard is None:
+        raise ValueError(f"zstandard must be installed to open {file_path.name}")
+
+    raw_file: IO[bytes] = open(file=file_path, mode=f"{mode}b")
+    stream: IO[bytes] = (
+        zstandard.ZstdCompressor().stream_writer(raw_file, closefd=True)
+        if mode == "w"
+        else zstandard.ZstdDecompressor().stream_reader(raw_file, closefd=True)
+    )
+    return TextIOWrapper(stream, encoding="utf-8")
+
+
+def write_capture(
+    capture_folder: Path,
+    metadata: dict[str, Any],
+    events: list[PostArielSearchResultItem],
+) -> Path:
+    """Write the raw searched events to a compressed NDJSON capture file.
+
+    The first line is the capture header with the metadata (AQL query, time window, etc.), each
+    following line is a searched event as returned by QRadar.
+
+    Parameters
+    ----------
+    capture_folder : Path
+        Folder to write the capture file.
+    metadata : dict[str, Any]
+        Search metadata to write to the header.
+    events : list[PostArielSearchResultItem]
+        Raw searched events.
+
+    Returns
+    -------
+    Path
+        Written capture file path, e.g. **/path/to/captures/20250701T120000_<search_id>.ndjson.zst**
+    """
+
+    os_makedirs(name=capture_folder, exist_ok=True)
+    extension: str = ".ndjson.zst" if zstandard is not None else ".ndjson.gz"
+    file_name: str = f"{datetime.now().strftime('%Y%m%dT%H%M%S')}_{metadata.get('search_id', 'search')}{extension}"
+    file_path: Path = capture_folder / file_name
+
+    with open_capture_file(file_path=file_path, mode="w") as f:
+        f.write(json_dumps({"capture": metadata, "event_count": len(events)}) + "\n")
+        for event in events:
+            f.write(json_dumps(event, ensure_ascii=False) + "\n")
+
+    return file_path
+
+
+def read_capture(file_path: Path) -> tuple[dict[str, Any], Iterator[PostArielSearchResultItem]]:
+    """Read a capture file written by write_capture.
+
+    Parameters
+    ----------
+    file_path : Path
+        Capture file path.
+
+    Returns
+    -------
+    tuple[dict[str, Any], Iterator[PostArielSearchResultItem]]
+        Capture header and a lazy iterator over the searched events.
+
+    Raises
+    ------
+    ValueError
+        If the file is not a capture file.
+    """
+
+    f: IO[str] = open_capture_file(file_path=file_path, mode="r")
+    header: dict[str, Any] = json_loads(f.readline() or "{}")
+    if "capture" not in header:
+        f.close()
+        raise ValueError(f"{file_path.name} is not a qradar capture file")
+
+    def iter_events() -> Iterator[PostArielSearchResultItem]:
+        with f:
+            for line in f:
+                if line.strip():
+                    yield json_loads(line)
+
+    return header, iter_events()
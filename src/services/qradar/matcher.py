@@ -0,0 +1,431 @@
+from fnmatch import translate as fnmatch_translate
+from re import compile as re_compile, error as re_error, Pattern
+from typing import Any, Callable
+
+from .normalizer import FieldNormalizer
+
+
+# global inline flags of a regular expression, e.g. (?i), they are scoped to the expression when merged
+GLOBAL_FLAGS_PATTERN: Pattern = re_compile(r"^\(\?([aiLmsux]+)\)")
+
+
+# rule keys of the include/exclude lists with the searched event's field they are matched with
+RULE_FIELD_KEYS: dict[str, str] = {
+    "src_users": "src_user",
+    "dst_users": "dst_user",
+    "groups": "group_name",
+}
+
+
+def has_non_literal(text: str) -> bool:
+    """Check if a pattern (or the newline joined patterns of a list) has a wildcard, a **re:**, **prefix:** or **ref:** pattern."""
+
+    return (
+        "*" in text
+        or "?" in text
+        or "[" in text
+        or text.startswith(("re:", "prefix:", "ref:"))
+        or "\nre:" in text
+        or "\nprefix:" in text
+        or "\nref:" in text
+    )
+
+
+class FieldMatcher:
+    """Match a field value with the patterns of an include/exclude list.
+
+    - **exact string**: matched as is, e.g. **administrator**
+    - **glob**: matched with the *, ? and [...] wildcards, e.g. **\\*$** for the machine accounts
+    - **prefix:** matched with the beginning of the value, e.g. **prefix:svc_** (same as **svc_\\***)
+    - **re:** matched with the whole value as a regular expression, e.g. **re:svc_[a-z]+_\\d{2}**
+    - **ref:** matched with the values of a QRadar reference set, e.g. **ref:Service Accounts**
+
+    The exact strings are kept in a set, the prefixes in a trie and the globs & regular expressions are merged
+    into one regular expression, so each value is evaluated once whatever the list size is. The results are
+    memoized, the same users & groups repeat across the searched rows.
+
+    With a field normalizer, the exact strings and the reference sets' values are normalised as the searched values,
+    the prefixes & globs are only case-folded and the **re:** patterns are matched as written.
+
+    Attributes
+    ----------
+    literals : set[str]
+        Exact strings of the list.
+    prefix_trie : dict[str, dict]
+        Trie of the prefixes, a node with the "" key ends a prefix.
+    pattern : Pattern | None
+        Merged regular expression of the globs & regular expressions, None if there is none.
+    reference_sets : list[frozenset[str]]
+        Values of the referenced reference sets.
+
+    Methods
+    -------
+    - matches(value: str) -> bool
+    """
+
+    MAX_MEMO_SIZE: int = 65536
+
+    def __init__(
+        self,
+        patterns: list[str],
+        reference_sets: dict[str, frozenset[str] | None] | None = None,
+        normalizer: FieldNormalizer | None = None,
+        is_user: bool = False,
+    ) -> None:
+        """Compile the patterns of an include/exclude list.
+
+        Parameters
+        ----------
+        patterns : list[str]
+            Exact strings, globs, **prefix:**, **re:** and **ref:** patterns.
+        reference_sets : dict[str, frozenset[str] | None] | None, optional
+            Values of the reference sets by name, the missing ones are matched as empty. Default is None.
+        normalizer : FieldNormalizer | None, optional
+            Normalizer of the searched values, the patterns are normalised with it. Default is None.
+        is_user : bool, optional
+            Is the list matched with a src_user or dst_user value. Default is False.
+
+        Raises
+        ------
+        ValueError
+            If a **re:** pattern is not a valid regular expression.
+        """
+
+        self.literals: set[str] = set()
+        self.prefix_trie: dict[str, dict] = {}
+        self.reference_sets: list[frozenset[str]] = []
+        regexes: list[str] = []
+
+        normalize_value: Callable[[Any], Any] | None = None
+        normalize_pattern: Callable[[str], str] = str
+        if normalizer is not None and not normalizer.is_identity:
+            normalize_value = normalizer.normalize_user if is_user else normalizer.normalize_group
+            normalize_pattern = normalizer.normalize_pattern
+
+        # the lists are mostly exact strings, they are converted to a set at once
+        if not has_non_literal(text="\n".join(patterns)):
+            self.literals = set(map(normalize_value, patterns) if normalize_value else patterns)
+            patterns = []
+
+        for pattern in patterns:
+            if not has_non_literal(text=pattern):
+                self.literals.add(normalize_value(pattern) if normalize_value else pattern)
+            elif pattern.startswith("re:"):
+                regex: str = validate_regex(pattern=pattern)
+                if GLOBAL_FLAGS_PATTERN.match(regex):
+                    # (?i)admin.* is merged as (?i:admin.*), the global flags are only allowed at the start
+                    regex = GLOBAL_FLAGS_PATTERN.sub(r"(?\1:", regex, count=1) + ")"
+                regexes.append(regex)
+            elif pattern.startswith("prefix:"):
+                self._add_prefix(prefix=normalize_pattern(pattern[7:]))
+            elif pattern.startswith("ref:"):
+                reference_set: frozenset[str] | None = (reference_sets or {}).get(pattern[4:])
+                if reference_set:
+                    self.reference_sets.append(
+                        frozenset(map(normalize_value, reference_set))
+                        if normalize_value
+                        else reference_set
+                    )
+            elif pattern.endswith("*") and not has_non_literal(text=pattern[:-1]):
+                # a trailing * is the most common glob (svc_*), it is a prefix
+                self._add_prefix(prefix=normalize_pattern(pattern[:-1]))
+            else:
+                # fnmatch's translation is anchored with \Z, fullmatch is used for the regular expressions
+                regexes.append(fnmatch_translate(normalize_pattern(pattern)))
+
+        self.pattern: Pattern | None = (
+            re_compile("|".join(f"(?:{regex})" for regex in regexes)) if regexes else None
+        )
+        self._memo: dict[str, bool] = {}
+
+    def _add_prefix(self, prefix: str) -> None:
+        node: dict[str, dict] = self.prefix_trie
+        for char in prefix:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def _has_prefix(self, value: str) -> bool:
+        node: dict[str, dict] | None = self.prefix_trie
+        if not node:
+            return False
+
+        for char in value:
+            if "" in node:
+                return True
+            node = node.get(char)
+            if node is None:
+                return False
+        return "" in node
+
+    def matches(self, value: str) -> bool:
+        """Check if the value matches any pattern of the list."""
+
+        is_matched: bool | None = self._memo.get(value)
+        if is_matched is not None:
+            return is_matched
+
+        is_matched = (
+            value in self.literals
+            or any(value in reference_set for reference_set in self.reference_sets)
+            or self._has_prefix(value=value)
+            or (self.pattern is not None and self.pattern.fullmatch(value) is not None)
+        )
+        # the memo is bounded, a search with many unique values must not keep them all
+        if len(self._memo) >= self.MAX_MEMO_SIZE:
+            self._memo.clear()
+        self._memo[value] = is_matched
+        return is_matched
+
+
+class RuleMatcher:
+    """Match the searched event's fields with the include/exclude lists of a windows security event rule.
+
+    Attributes
+    ----------
+    wse : dict[str, Any]
+        The windows security event rule.
+    excluded : dict[str, FieldMatcher]
+        Matchers of the non-empty excluded_* lists by the searched event's field.
+    included : dict[str, FieldMatcher]
+        Matchers of the non-empty included_* lists by the searched event's field.
+
+    Methods
+    -------
+    - matches(fields: dict[str, str]) -> bool
+    """
+
+    def __init__(
+        self,
+        wse: dict[str, Any],
+        reference_sets: dict[str, frozenset[str] | None] | None = None,
+        normalizer: FieldNormalizer | None = None,
+    ) -> None:
+        self.wse: dict[str, Any] = wse
+        self.excluded: dict[str, FieldMatcher] = {}
+        self.included: dict[str, FieldMatcher] = {}
+
+        for rule_key, field in RULE_FIELD_KEYS.items():
+            for prefix, matchers in (("excluded", self.excluded), ("included", self.included)):
+                patterns: list[str] = wse.get(f"{prefix}_{rule_key}") or []
+                if patterns:
+                    matchers[field] = FieldMatcher(
+                        patterns=patterns,
+                        reference_sets=reference_sets,
+                        normalizer=normalizer,
+                        is_user=field != "group_name",
+                    )
+
+    def matches(self, fields: dict[str, str]) -> bool:
+        """Check if the fields are not excluded and are included when the included list is not empty.
+
+        Parameters
+        ----------
+        fields : dict[str, str]
+            The searched event's src_user, dst_user and group_name values.
+        """
+
+        return not any(
+            matcher.matches(value=fields[field]) for field, matcher in self.excluded.items()
+        ) and all(
+            matcher.matches(value=fields[field]) for field, matcher in self.included.items()
+        )
+
+
+class RuleIndex:
+    """Compiled windows security event rules indexed by the event id, built once for a rules list.
+
+    It also keeps the matched event texts of each rule in a set, so a text is added to the rule's events list once
+    without converting the list on each searched row, and the raw logs of the matched rows until they are stored.
+    A rule's events in memory are bounded with **spill_threshold**, the caller spills them with pop_events,
+    and its raw logs with **max_event_logs**, only the last matched logs are kept.
+
+    Attributes
+    ----------
+    windows_security_events : list[dict[str, Any]]
+        The indexed rules list.
+    rules : dict[str, list[RuleMatcher]]
+        Matchers of the rules by the event id, in the rules list order.
+    spill_threshold : int
+        Number of the distinct event texts of a rule kept in memory before they are spilled, 0 disables spilling.
+    max_event_logs : int
+        Number of the last distinct raw logs of a rule kept until they are stored, 0 keeps all of them.
+
+    Methods
+    -------
+    - match(event_id: str | None, fields: dict[str, str]) -> dict[str, Any] | None
+    - add_event(wse: dict[str, Any], event_text: str) -> bool
+    - pop_events(wse: dict[str, Any]) -> list[str]
+    - set_events(wse: dict[str, Any], events: list[str]) -> None
+    - add_event_log(wse: dict[str, Any], event_log: str) -> None
+    - pop_event_logs() -> list[tuple[dict[str, Any], list[str]]]
+    - add_representative(wse: dict[str, Any], fields: dict[str, str], searched_event: dict[str, Any]) -> None
+    - pop_representatives() -> list[tuple[dict[str, Any], dict[str, Any]]]
+    """
+
+    def __init__(
+        self,
+        windows_security_events: list[dict[str, Any]],
+        reference_sets: dict[str, frozenset[str] | None] | None = None,
+        spill_threshold: int = 0,
+        normalizer: FieldNormalizer | None = None,
+        max_event_logs: int = 0,
+    ) -> None:
+        self.windows_security_events: list[dict[str, Any]] = windows_security_events
+        self.spill_threshold: int = spill_threshold
+        self.max_event_logs: int = max_event_logs
+        self.rules: dict[str, list[RuleMatcher]] = {}
+        for wse in windows_security_events:
+            self.rules.setdefault(wse.get("event_id"), []).append(
+                RuleMatcher(wse=wse, reference_sets=reference_sets, normalizer=normalizer)
+            )
+        self._events: dict[int, set[str]] = {}
+        # raw logs of the matched rows by the rule id, the last matched log is the last one
+        self._event_logs: dict[int, tuple[dict[str, Any], dict[str, None]]] = {}
+        # last matched lean row (without log) of each rule & fields, their logs are searched afterwards
+        self._representatives: dict[tuple[int, str, str, str], tuple[dict[str, Any], dict[str, Any]]] = {}
+
+    def match(self, event_id: str | None, fields: dict[str, str]) -> dict[str, Any] | None:
+        """Get the first rule of the event id which matches the fields, None if there is none."""
+
+        for rule in self.rules.get(event_id, []):
+            if rule.matches(fields=fields):
+                return rule.wse
+        return None
+
+    def add_event(self, wse: dict[str, Any], event_text: str) -> bool:
+        """Add the event text to the rule's events list if it is not in the list yet.
+
+        Returns
+        -------
+        bool
+            True if the rule's events in memory exceeded the spill threshold, they should be spilled with pop_events.
+        """
+
+        events: set[str] | None = self._events.get(id(wse))
+        if events is None:
+            events = self._events[id(wse)] = set(wse.get("events", []))
+            wse["events"] = list(wse.get("events", []))
+
+        if event_text not in events:
+            events.add(event_text)
+            wse["events"].append(event_text)
+            return 0 < self.spill_threshold < len(events)
+        return False
+
+    def pop_events(self, wse: dict[str, Any]) -> list[str]:
+        """Get & clear the rule's events in memory to spill them, the spill deduplicates the texts matched again."""
+
+        events: list[str] = wse.get("events", [])
+        wse["events"] = []
+        self._events[id(wse)] = set()
+        return events
+
+    def set_events(self, wse: dict[str, Any], events: list[str]) -> None:
+        """Set the rule's events list, e.g. merged from the spill, its set is built again on the next added event."""
+
+        wse["events"] = events
+        self._events.pop(id(wse), None)
+
+    def add_event_log(self, wse: dict[str, Any], event_log: str) -> None:
+        """Keep the raw log of a matched row until the logs are stored, the identical logs are kept once."""
+
+        rule_event_logs: tuple[dict[str, Any], dict[str, None]] | None = self._event_logs.get(
+            id(wse)
+        )
+        if rule_event_logs is None:
+            rule_event_logs = self._event_logs[id(wse)] = (wse, {})
+
+        # an identical log is moved to the end, so the last one is the last matched log
+        rule_event_logs[1].pop(event_log, None)
+        rule_event_logs[1][event_log] = None
+        # the raw logs are effectively unique per row, the oldest one is dropped over the limit
+        if 0 < self.max_event_logs < len(rule_event_logs[1]):
+            del rule_event_logs[1][next(iter(rule_event_logs[1]))]
+
+    def add_representative(
+        self, wse: dict[str, Any], fields: dict[str, str], searched_event: dict[str, Any]
+    ) -> None:
+        """Keep the matched lean row as the representative of the rule & its src_user, dst_user, group_name values."""
+
+        self._representatives[
+            (id(wse), fields["src_user"], fields["dst_user"], fields["group_name"])
+        ] = (wse, searched_event)
+
+    def pop_representatives(self) -> list[tuple[dict[str, Any], dict[str, Any]]]:
+        """Get & clear the kept representative rows with their rules."""
+
+        representatives: list[tuple[dict[str, Any], dict[str, Any]]] = list(
+            self._representatives.values()
+        )
+        self._representatives.clear()
+        return representatives
+
+    def pop_event_logs(self) -> list[tuple[dict[str, Any], list[str]]]:
+        """Get & clear the kept raw logs of each rule, in their matched order."""
+
+        event_logs: list[tuple[dict[str, Any], list[str]]] = [
+            (wse, list(rule_event_logs)) for wse, rule_event_logs in self._event_logs.values()
+        ]
+        self._event_logs.clear()
+        return event_logs
+
+
+def validate_regex(pattern: str) -> str:
+    """Compile the regular expression of a **re:** pattern to validate it.
+
+    Returns
+    -------
+    str
+        The regular expression without the **re:** prefix.
+
+    Raises
+    ------
+    ValueError
+        If the pattern is not a valid regular expression.
+    """
+
+    try:
+        re_compile(pattern[3:])
+    except re_error as e:
+        raise ValueError(f"invalid regular expression ⊱ {pattern} ⊰: {e}")
+    return pattern[3:]
+
+
+def get_reference_set_names(windows_security_events: list[dict[str, Any]]) -> set[str]:
+    """Get the names of the reference sets referenced with **ref:** in the include/exclude lists of the rules."""
+
+    names: set[str] = set()
+    for wse in windows_security_events:
+        for prefix in ("excluded", "included"):
+            for rule_key in RULE_FIELD_KEYS:
+                patterns: list[str] = wse.get(f"{prefix}_{rule_key}") or []
+                # the lists are scanned at once, most of them have no reference set
+                if patterns and "ref:" in "\n".join(patterns):
+                    names.update(
+                        pattern[4:] for pattern in patterns if pattern.startswith("ref:")
+                    )
+    return names
+
+
+def validate_rule_patterns(windows_security_events: list[dict[str, Any]]) -> None:
+    """Compile the include/exclude lists of the rules to report the invalid patterns when the rules are loaded.
+
+    Raises
+    ------
+    ValueError
+        If a **re:** pattern of a rule is not a valid regular expression or a **ref:** pattern has no name.
+    """
+
+    for wse in windows_security_events:
+        for prefix in ("excluded", "included"):
+            for rule_key in RULE_FIELD_KEYS:
+                for pattern in wse.get(f"{prefix}_{rule_key}") or []:
+                    if pattern.startswith("re:"):
+                        try:
+                            validate_regex(pattern=pattern)
+                        except ValueError as e:
+                            raise ValueError(f"event id ⊱ {wse.get('event_id')} ⊰ has {e}")
+                    elif pattern == "ref:":
+                        raise ValueError(
+                            f"event id ⊱ {wse.get('event_id')} ⊰ has a reference set pattern without a name"
+                        )
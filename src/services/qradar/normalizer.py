@@ -0,0 +1,139 @@
+from typing import Any
+
+
+# value of the missing fields in the event texts
+EMPTY_FIELD_VALUE: str = "( not exists )"
+
+
+class FieldNormalizer:
+    """Canonicalise the user & group values of the searched rows before they are matched and deduplicated.
+
+    - **empty values**: None and the configured sentinels (e.g. **N/A**, **-**) are shown as **( not exists )**
+    - **user format**: the user names are written in one format, so the same account is one value
+        - **as_is**: kept as searched
+        - **name**: only the account name, **CORP\\alice** & **alice@corp.example.com** are **alice**
+        - **sam**: **alice@corp.example.com** is **CORP\\alice** (with the domain map, or the first domain label)
+        - **upn**: **CORP\\alice** is **alice@corp.example.com** (only the mapped domains)
+    - **case fold**: the users & groups are case-folded, **ALICE** is **alice**
+
+    Each distinct value is normalised once, the results are memoized per field kind in bounded memos,
+    the same users & groups repeat across the searched rows.
+
+    Attributes
+    ----------
+    case_fold : bool
+        Case-fold the users & groups.
+    user_format : str
+        Format of the user names, one of **as_is**, **name**, **sam** or **upn**.
+    domain_map : dict[str, str]
+        NetBIOS domain names by the lower-case UPN suffix, e.g. **{"corp.example.com": "CORP"}**
+    empty_values : frozenset[str]
+        Case-folded sentinels of the empty values.
+
+    Methods
+    -------
+    - normalize_user(value: Any) -> Any
+    - normalize_group(value: Any) -> Any
+    - normalize_pattern(pattern: str) -> str
+    """
+
+    USER_FORMATS: tuple[str, ...] = ("as_is", "name", "sam", "upn")
+
+    def __init__(
+        self,
+        case_fold: bool = False,
+        user_format: str = "as_is",
+        domain_map: dict[str, str] | None = None,
+        empty_values: tuple[str, ...] = (),
+        memo_size: int = 65536,
+    ) -> None:
+        """Configure the normalisation of the user & group values.
+
+        Raises
+        ------
+        ValueError
+            If the user format is not one of USER_FORMATS.
+        """
+
+        if user_format not in self.USER_FORMATS:
+            raise ValueError(
+                f"user format ⊱ {user_format} ⊰ is not one of ⊱ {', '.join(self.USER_FORMATS)} ⊰"
+            )
+
+        self.case_fold: bool = case_fold
+        self.user_format: str = user_format
+        self.domain_map: dict[str, str] = {
+            suffix.lower(): domain for suffix, domain in (domain_map or {}).items()
+        }
+        self.empty_values: frozenset[str] = frozenset(
+            value.strip().casefold() for value in empty_values
+        )
+        self.memo_size: int = memo_size
+        self._upn_suffixes: dict[str, str] = {
+            domain.lower(): suffix for suffix, domain in self.domain_map.items()
+        }
+        self._user_memo: dict[Any, Any] = {}
+        self._group_memo: dict[Any, Any] = {}
+
+    @property
+    def is_identity(self) -> bool:
+        """Are the values kept as searched, only None is shown as **( not exists )**"""
+
+        return not self.case_fold and self.user_format == "as_is" and not self.empty_values
+
+    def normalize_user(self, value: Any) -> Any:
+        """Normalise a src_user or dst_user value, memoized."""
+
+        normalized: Any = self._user_memo.get(value)
+        if normalized is None:
+            normalized = self._normalize(value=value, is_user=True)
+            # the memo is bounded, a search with many unique values must not keep them all
+            if len(self._user_memo) >= self.memo_size:
+                self._user_memo.clear()
+            self._user_memo[value] = normalized
+        return normalized
+
+    def normalize_group(self, value: Any) -> Any:
+        """Normalise a group_name value, memoized."""
+
+        normalized: Any = self._group_memo.get(value)
+        if normalized is None:
+            normalized = self._normalize(value=value, is_user=False)
+            if len(self._group_memo) >= self.memo_size:
+                self._group_memo.clear()
+            self._group_memo[value] = normalized
+        return normalized
+
+    def normalize_pattern(self, pattern: str) -> str:
+        """Normalise a prefix or a glob of an include/exclude list, only its case is folded since it is not a value."""
+
+        return pattern.casefold() if self.case_fold else pattern
+
+    def _normalize(self, value: Any, is_user: bool) -> Any:
+        if not isinstance(value, str):
+            return EMPTY_FIELD_VALUE if value is None else value
+
+        if self.empty_values and value.strip().casefold() in self.empty_values:
+            return EMPTY_FIELD_VALUE
+
+        if is_user and self.user_format != "as_is":
+            value = self._format_user(user=value)
+        return value.casefold() if self.case_fold else value
+
+    def _format_user(self, user: str) -> str:
+        domain, separator, name = user.partition("\\")
+        if separator:
+            if self.user_format == "name":
+                return name
+            if self.user_format == "upn" and domain.lower() in self._upn_suffixes:
+                return f"{name}@{self._upn_suffixes[domain.lower()]}"
+            return user
+
+        name, separator, suffix = user.rpartition("@")
+        if not separator or not name:
+            return user
+        if self.user_format == "name":
+            return name
+        if self.user_format == "sam":
+            return f"{self.domain_map.get(suffix.lower()) or suffix.split('.')[0].upper()}\\{name}"
+        return user
@@ -1,6 +1,29 @@
-from time import sleep
-
-from ..http_client import HttpClient, Response
+from datetime import datetime
+from pathlib import Path
+from re import Match
+from time import monotonic, sleep
+
+from src.utils.constants import (
+    EVENT_LOG_CONFIG,
+    EVENT_SPILL_THRESHOLD,
+    FIELD_NORMALIZATION_CONFIG,
+)
+from src.utils.deadline import get_timeout
+from src.utils.event_log_store import (
+    EventLogStore,
+    get_event_log_digest,
+    get_event_log_sample,
+)
+from src.utils.event_spill import EventSpill
+from src.utils.metrics import EVENT_SPILLS, SPILLED_EVENTS
+from ..http_client import HttpClient, Response, log_message
+from ..async_http_client import SyncFacade
+from .async_qradar import get_async_qradar
+from .aql import AQL_TIME_CLAUSE_PATTERN, get_row_key
+from .capture import write_capture
+from .matcher import RuleIndex, get_reference_set_names
+from .normalizer import EMPTY_FIELD_VALUE, FieldNormalizer
+from .reference_sets import ReferenceSetCache
 from .types import (
     PostArielSearchResponse,
     PostArielSearchResultItem,
@@ -18,21 +41,57 @@ class QRadar:
     ----------
     http_client : HttpClient
         HTTP client to make requests.
+    capture_folder : Path | None
+        Folder to capture the raw searched events for the offline replays, None disables the capture.
+    field_normalizer : FieldNormalizer
+        Normalizer of the searched users & groups, configured with the FIELD_* keys.
 
     Methods
     -------
     - post_create_search_by_aql_query(aql_query: str) -> str
-    - check_search_is_completed_by_search_id(search_id: str, max_request_attempt: int = 5, request_delay: float | int = 1) -> bool
-    - get_search_results_by_search_id(search_id: str) -> list[PostArielSearchResultItem]
-    - parse_searched_events(searched_event: PostArielSearchResultItem, windows_security_events: list[dict[str, Any]]) -> None
+    - check_search_is_completed_by_search_id(search_id: str, request_delay: float | int = 1, timeout: float | int | None = None) -> bool
+    - wait_for_search_by_search_id(search_id: str, request_delay: float | int = 1, timeout: float | int | None = None) -> PostArielSearchResponse | None
+    - get_search_by_search_id(search_id: str) -> PostArielSearchResponse | None
+    - get_search_results_by_search_id(search_id: str, page_size: int | None = None, record_count: int = 0) -> list[PostArielSearchResultItem]
+    - delete_search_by_search_id(search_id: str) -> bool
+    - capture_search_results(search_id: str, aql_query: str, events: list[PostArielSearchResultItem]) -> Path | None
+    - parse_searched_events(searched_event: PostArielSearchResultItem, rule_index: RuleIndex, source: str | None = None, event_spill: EventSpill | None = None) -> bool
+    - build_rule_index(windows_security_events: list[dict[str, Any]]) -> RuleIndex
+    - get_reference_sets(names: set[str]) -> dict[str, frozenset[str] | None]
+    - store_event_logs(rule_index: RuleIndex) -> int
+    - spill_events(rule_index: RuleIndex, event_spill: EventSpill, wse: dict[str, Any]) -> int
+    - spill_pending_events(rule_index: RuleIndex, event_spill: EventSpill) -> int
+    - merge_spilled_events(rule_index: RuleIndex, event_spill: EventSpill) -> int
+    - parse_representative_logs(rule_index: RuleIndex, representatives: list[tuple[dict[str, Any], PostArielSearchResultItem]], searched_events: list[PostArielSearchResultItem]) -> int
 
     Static Methods
     --------------
     - is_field_value_empty(field: Any) -> str
+    - set_aql_query_time_range(aql_query: str, start: datetime, stop: datetime) -> str
     """
 
-    def __init__(self, url: str, username: str, password: str) -> None:
+    def __init__(
+        self,
+        url: str,
+        username: str,
+        password: str,
+        capture_folder: Path | None = None,
+        async_pages: bool = False,
+    ) -> None:
+        self.url: str = url
         self.http_client: HttpClient = HttpClient(url=url, auth=(username, password))
+        self.capture_folder: Path | None = capture_folder
+        # shared by the qradar instances of the console, raises ValueError if aiohttp is not installed
+        self._async_qradar: SyncFacade | None = (
+            get_async_qradar(url=url, username=username, password=password)
+            if async_pages
+            else None
+        )
+        self.field_normalizer: FieldNormalizer = FieldNormalizer(**FIELD_NORMALIZATION_CONFIG)
+        # created when a rule references a reference set, so the state database is not opened without them
+        self._reference_set_cache: ReferenceSetCache | None = None
+        # created when the first matched logs are stored, the benchmarks & replays only match in memory
+        self._event_log_store: EventLogStore | None = None
 
     def post_create_search_by_aql_query(self, aql_query: str) -> str | None:
         """Create a new search based on the given AQL query.
@@ -66,6 +125,7 @@ class QRadar:
         self,
         search_id: str,
         request_delay: float | int = 1,
+        timeout: float | int | None = None,
     ) -> bool:
         """Check if the search is completed.
 
@@ -77,30 +137,90 @@ class QRadar:
             The search_id to check.
         request_delay : float | int, optional
             Delay in seconds between each request. Default is 1.
+        timeout : float | int | None, optional
+            Maximum seconds to wait for the search, waits until the search is completed if None. Default is None.
+            It is limited with the seconds until the run's deadline.
 
         Returns
         -------
         bool
-            True if the search is completed, False otherwise.
+            True if the search is completed, False otherwise (request error, timeout or deadline).
+        """
+
+        return (
+            self.wait_for_search_by_search_id(
+                search_id=search_id, request_delay=request_delay, timeout=timeout
+            )
+            is not None
+        )
+
+    def wait_for_search_by_search_id(
+        self,
+        search_id: str,
+        request_delay: float | int = 1,
+        timeout: float | int | None = None,
+    ) -> PostArielSearchResponse | None:
+        """Wait for the search to be completed, same as check_search_is_completed_by_search_id.
+
+        Returns
+        -------
+        PostArielSearchResponse | None
+            The completed search (record_count, query_execution_time, etc.), None if it is not completed
+            (request error, timeout or deadline).
         """
 
-        is_searching: bool = False
-        while not is_searching:
+        timeout = get_timeout(timeout=timeout)
+        started_at: float = monotonic()
+        while True:
+            if timeout is not None and monotonic() - started_at > timeout:
+                log_message(
+                    mode="warning",
+                    msg=f"search ⊱ {search_id} ⊰ is not completed in ⊱ {timeout:.1f} ⊰ seconds",
+                )
+                return None
+
             res: Response | None = self.http_client.request(
                 method="get", endpoint=f"/api/ariel/searches/{search_id}"
             )
             if not res:
-                return False
+                return None
 
             data: PostArielSearchResponse = res.json()
-            is_searching = data.get("completed", True)
 
             sleep(request_delay)
 
-        return is_searching
+            if data.get("completed", True):
+                return data
 
-    def get_search_results_by_search_id(
+    def get_search_by_search_id(
         self, search_id: str
+    ) -> PostArielSearchResponse | None:
+        """Get the search information (status, record count, etc.) by search_id.
+
+        For more details, see [GET /ariel/searches/{search_id}](https://ibmsecuritydocs.github.io/qradar_api_16.0/16.0--ariel-searches-search_id-GET.html)
+
+        Parameters
+        ----------
+        search_id : str
+            The search_id to get.
+
+        Returns
+        -------
+        PostArielSearchResponse | None
+            The search information if the search exists, None otherwise.
+        """
+
+        res: Response | None = self.http_client.request(
+            method="get", endpoint=f"/api/ariel/searches/{search_id}"
+        )
+        if not res:
+            return
+
+        data: PostArielSearchResponse = res.json()
+        return data
+
+    def get_search_results_by_search_id(
+        self, search_id: str, page_size: int | None = None, record_count: int = 0
     ) -> list[PostArielSearchResultItem]:
         """Get the searched results by search_id.
 
@@ -110,74 +230,182 @@ class QRadar:
         ----------
         search_id : str
             The search_id to get the results.
+        page_size : int | None, optional
+            Number of results per request with the Range header, all results at once if None. Default is None.
+        record_count : int, optional
+            Number of the search's results, the results are requested at once if it is not more than a page.
+            Default is 0.
 
         Returns
         -------
         list[PostArielSearchResultItem]
-            The searched results.
+            The searched results, empty if a request failed.
         """
 
+        if not page_size or record_count <= page_size:
+            return self._get_search_results_page(search_id=search_id)
+
+        if self._async_qradar:
+            # the pages are requested concurrently on the shared background event loop
+            return self._async_qradar.get_search_results_by_search_id(
+                search_id=search_id, page_size=page_size, record_count=record_count
+            )
+
+        events: list[PostArielSearchResultItem] = []
+        for first_item in range(0, record_count, page_size):
+            page: list[PostArielSearchResultItem] | None = self._get_search_results_page(
+                search_id=search_id,
+                first_item=first_item,
+                last_item=min(first_item + page_size, record_count) - 1,
+            )
+            if page is None:
+                return []
+            events.extend(page)
+        return events
+
+    def _get_search_results_page(
+        self,
+        search_id: str,
+        first_item: int | None = None,
+        last_item: int | None = None,
+    ) -> list[PostArielSearchResultItem] | None:
+        """Get a page of the searched results, all results if the item range is not given, None if the request failed."""
+
+        headers: dict[str, str] = (
+            {"Range": f"items={first_item}-{last_item}"} if first_item is not None else {}
+        )
         res: Response | None = self.http_client.request(
-            method="get", endpoint=f"api/ariel/searches/{search_id}/results"
+            method="get", endpoint=f"api/ariel/searches/{search_id}/results", headers=headers
         )
         if not res:
-            return []
+            return [] if first_item is None else None
 
         data: PostArielSearchResultsResponse = res.json()
         events: list[PostArielSearchResultItem] = data.get("events", [])
         return events
 
+    def delete_search_by_search_id(self, search_id: str) -> bool:
+        """Delete the search, stops the search if it is in progress and discards the collected results.
+
+        For more details, see [DELETE /ariel/searches/{search_id}](https://ibmsecuritydocs.github.io/qradar_api_16.0/16.0--ariel-searches-search_id-DELETE.html)
+
+        Parameters
+        ----------
+        search_id : str
+            The search_id to delete.
+
+        Returns
+        -------
+        bool
+            True if the search is deleted or not exists anymore, False otherwise.
+        """
+
+        res: Response | None = self.http_client.request(
+            method="delete", endpoint=f"/api/ariel/searches/{search_id}"
+        )
+        return res is not None and (res.ok or res.status_code == 404)
+
+    def capture_search_results(
+        self,
+        search_id: str,
+        aql_query: str,
+        events: list[PostArielSearchResultItem],
+    ) -> Path | None:
+        """Write the raw searched events with the AQL query and time window to a compressed NDJSON capture file.
+
+        Parameters
+        ----------
+        search_id : str
+            The search_id of the events.
+        aql_query : str
+            The AQL query of the search.
+        events : list[PostArielSearchResultItem]
+            The raw searched events.
+
+        Returns
+        -------
+        Path | None
+            Written capture file path, None if the capture is disabled or failed.
+        """
+
+        if not self.capture_folder:
+            return
+
+        time_clause: Match | None = AQL_TIME_CLAUSE_PATTERN.search(aql_query)
+        try:
+            capture_path: Path = write_capture(
+                capture_folder=self.capture_folder,
+                metadata={
+                    "qradar_url": self.url,
+                    "search_id": search_id,
+                    "aql_query": aql_query,
+                    "time_window": time_clause.group(1) if time_clause else None,
+                    "captured_at": datetime.now().isoformat(timespec="seconds"),
+                },
+                events=events,
+            )
+        except (OSError, ValueError) as e:
+            log_message(
+                mode="warning",
+                msg=f"searched events could not be captured ⊱ {e} ⊰",
+            )
+            return
+
+        log_message(
+            mode="info",
+            msg=f"⊱ {len(events)} ⊰ searched events captured to ⊱ {capture_path} ⊰",
+        )
+        return capture_path
+
     def parse_searched_events(
         self,
         searched_event: PostArielSearchResultItem,
-        windows_security_events: list[dict[str, Any]],
-    ) -> None:
+        rule_index: RuleIndex,
+        source: str | None = None,
+        event_spill: EventSpill | None = None,
+    ) -> bool:
         """Parse the searched event to match with the windows security events and update the events list.
 
         Parameters
         ----------
         searched_event : dict[str, dict[str, Any]]
             The searched event to parse.
-        windows_security_events : list[dict[str, Any]]
-            The windows security events list to match with the searched event.
+        rule_index : RuleIndex
+            Compiled rules of the windows security events list to match with the searched event, see build_rule_index.
+        source : str | None, optional
+            Name of the qradar target the searched event comes from, added to the matched event's sources
+            and usable as {source} in the event_text. Default is None.
+        event_spill : EventSpill | None, optional
+            Spill of the run the rule's events are moved to when they exceed the index's spill threshold,
+            the events are kept in memory if not given. Default is None.
+
+        Returns
+        -------
+        bool
+            True if the searched event matched with a windows security event, False otherwise.
         """
 
-        # get windows security event expected fields from the searched event
+        # get windows security event expected fields from the searched event, the users & groups are normalised
         event_id: str | None = searched_event.get("event_id")
-        src_user: str = self.is_field_value_empty(field=searched_event.get("src_user"))
-        dst_user: str = self.is_field_value_empty(field=searched_event.get("dst_user"))
-        group_name: str = self.is_field_value_empty(
-            field=searched_event.get("group_name")
+        src_user: str = self.field_normalizer.normalize_user(value=searched_event.get("src_user"))
+        dst_user: str = self.field_normalizer.normalize_user(value=searched_event.get("dst_user"))
+        group_name: str = self.field_normalizer.normalize_group(
+            value=searched_event.get("group_name")
         )
         event_log: str = self.is_field_value_empty(field=searched_event.get("log"))
 
         # does the searched event match with the windows security events list by the event_id
-        # and the src_user, dst_user, group_name fields are not in the excluded fields
-        matched_searched_event: dict[str, Any] = next(
-            (
-                wse
-                for wse in windows_security_events
-                if wse.get("event_id") == event_id
-                and src_user not in wse.get("excluded_src_users", [])
-                and dst_user not in wse.get("excluded_dst_users", [])
-                and group_name not in wse.get("excluded_groups", [])
-                and (
-                    not wse.get("included_src_users", [])
-                    or src_user in wse.get("included_src_users", [])
-                )
-                and (
-                    not wse.get("included_dst_users", [])
-                    or dst_user in wse.get("included_dst_users", [])
-                )
-                and (
-                    not wse.get("included_groups", [])
-                    or group_name in wse.get("included_groups", [])
-                )
-            ),
-            {},
+        # and the src_user, dst_user, group_name fields are not excluded (and are included if there is an included list)
+        fields: dict[str, str] = {
+            "src_user": src_user,
+            "dst_user": dst_user,
+            "group_name": group_name,
+        }
+        matched_searched_event: dict[str, Any] | None = rule_index.match(
+            event_id=event_id, fields=fields
         )
         if not matched_searched_event:
-            return
+            return False
 
         # update the event_text with the came fields from the searched event
         matched_searched_event_text: str = matched_searched_event["event_text"]
@@ -185,13 +413,251 @@ class QRadar:
 
         # if the matched_searched_event_text is not in the events list
         # add the matched_searched_event_text to the matched_searched_event events list
-        matched_searched_event_events: set[str] = set(
-            matched_searched_event.get("events", [])
+        is_over_budget: bool = rule_index.add_event(
+            wse=matched_searched_event, event_text=matched_searched_event_text
         )
-        matched_searched_event_events.add(matched_searched_event_text)
-        matched_searched_event["events"] = list(matched_searched_event_events)
-        # update the event_log with the searched event log
-        matched_searched_event["event_log"] = event_log
+        if is_over_budget and event_spill is not None:
+            self.spill_events(
+                rule_index=rule_index, event_spill=event_spill, wse=matched_searched_event
+            )
+        # keep a short sample of the searched event log, the raw log is stored by its digest with store_event_logs
+        if "log" not in searched_event:
+            # the lean search rows have no log, a representative row of the rule & fields is searched for it,
+            # the event is shown without a log sample if the log search fails or doesn't return the row
+            matched_searched_event.setdefault("event_log", EMPTY_FIELD_VALUE)
+            rule_index.add_representative(
+                wse=matched_searched_event, fields=fields, searched_event=searched_event
+            )
+        elif isinstance(event_log, str):
+            matched_searched_event["event_log"] = get_event_log_sample(event_log=event_log)
+            rule_index.add_event_log(wse=matched_searched_event, event_log=event_log)
+        else:
+            matched_searched_event["event_log"] = event_log
+        # attribute the matched event to the qradar target it comes from
+        if source and source not in matched_searched_event.setdefault("sources", []):
+            matched_searched_event["sources"].append(source)
+
+        return True
+
+    def build_rule_index(self, windows_security_events: list[dict[str, Any]]) -> RuleIndex:
+        """Compile the rules of the windows security events list with the target's reference sets.
+
+        The index also keeps the pending raw logs, representatives and spilled rules of its matches, so each run,
+        target and backfill chunk builds its own index and passes it to the parse, fetch, merge & store calls.
+
+        Parameters
+        ----------
+        windows_security_events : list[dict[str, Any]]
+            The windows security events list to match with the searched events.
+
+        Returns
+        -------
+        RuleIndex
+            Rules of the list indexed by the event id with their compiled include/exclude lists.
+        """
+
+        return RuleIndex(
+            windows_security_events=windows_security_events,
+            reference_sets=self.get_reference_sets(
+                names=get_reference_set_names(windows_security_events=windows_security_events)
+            ),
+            spill_threshold=EVENT_SPILL_THRESHOLD,
+            normalizer=self.field_normalizer,
+            max_event_logs=EVENT_LOG_CONFIG["max_digests"],
+        )
+
+    def get_reference_sets(self, names: set[str]) -> dict[str, frozenset[str] | None]:
+        """Get the values of the reference sets from the local cache, the expired ones are fetched from QRadar.
+
+        Parameters
+        ----------
+        names : set[str]
+            Names of the reference sets referenced by the rules.
+
+        Returns
+        -------
+        dict[str, frozenset[str] | None]
+            Values of the reference sets by name, None if a reference set is never fetched successfully.
+        """
+
+        if not names:
+            return {}
+
+        if self._reference_set_cache is None:
+            self._reference_set_cache = ReferenceSetCache(
+                http_client=self.http_client, qradar_url=self.url
+            )
+        return {
+            name: self._reference_set_cache.get_reference_set(name=name) for name in sorted(names)
+        }
+
+    def parse_representative_logs(
+        self,
+        rule_index: RuleIndex,
+        representatives: list[tuple[dict[str, Any], PostArielSearchResultItem]],
+        searched_events: list[PostArielSearchResultItem],
+    ) -> int:
+        """Set the logs of the representative rows of a lean search from the rows of their log search.
+
+        Parameters
+        ----------
+        rule_index : RuleIndex
+            Rule index the lean rows are matched with.
+        representatives : list[tuple[dict[str, Any], PostArielSearchResultItem]]
+            Matched windows security event & lean row of each representative.
+        searched_events : list[PostArielSearchResultItem]
+            Rows of the log search with the **log** column.
+
+        Returns
+        -------
+        int
+            Number of the representatives whose log is found.
+        """
+
+        event_logs: dict[tuple[Any, ...], Any] = {
+            get_row_key(searched_event=searched_event): searched_event.get("log")
+            for searched_event in searched_events
+        }
+
+        found_count: int = 0
+        for wse, representative in representatives:
+            event_log: Any = event_logs.get(get_row_key(searched_event=representative))
+            if not isinstance(event_log, str):
+                continue
+
+            wse["event_log"] = get_event_log_sample(event_log=event_log)
+            rule_index.add_event_log(wse=wse, event_log=event_log)
+            found_count += 1
+        return found_count
+
+    def store_event_logs(self, rule_index: RuleIndex) -> int:
+        """Store the raw logs of the matched rows in the event log store and add their digests to the matched events.
+
+        - **event_log_digests**: sha256 digests of the event's last EVENT_LOG_MAX_DIGESTS distinct raw logs,
+          in their matched order, the list doesn't grow with the matched rows
+        - **event_log_digest**: digest of the last matched log, the full log of the **event_log** sample
+
+        Parameters
+        ----------
+        rule_index : RuleIndex
+            Rule index the searched events are matched with.
+
+        Returns
+        -------
+        int
+            Number of the newly stored logs, the identical logs of the previous rows & runs are stored once.
+        """
+
+        matched_event_logs: list[tuple[dict[str, Any], list[str]]] = rule_index.pop_event_logs()
+        if not matched_event_logs:
+            return 0
+
+        if self._event_log_store is None:
+            self._event_log_store = EventLogStore()
+            self._event_log_store.prune()
+
+        event_logs: dict[str, str] = {}
+        for wse, wse_event_logs in matched_event_logs:
+            digests: list[str] = wse.setdefault("event_log_digests", [])
+            known_digests: set[str] = set(digests)
+            for event_log in wse_event_logs:
+                digest: str = get_event_log_digest(event_log=event_log)
+                event_logs[digest] = event_log
+                if digest not in known_digests:
+                    known_digests.add(digest)
+                    digests.append(digest)
+            wse["event_log_digest"] = digest
+            # the digests of the previous targets' logs are merged, only the last ones are carried
+            if 0 < EVENT_LOG_CONFIG["max_digests"] < len(digests):
+                del digests[: -EVENT_LOG_CONFIG["max_digests"]]
+
+        return self._event_log_store.put_many(event_logs=event_logs)
+
+    def spill_events(
+        self, rule_index: RuleIndex, event_spill: EventSpill, wse: dict[str, Any]
+    ) -> int:
+        """Move the rule's matched events in memory to the run's on-disk spill.
+
+        Parameters
+        ----------
+        rule_index : RuleIndex
+            Rule index of the rule's windows security events list.
+        event_spill : EventSpill
+            Spill of the run (or backfill chunk) the rule is matched in.
+        wse : dict[str, Any]
+            The rule whose events exceeded the spill threshold.
+
+        Returns
+        -------
+        int
+            Number of the newly spilled event texts.
+        """
+
+        if not event_spill.is_spilled(wse=wse):
+            log_message(
+                mode="warning",
+                msg=f"matched events of event id ⊱ {wse.get('event_id')} ⊰ exceeded ⊱ {rule_index.spill_threshold} ⊰, they are spilled to disk until they are enqueued",
+                sample_key="event_spill",
+            )
+
+        spilled_count: int = event_spill.spill(wse=wse, event_texts=rule_index.pop_events(wse=wse))
+        EVENT_SPILLS.labels(event_id=wse.get("event_id")).inc()
+        SPILLED_EVENTS.labels(event_id=wse.get("event_id")).inc(spilled_count)
+        return spilled_count
+
+    def spill_pending_events(self, rule_index: RuleIndex, event_spill: EventSpill) -> int:
+        """Spill the events matched since the last spill of the spilled rules, so all their events are in the spill.
+
+        The spill deduplicates the texts already spilled, the spilled rules are enqueued from the spill in pages.
+
+        Parameters
+        ----------
+        rule_index : RuleIndex
+            Rule index the searched events are matched with.
+        event_spill : EventSpill
+            Spill of the run (or backfill chunk) the rules are matched in.
+
+        Returns
+        -------
+        int
+            Number of the newly spilled event texts.
+        """
+
+        return sum(
+            event_spill.spill(wse=wse, event_texts=rule_index.pop_events(wse=wse))
+            for wse in rule_index.windows_security_events
+            if event_spill.is_spilled(wse=wse)
+        )
+
+    def merge_spilled_events(self, rule_index: RuleIndex, event_spill: EventSpill) -> int:
+        """Merge all spilled events of the list's rules back to their events lists, in their matched order.
+
+        Only for the runs that need the whole events lists in memory, e.g. the replays; the searches enqueue
+        the spilled rules in pages instead.
+
+        Parameters
+        ----------
+        rule_index : RuleIndex
+            Rule index the searched events are matched with.
+        event_spill : EventSpill
+            Spill of the run the rules are matched in.
+
+        Returns
+        -------
+        int
+            Number of the merged event texts of the spilled rules.
+        """
+
+        self.spill_pending_events(rule_index=rule_index, event_spill=event_spill)
+        merged_count: int = 0
+        for wse in rule_index.windows_security_events:
+            if not event_spill.is_spilled(wse=wse):
+                continue
+
+            events: list[str] = event_spill.merge(wse=wse)
+            rule_index.set_events(wse=wse, events=events)
+            merged_count += len(events)
+        return merged_count
 
     @staticmethod
     def is_field_value_empty(field: Any) -> str:
@@ -212,3 +678,33 @@ class QRadar:
         is_str = isinstance(field, str)
 
         return "( not exists )" if is_valid and not is_str else field
+
+    @staticmethod
+    def set_aql_query_time_range(aql_query: str, start: datetime, stop: datetime) -> str:
+        """Replace the time clause at the end of the AQL query (LAST or START/STOP) with the given time range.
+
+        Parameters
+        ----------
+        aql_query : str
+            The AQL query to search.
+        start : datetime
+            Start time of the search, in the QRadar console's time zone.
+        stop : datetime
+            Stop time of the search, in the QRadar console's time zone.
+
+        Returns
+        -------
+        str
+            The AQL query with the START/STOP time clause.
+
+        Examples
+        --------
+        >>> QRadar.set_aql_query_time_range(aql_query="select * from events limit 10 last 15 minutes", start=datetime(2025, 7, 1), stop=datetime(2025, 7, 1, 1))
+        ... "select * from events limit 10 start '2025-07-01 00:00:00' stop '2025-07-01 01:00:00'"
+        """
+
+        time_format: str = "%Y-%m-%d %H:%M:%S"
+        time_clause: str = (
+            f"start '{start.strftime(time_format)}' stop '{stop.strftime(time_format)}'"
+        )
+        return f"{AQL_TIME_CLAUSE_PATTERN.sub('', aql_query.rstrip())} {time_clause}"
@@ -0,0 +1,183 @@
+from hashlib import sha256
+from json import dumps as json_dumps, loads as json_loads
+from threading import Lock
+from time import time
+from urllib.parse import quote
+import sqlite3
+
+from src.utils.constants import REFERENCE_SET_TTL_SECONDS
+from src.utils.state import connect_state_db
+from ..http_client import HttpClient, Response, log_message
+from .types import ReferenceSetResponse
+
+
+class ReferenceSetCache:
+    """Local cache of the QRadar reference sets referenced by the rules (e.g. **ref:Service Accounts**)
+
+    The values of each reference set are kept in a SQLite database in the state folder and loaded as a set,
+    so the rules are matched without any remote lookup per searched row. A cached set is fetched again when its
+    TTL is expired, with its ETag (if QRadar sent one) so an unchanged set is not downloaded again. If the
+    fetch fails, the expired values are used until the next successful fetch.
+
+    Attributes
+    ----------
+    http_client : HttpClient
+        HTTP client of the QRadar console.
+    qradar_url : str
+        URL of the QRadar console, the reference sets of each console are cached separately.
+    ttl : int
+        Seconds to use a cached reference set without fetching it again.
+    connection : sqlite3.Connection
+        Connection to the reference sets database.
+
+    Methods
+    -------
+    - get_reference_set(name: str) -> frozenset[str] | None
+    - fetch_reference_set(name: str, etag: str | None = None) -> tuple[list[str] | None, str | None, bool]
+    """
+
+    def __init__(
+        self,
+        http_client: HttpClient,
+        qradar_url: str,
+        ttl: int = REFERENCE_SET_TTL_SECONDS,
+        file_name: str = "reference_sets.sqlite3",
+    ) -> None:
+        self.http_client: HttpClient = http_client
+        self.qradar_url: str = qradar_url
+        self.ttl: int = ttl
+        # loaded sets of this process by name, with the digest of their values
+        self._sets: dict[str, tuple[str, frozenset[str]]] = {}
+        self._lock: Lock = Lock()
+
+        self.connection: sqlite3.Connection = connect_state_db(file_name=file_name)
+        with self.connection:
+            self.connection.execute(
+                """
+                create table if not exists reference_sets (
+                    qradar_url text not null,
+                    name text not null,
+                    etag text,
+                    digest text not null,
+                    reference_values text not null,
+                    fetched_at real not null,
+                    primary key (qradar_url, name)
+                )
+                """
+            )
+
+    def get_reference_set(self, name: str) -> frozenset[str] | None:
+        """Get the values of the reference set from the cache, it is fetched if it is not cached or expired.
+
+        Parameters
+        ----------
+        name : str
+            Name of the reference set.
+
+        Returns
+        -------
+        frozenset[str] | None
+            Values of the reference set, None if it is never fetched successfully.
+        """
+
+        with self._lock:
+            row: sqlite3.Row | None = self.connection.execute(
+                "select etag, digest, reference_values, fetched_at from reference_sets where qradar_url = ? and name = ?",
+                (self.qradar_url, name),
+            ).fetchone()
+
+        if row and time() - row["fetched_at"] < self.ttl:
+            return self._load(name=name, digest=row["digest"], values_json=row["reference_values"])
+
+        values, etag, is_modified = self.fetch_reference_set(
+            name=name, etag=row["etag"] if row else None
+        )
+        if not is_modified:
+            # the etag matched, the cached values are valid for another ttl
+            with self._lock, self.connection:
+                self.connection.execute(
+                    "update reference_sets set fetched_at = ? where qradar_url = ? and name = ?",
+                    (time(), self.qradar_url, name),
+                )
+            return self._load(name=name, digest=row["digest"], values_json=row["reference_values"])
+
+        if values is None:
+            if not row:
+                log_message(
+                    mode="error",
+                    msg=f"reference set ⊱ {name} ⊰ could not be fetched and is not cached, it is matched as empty",
+                )
+                return None
+
+            log_message(
+                mode="warning",
+                msg=f"reference set ⊱ {name} ⊰ could not be fetched, the expired cache is used",
+            )
+            return self._load(name=name, digest=row["digest"], values_json=row["reference_values"])
+
+        values_json: str = json_dumps(sorted(values), separators=(",", ":"))
+        digest: str = sha256(values_json.encode("utf-8")).hexdigest()
+        with self._lock, self.connection:
+            self.connection.execute(
+                "insert or replace into reference_sets (qradar_url, name, etag, digest, reference_values, fetched_at) values (?, ?, ?, ?, ?, ?)",
+                (self.qradar_url, name, etag, digest, values_json, time()),
+            )
+        log_message(
+            mode="info",
+            msg=f"reference set ⊱ {name} ⊰ is cached with ⊱ {len(values)} ⊰ values",
+        )
+        return self._load(name=name, digest=digest, values_json=values_json)
+
+    def fetch_reference_set(
+        self, name: str, etag: str | None = None
+    ) -> tuple[list[str] | None, str | None, bool]:
+        """Fetch the values of the reference set from QRadar.
+
+        For more details, see [GET /reference_data/sets/{name}](https://ibmsecuritydocs.github.io/qradar_api_16.0/16.0--reference_data-sets-name-GET.html)
+
+        Parameters
+        ----------
+        name : str
+            Name of the reference set.
+        etag : str | None, optional
+            ETag of the cached values, sent as If-None-Match. Default is None.
+
+        Returns
+        -------
+        tuple[list[str] | None, str | None, bool]
+            Values (None on error or if not modified), the response's ETag and False if the set is not modified.
+        """
+
+        headers: dict[str, str] = {"If-None-Match": etag} if etag else {}
+        res: Response | None = self.http_client.request(
+            method="get",
+            endpoint=f"/api/reference_data/sets/{quote(name, safe='')}",
+            params={"fields": "name,number_of_elements,data(value)"},
+            headers=headers,
+        )
+        if res is not None and res.status_code == 304:
+            return None, etag, False
+
+        if not res:
+            log_message(
+                mode="error",
+                msg=f"reference set ⊱ {name} ⊰ could not be fetched ⊱ {res.status_code if res is not None else 'no response'} ⊰",
+            )
+            return None, None, True
+
+        data: ReferenceSetResponse = res.json()
+        values: list[str] = [
+            str(element["value"]) for element in data.get("data") or [] if "value" in element
+        ]
+        return values, res.headers.get("ETag"), True
+
+    def _load(self, name: str, digest: str, values_json: str) -> frozenset[str]:
+        """Load the cached values as a set, the loaded set is reused until its digest changes."""
+
+        loaded: tuple[str, frozenset[str]] | None = self._sets.get(name)
+        if loaded and loaded[0] == digest:
+            return loaded[1]
+
+        values: frozenset[str] = frozenset(json_loads(values_json))
+        self._sets[name] = (digest, values)
+        return values
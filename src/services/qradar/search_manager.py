@@ -0,0 +1,345 @@
+from hashlib import sha256
+from os import getpid, kill as os_kill
+from socket import gethostname
+from threading import Lock
+from time import monotonic, time
+from urllib.parse import urlparse
+import sqlite3
+
+from src.utils.metrics import (
+    QRADAR_SEARCH_FETCH_SECONDS,
+    QRADAR_SEARCH_POLL_SECONDS,
+    QRADAR_SEARCH_ROWS,
+)
+from src.utils.search_stats import SearchStats
+from src.utils.state import connect_state_db
+from src.utils.tracing import trace_span
+from .aql import get_aql_query_window_minutes, has_absolute_time_range
+from .qradar import QRadar, log_message
+from .types import PostArielSearchResponse, PostArielSearchResultItem
+
+
+class SearchManager:
+    """Ariel search lifecycle manager to avoid leaving searches on the QRadar console.
+
+    Created searches are tracked in a SQLite database in the state folder. They are deleted when they are
+    completed, timed out or the manager is closed, unless they can be reused for the identical AQL query
+    within the reuse TTL. Only the queries with an absolute **start/stop** time range are reused, a relative
+    **last N minutes** query searches another window each time. Searches left by crashed runs are deleted
+    on the next manager's start, a run creates one manager per target for all its searches.
+
+    Attributes
+    ----------
+    qradar : QRadar
+        QRadar instance to create, poll and delete the searches.
+    reuse_ttl : int
+        Seconds to keep a completed search for reuse with the identical AQL query (with a start/stop time range),
+        0 disables the reuse.
+    max_search_age : int
+        Seconds after which a search of another process is treated as abandoned.
+    connection : sqlite3.Connection
+        Connection to the searches database.
+
+    Methods
+    -------
+    - run_search(aql_query: str, request_delay: float | int = 1, timeout: float | int | None = None, page_size: int | None = None, search_stats: SearchStats | None = None) -> list[PostArielSearchResultItem] | None
+    - create_search(aql_query: str) -> tuple[str | None, bool]
+    - release_search(search_id: str, is_reusable: bool = True) -> None
+    - cleanup_searches() -> None
+    - close() -> None
+    """
+
+    def __init__(
+        self,
+        qradar: QRadar,
+        reuse_ttl: int = 0,
+        max_search_age: int = 6 * 3600,
+        file_name: str = "ariel_searches.sqlite3",
+    ) -> None:
+        self.qradar: QRadar = qradar
+        self.reuse_ttl: int = reuse_ttl
+        self.max_search_age: int = max_search_age
+
+        self._owner: str = f"{gethostname()}:{getpid()}"
+        self._qradar_host: str = urlparse(qradar.url).hostname or qradar.url
+        self._lock: Lock = Lock()
+        self.connection: sqlite3.Connection = connect_state_db(file_name=file_name)
+        with self.connection:
+            self.connection.execute(
+                """
+                create table if not exists searches (
+                    search_id text primary key,
+                    qradar_url text not null,
+                    query_hash text not null,
+                    owner text not null,
+                    status text not null default 'running',
+                    created_at real not null,
+                    completed_at real
+                )
+                """
+            )
+
+        self.cleanup_searches()
+
+    def __enter__(self) -> "SearchManager":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def run_search(
+        self,
+        aql_query: str,
+        request_delay: float | int = 1,
+        timeout: float | int | None = None,
+        page_size: int | None = None,
+        search_stats: SearchStats | None = None,
+    ) -> list[PostArielSearchResultItem] | None:
+        """Create (or reuse) a search for the AQL query, wait for its completion and get its results.
+
+        Parameters
+        ----------
+        aql_query : str
+            The AQL query to search.
+        request_delay : float | int, optional
+            Delay in seconds between each status request. Default is 1.
+        timeout : float | int | None, optional
+            Maximum seconds to wait for the search, the search is deleted on timeout. Default is None.
+        page_size : int | None, optional
+            Number of results per request, all results at once if None. Default is None.
+        search_stats : SearchStats | None, optional
+            Stats to record the created search's record_count, query_execution_time & fetch time. Default is None.
+
+        Returns
+        -------
+        list[PostArielSearchResultItem] | None
+            The searched results if the search is completed, None otherwise.
+        """
+
+        with trace_span("search_create", qradar_url=self.qradar.url) as span:
+            search_id, is_reused = self.create_search(aql_query=aql_query)
+            span["reused"] = is_reused
+        if not search_id:
+            log_message(mode="error", msg="search id not found")
+            return
+
+        try:
+            # a reused search is fetched at once, it is not polled for its record count
+            completed_search: PostArielSearchResponse | None = {}
+            if not is_reused:
+                # check if the search is completed to get the results
+                with (
+                    trace_span("search_poll", search_id=search_id) as span,
+                    QRADAR_SEARCH_POLL_SECONDS.labels(qradar=self._qradar_host).time(),
+                ):
+                    completed_search = self.qradar.wait_for_search_by_search_id(
+                        search_id=search_id,
+                        request_delay=request_delay,
+                        timeout=timeout,
+                    )
+                    span["completed"] = completed_search is not None
+                if completed_search is None:
+                    return
+
+                self._update_status(search_id=search_id, status="completed")
+
+            with (
+                trace_span("search_fetch", search_id=search_id) as span,
+                QRADAR_SEARCH_FETCH_SECONDS.labels(qradar=self._qradar_host).time(),
+            ):
+                fetch_started_at: float = monotonic()
+                searched_events: list[PostArielSearchResultItem] = (
+                    self.qradar.get_search_results_by_search_id(
+                        search_id=search_id,
+                        page_size=page_size,
+                        record_count=int(completed_search.get("record_count") or 0),
+                    )
+                )
+                fetch_seconds: float = monotonic() - fetch_started_at
+                span["rows"] = len(searched_events)
+            QRADAR_SEARCH_ROWS.labels(qradar=self._qradar_host).inc(len(searched_events))
+            self.qradar.capture_search_results(
+                search_id=search_id, aql_query=aql_query, events=searched_events
+            )
+
+            window_minutes: float | None = get_aql_query_window_minutes(aql_query=aql_query)
+            if search_stats is not None and completed_search and window_minutes:
+                search_stats.record(
+                    qradar_url=self.qradar.url,
+                    window_minutes=window_minutes,
+                    record_count=int(completed_search.get("record_count") or len(searched_events)),
+                    query_execution_ms=int(completed_search.get("query_execution_time") or 0),
+                    fetch_seconds=fetch_seconds,
+                )
+            return searched_events
+        finally:
+            self.release_search(
+                search_id=search_id, is_reusable=has_absolute_time_range(aql_query=aql_query)
+            )
+
+    def create_search(self, aql_query: str) -> tuple[str | None, bool]:
+        """Reuse a still valid completed search for the identical AQL query or create a new one.
+
+        Only a query with a start/stop time range is reused, the results of a **last N minutes** query
+        depend on when it is searched.
+
+        Parameters
+        ----------
+        aql_query : str
+            The AQL query to search.
+
+        Returns
+        -------
+        tuple[str | None, bool]
+            The search_id (None if the search could not be created) and whether the search is reused.
+        """
+
+        query_hash: str = sha256(aql_query.encode("utf-8")).hexdigest()
+
+        reusable_search_id: str | None = None
+        if has_absolute_time_range(aql_query=aql_query):
+            reusable_search_id = self._get_reusable_search_id(query_hash=query_hash)
+        if reusable_search_id:
+            log_message(
+                mode="info",
+                msg=f"completed search ⊱ {reusable_search_id} ⊰ is reused for the identical query",
+            )
+            return reusable_search_id, True
+
+        search_id: str | None = self.qradar.post_create_search_by_aql_query(
+            aql_query=aql_query
+        )
+        if not search_id:
+            return None, False
+
+        with self._lock, self.connection:
+            self.connection.execute(
+                "insert or replace into searches (search_id, qradar_url, query_hash, owner, created_at) values (?, ?, ?, ?, ?)",
+                (search_id, self.qradar.url, query_hash, self._owner, time()),
+            )
+        return search_id, False
+
+    def release_search(self, search_id: str, is_reusable: bool = True) -> None:
+        """Release the search after its results are used or it is failed.
+
+        Completed reusable searches are kept for the reuse TTL, the others are deleted immediately.
+
+        Parameters
+        ----------
+        search_id : str
+            The search_id to release.
+        is_reusable : bool, optional
+            Whether the search's query can be reused, e.g. it has a start/stop time range. Default is True.
+        """
+
+        with self._lock:
+            row: sqlite3.Row | None = self.connection.execute(
+                "select status from searches where search_id = ?", (search_id,)
+            ).fetchone()
+
+        if row and row["status"] == "completed" and self.reuse_ttl > 0 and is_reusable:
+            return
+
+        self._delete_search(search_id=search_id)
+
+    def cleanup_searches(self) -> None:
+        """Delete the expired completed searches and the searches abandoned by crashed runs."""
+
+        now: float = time()
+        with self._lock:
+            rows: list[sqlite3.Row] = self.connection.execute(
+                "select search_id, owner, status, created_at, completed_at from searches where qradar_url = ?",
+                (self.qradar.url,),
+            ).fetchall()
+
+        for row in rows:
+            is_expired: bool = (
+                row["status"] == "completed"
+                and now - row["completed_at"] > self.reuse_ttl
+            )
+            is_abandoned: bool = row["status"] == "running" and (
+                now - row["created_at"] > self.max_search_age
+                or not self._is_owner_alive(owner=row["owner"])
+            )
+            if is_expired or is_abandoned:
+                self._delete_search(search_id=row["search_id"])
+
+    def close(self) -> None:
+        """Delete the searches of this manager which are still running (timeout, error or shutdown)."""
+
+        with self._lock:
+            rows: list[sqlite3.Row] = self.connection.execute(
+                "select search_id from searches where owner = ? and status = 'running'",
+                (self._owner,),
+            ).fetchall()
+
+        for row in rows:
+            self._delete_search(search_id=row["search_id"])
+
+        self.connection.close()
+
+    def _get_reusable_search_id(self, query_hash: str) -> str | None:
+        """Get the completed search_id of the identical query if it is in the reuse TTL and still exists."""
+
+        if self.reuse_ttl <= 0:
+            return
+
+        with self._lock:
+            row: sqlite3.Row | None = self.connection.execute(
+                "select search_id from searches where qradar_url = ? and query_hash = ? and status = 'completed' and completed_at >= ? order by completed_at desc",
+                (self.qradar.url, query_hash, time() - self.reuse_ttl),
+            ).fetchone()
+        if not row:
+            return
+
+        # the console may have already removed the search results
+        search: PostArielSearchResponse | None = self.qradar.get_search_by_search_id(
+            search_id=row["search_id"]
+        )
+        if not search or search.get("status") != "COMPLETED":
+            self._delete_search(search_id=row["search_id"])
+            return
+
+        return row["search_id"]
+
+    def _update_status(self, search_id: str, status: str) -> None:
+        """Update the tracked status of the search."""
+
+        with self._lock, self.connection:
+            self.connection.execute(
+                "update searches set status = ?, completed_at = ? where search_id = ?",
+                (status, time(), search_id),
+            )
+
+    def _delete_search(self, search_id: str) -> None:
+        """Delete the search from the console and stop tracking it if the deletion succeeded."""
+
+        if not self.qradar.delete_search_by_search_id(search_id=search_id):
+            log_message(
+                mode="warning",
+                msg=f"search ⊱ {search_id} ⊰ could not be deleted, will be retried on the next run",
+            )
+            return
+
+        with self._lock, self.connection:
+            self.connection.execute(
+                "delete from searches where search_id = ?", (search_id,)
+            )
+
+    def _is_owner_alive(self, owner: str) -> bool:
+        """Check if the owner process of a search is still running, owners on other hosts are assumed alive."""
+
+        if owner == self._owner:
+            return True
+
+        host, pid = owner.rsplit(":", 1)
+        if host != gethostname():
+            return True
+
+        try:
+            os_kill(int(pid), 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
@@ -100,3 +100,49 @@ class PostArielSearchResultsResponse(TypedDict, total=False):
     """
 
     events: list[PostArielSearchResultItem]
+
+
+class ReferenceSetElement(TypedDict, total=False):
+    """QRadar reference set element type.
+
+    Attributes
+    ----------
+    value: str
+
+    source: str
+
+    first_seen: int
+
+    last_seen: int
+    """
+
+    value: str
+    source: str
+    first_seen: int
+    last_seen: int
+
+
+class ReferenceSetResponse(TypedDict, total=False):
+    """QRadar get reference set response type.
+
+    Attributes
+    ----------
+    name: str
+
+    element_type: str
+
+    number_of_elements: int
+
+    creation_time: int
+
+    timeout_type: str
+
+    data: list[ReferenceSetElement]
+    """
+
+    name: str
+    element_type: str
+    number_of_elements: int
+    creation_time: int
+    timeout_type: str
+    data: list[ReferenceSetElement]
@@ -0,0 +1,269 @@
+from atexit import register as atexit_register
+from asyncio import gather
+from threading import Lock
+from typing import Any
+
+from ..async_http_client import AsyncHttpClient, AsyncResponse, SyncFacade, log_message
+
+
+class AsyncRedmine:
+    """Asyncio Redmine REST client for the issue and enumeration calls of the wse upserts.
+
+    Unlike the redminelib based Redmine class, resources are returned as plain dictionaries of the REST API.
+    For more details, see [Redmine REST API](https://www.redmine.org/projects/redmine/wiki/Rest_api)
+
+    Attributes
+    ----------
+    url : str
+        Redmine URL.
+    http_client : AsyncHttpClient
+        Async HTTP client to make requests with the API key.
+
+    Methods
+    -------
+    - auth() -> dict[str, Any] | None
+    - filter_issues(page_size: int = 100, **filters) -> list[dict[str, Any]]
+    - get_issue(issue_id: int, include: list[str] | None = None) -> dict[str, Any] | None
+    - get_issues(issue_ids: list[int], include: list[str] | None = None) -> list[dict[str, Any] | None]
+    - create_issue(**issue_fields) -> dict[str, Any] | None
+    - update_issue(issue_id: int, **issue_fields) -> bool
+    - get_enumerations(resource: str) -> list[dict[str, Any]]
+    - close() -> None
+    """
+
+    def __init__(self, url: str, key: str, max_connections: int = 10) -> None:
+        self.url: str = url
+        # the endpoints are relative, so the redmine served under a sub-path keeps its path
+        self.http_client: AsyncHttpClient = AsyncHttpClient(
+            url=f"{url.rstrip('/')}/",
+            max_connections=max_connections,
+            headers={"X-Redmine-API-Key": key},
+        )
+
+    async def auth(self) -> dict[str, Any] | None:
+        """Get the current user to check if the API key is valid.
+
+        Returns
+        -------
+        dict[str, Any] | None
+            Current redmine user if the authentication succeeded, None otherwise.
+        """
+
+        res: AsyncResponse | None = await self.http_client.request(
+            method="get", endpoint="users/current.json"
+        )
+        if not res:
+            return
+
+        return res.json().get("user")
+
+    async def filter_issues(self, page_size: int = 100, **filters) -> list[dict[str, Any]]:
+        """Filter the issues with the given filters, the pages after the first one are requested concurrently.
+
+        Parameters
+        ----------
+        page_size : int, optional
+            Number of issues per request, Redmine allows at most 100. Default is 100.
+        **filters
+            Issue filters (project_id, tracker_id, status_id, subject, created_on, etc.)
+
+        Returns
+        -------
+        list[dict[str, Any]]
+            Filtered issues.
+        """
+
+        first_page: dict[str, Any] | None = await self._get_issues_page(
+            offset=0, limit=page_size, filters=filters
+        )
+        if not first_page:
+            return []
+
+        total_count: int = first_page.get("total_count", 0)
+        next_pages: list[dict[str, Any] | None] = await gather(
+            *[
+                self._get_issues_page(offset=offset, limit=page_size, filters=filters)
+                for offset in range(page_size, total_count, page_size)
+            ]
+        )
+        return [
+            issue
+            for page in [first_page, *next_pages]
+            if page
+            for issue in page.get("issues", [])
+        ]
+
+    async def get_issue(
+        self, issue_id: int, include: list[str] | None = None
+    ) -> dict[str, Any] | None:
+        """Get the issue by its id.
+
+        Parameters
+        ----------
+        issue_id : int
+            Issue id to get.
+        include : list[str] | None, optional
+            Associated data to include (journals, attachments, etc.). Default is None.
+
+        Returns
+        -------
+        dict[str, Any] | None
+            The issue if it exists, None otherwise.
+        """
+
+        res: AsyncResponse | None = await self.http_client.request(
+            method="get",
+            endpoint=f"issues/{issue_id}.json",
+            params={"include": ",".join(include)} if include else None,
+        )
+        if not res:
+            return
+
+        return res.json().get("issue")
+
+    async def get_issues(
+        self, issue_ids: list[int], include: list[str] | None = None
+    ) -> list[dict[str, Any] | None]:
+        """Get the issues by their ids concurrently, e.g. with the journals which the issue filter doesn't return.
+
+        Parameters
+        ----------
+        issue_ids : list[int]
+            Issue ids to get.
+        include : list[str] | None, optional
+            Associated data to include (journals, attachments, etc.). Default is None.
+
+        Returns
+        -------
+        list[dict[str, Any] | None]
+            The issues in the order of their ids, None for the issues which could not be fetched.
+        """
+
+        return await gather(
+            *[self.get_issue(issue_id=issue_id, include=include) for issue_id in issue_ids]
+        )
+
+    async def create_issue(self, **issue_fields) -> dict[str, Any] | None:
+        """Create an issue with the given fields.
+
+        Parameters
+        ----------
+        **issue_fields
+            Issue fields (project_id, subject, tracker_id, description, priority_id, custom_fields, etc.)
+
+        Returns
+        -------
+        dict[str, Any] | None
+            The created issue, None if the issue could not be created.
+        """
+
+        res: AsyncResponse | None = await self.http_client.request(
+            method="post", endpoint="issues.json", json={"issue": issue_fields}
+        )
+        if not res:
+            log_message(
+                mode="error",
+                msg=f"issue could not be created ⊱ {res.status_code if res is not None else None} ⊰",
+            )
+            return
+
+        return res.json().get("issue")
+
+    async def update_issue(self, issue_id: int, **issue_fields) -> bool:
+        """Update the issue with the given fields.
+
+        Parameters
+        ----------
+        issue_id : int
+            Issue id to update.
+        **issue_fields
+            Issue fields to update (status_id, priority_id, notes, etc.)
+
+        Returns
+        -------
+        bool
+            True if the issue is updated, False otherwise.
+        """
+
+        res: AsyncResponse | None = await self.http_client.request(
+            method="put", endpoint=f"issues/{issue_id}.json", json={"issue": issue_fields}
+        )
+        if not res:
+            log_message(
+                mode="error",
+                msg=f"issue ⊱ {issue_id} ⊰ could not be updated ⊱ {res.status_code if res is not None else None} ⊰",
+            )
+            return False
+
+        return True
+
+    async def get_enumerations(self, resource: str) -> list[dict[str, Any]]:
+        """Get the enumerations of the given resource.
+
+        Parameters
+        ----------
+        resource : str
+            Enumeration resource (issue_priorities, time_entry_activities, document_categories).
+
+        Returns
+        -------
+        list[dict[str, Any]]
+            Enumerations of the resource.
+        """
+
+        res: AsyncResponse | None = await self.http_client.request(
+            method="get", endpoint=f"enumerations/{resource}.json"
+        )
+        if not res:
+            return []
+
+        return res.json().get(resource, [])
+
+    async def close(self) -> None:
+        """Close the HTTP session."""
+
+        await self.http_client.close()
+
+    async def _get_issues_page(
+        self, offset: int, limit: int, filters: dict[str, Any]
+    ) -> dict[str, Any] | None:
+        """Get a page of the filtered issues with the total_count."""
+
+        res: AsyncResponse | None = await self.http_client.request(
+            method="get",
+            endpoint="issues.json",
+            params={**filters, "offset": offset, "limit": limit},
+        )
+        if not res:
+            return
+
+        return res.json()
+
+
+_async_redmines: dict[tuple[str, str], SyncFacade] = {}
+_async_redmines_lock: Lock = Lock()
+
+
+def get_async_redmine(url: str, key: str) -> SyncFacade:
+    """Get the sync facade of the server's async client, the redmine instances of the same server & key share it,
+    so its session (and connections) is kept on the background event loop between the runs.
+
+    Parameters
+    ----------
+    url : str
+        Redmine URL.
+    key : str
+        API key of the redmine user.
+
+    Returns
+    -------
+    SyncFacade
+        AsyncRedmine of the server whose coroutine methods are called synchronously.
+    """
+
+    with _async_redmines_lock:
+        if (url, key) not in _async_redmines:
+            _async_redmines[(url, key)] = SyncFacade(AsyncRedmine(url=url, key=key))
+            # the shared session is kept open between the runs, it is closed at exit
+            atexit_register(_async_redmines[(url, key)].close)
+        return _async_redmines[(url, key)]
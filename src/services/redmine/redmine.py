@@ -1,6 +1,9 @@
 from datetime import datetime
+from io import BytesIO
 from os import path as os_path
 from html import escape as html_escape
+from typing import Callable
+from urllib.parse import urlencode, urlparse
 
 from jinja2 import (
     Environment,
@@ -12,21 +15,80 @@ from jinja2 import (
 import redminelib
 from redminelib.resources import Issue, User
 from redminelib.exceptions import BaseRedmineError
+from requests import RequestException
 
+from src.utils.circuit_breaker import CircuitBreaker, get_circuit_breaker
+from src.utils.event_log_store import EventLogStore
+from src.utils.rate_controller import AdaptiveConcurrencyLimiter, get_rate_controller
+from src.utils.metrics import HTTP_POOL_COLLECTOR, UPSERTS, observe_redmine_response
+from src.utils.tracing import count_traced_response, trace_span
 from src.utils.constants import (
+    EVENT_LOG_CONFIG,
     REDMINE_PROJECT,
     REDMINE_ISSUE_DESC_TEMPLATE_MODE,
     REDMINE_WINDOWS_SECURITY_EVENT_TRACKER_ID,
 )
+from ..async_http_client import SyncFacade
+from ..http_client import CircuitOpenError, DeadlineExceededError, mount_guarded_adapters
 from ..msteams.teams import MsTeams, log_message
+from ..qradar.normalizer import EMPTY_FIELD_VALUE
+from .async_redmine import get_async_redmine
 
 
 class Redmine(redminelib.Redmine):
     CUSTOM_DEFAULT_PRIORITY: dict[str, str | int] = {"id": 2, "name": "Medium"}
     CUSTOM_DEFAULT_STATUS: dict[str, str | int] = {"id": 1, "name": "New"}
 
-    def __init__(self, url: str, **redmine_kwargs) -> None:
+    def __init__(self, url: str, async_prefetch: bool = False, **redmine_kwargs) -> None:
         super().__init__(url=url, **redmine_kwargs)
+        # fetches the prefetched issues' journals concurrently, raises ValueError if aiohttp is not installed
+        self._async_redmine: SyncFacade | None = (
+            get_async_redmine(url=url, key=redmine_kwargs.get("key"))
+            if async_prefetch
+            else None
+        )
+        # count the redmine requests & response bytes in the traced run's spans and observe their latency
+        self.engine.session.hooks["response"].extend(
+            [count_traced_response, observe_redmine_response]
+        )
+        HTTP_POOL_COLLECTOR.register(session=self.engine.session)
+        # limit the request timeouts with the run's deadline and fail fast while redmine is degraded
+        self.circuit_breaker_name: str = f"redmine:{urlparse(url).netloc}"
+        mount_guarded_adapters(session=self.engine.session, name=self.circuit_breaker_name)
+        # limit the concurrent upserts with the latency & throttling of the redmine responses
+        self.rate_controller: AdaptiveConcurrencyLimiter = get_rate_controller(
+            name=self.circuit_breaker_name
+        )
+        self.engine.session.hooks["response"].append(self.rate_controller.observe_response)
+
+        # filled by warm_up to avoid the same lookups on each upsert
+        self.issue_priorities: list[dict] | None = None
+        self.prefetched_wse_issues: dict[str, list[Issue]] | None = None
+        # opened on the first event log attachment, only if REDMINE_EVENT_LOG_ATTACHMENT is enabled
+        self._event_log_store: EventLogStore | None = None
+
+    @property
+    def circuit_breaker(self) -> CircuitBreaker:
+        """Circuit breaker of the redmine requests, shared by the redmine instances of the same server."""
+
+        return get_circuit_breaker(name=self.circuit_breaker_name)
+
+    def auth(self) -> User | None:
+        """Check if the redmine user is logged in with the given credentials.
+
+        Returns
+        -------
+        User | None
+            Current redmine user if the credentials are valid and redmine is reachable, None otherwise.
+        """
+
+        try:
+            return super().auth()
+        except (BaseRedmineError, RequestException) as e:
+            log_message(
+                mode="error",
+                msg=f"redmine error occured ⊱ {e} ⊰ while authenticating",
+            )
 
     def is_wse_issue_exists(self, issue_subject: str) -> list[Issue]:
         """Check with the given **issue_subject** if there is any issue exists in the **Windows Security Events** category which is tracker id **6**.
@@ -42,6 +104,13 @@ class Redmine(redminelib.Redmine):
             Today list of **Windows Security Events** issues with notes if exists else empty list.
         """
 
+        # prefetched issues are used once, the issue may be created or updated after the lookup
+        if (
+            self.prefetched_wse_issues is not None
+            and issue_subject in self.prefetched_wse_issues
+        ):
+            return self.prefetched_wse_issues.pop(issue_subject)
+
         return list(
             self.issue.filter(
                 project_id=REDMINE_PROJECT.id,
@@ -62,6 +131,9 @@ class Redmine(redminelib.Redmine):
         event_desc: str,
         events: list[str],
         event_log: str,
+        sources: list[str] | None = None,
+        event_log_digests: list[str] | None = None,
+        event_log_digest: str | None = None,
     ) -> Issue:
         """Create an issue in the **Windows Security Events** category which is tracker id **6**.
 
@@ -79,6 +151,13 @@ class Redmine(redminelib.Redmine):
         events : list[str]
             List of Windows Security Events to add to the issue's description.
         event_log : str
+            Sample of the last matched raw log.
+        sources : list[str] | None, optional
+            QRadar targets the events come from, by default None.
+        event_log_digests : list[str] | None, optional
+            Digests of the raw logs in the event log store, attached to the issue if enabled. By default None.
+        event_log_digest : str | None, optional
+            Digest of the **event_log** sample's raw log, by default None.
 
         Returns
         -------
@@ -86,8 +165,10 @@ class Redmine(redminelib.Redmine):
             Created issue.
         """
 
-        # get last issue id to pass to the issue template
-        last_issue_id: int = self.get_last_issue_id()
+        # attach the raw logs as one compressed file instead of embedding them in the description
+        uploads: list[dict] = self.get_event_log_uploads(
+            event_id=event_id, event_log_digests=event_log_digests or []
+        )
 
         # format issue description via the issue template
         description: str | None = self.load_issue_template(
@@ -98,7 +179,13 @@ class Redmine(redminelib.Redmine):
             event_desc=event_desc,
             events=events,
             event_log=event_log,
-            issue_id=last_issue_id + 1,
+            issue_id=None,
+            sources=sources,
+            event_log_reference=self.get_event_log_reference(
+                event_log_digests=event_log_digests or [],
+                event_log_digest=event_log_digest,
+                uploads=uploads,
+            ),
         )
 
         return self.issue.create(
@@ -115,6 +202,7 @@ class Redmine(redminelib.Redmine):
                     "value": f"Windows\t{event_id}" if event_id.isdigit() else event_id,
                 }
             ],
+            **({"uploads": uploads} if uploads else {}),
         )
 
     def update_wse_issue(
@@ -127,6 +215,9 @@ class Redmine(redminelib.Redmine):
         new_events: list[str],
         event_log: str,
         to_update_issue_id: int,
+        sources: list[str] | None = None,
+        event_log_digests: list[str] | None = None,
+        event_log_digest: str | None = None,
     ) -> None:
         """Update the issue in the **Windows Security Events** category which is tracker id **6**.
 
@@ -145,9 +236,21 @@ class Redmine(redminelib.Redmine):
         new_events : list[str]
             List of Windows Security Events to add to the issue's journal
         event_log : str
+            Sample of the last matched raw log.
         to_update_issue_id : int
+        sources : list[str] | None, optional
+            QRadar targets the events come from, by default None.
+        event_log_digests : list[str] | None, optional
+            Digests of the raw logs in the event log store, attached to the issue if enabled. By default None.
+        event_log_digest : str | None, optional
+            Digest of the **event_log** sample's raw log, by default None.
         """
 
+        # attach the raw logs as one compressed file instead of embedding them in the journal note
+        uploads: list[dict] = self.get_event_log_uploads(
+            event_id=event_id, event_log_digests=event_log_digests or []
+        )
+
         # format issue description via the issue template
         description: str | None = self.load_issue_template(
             subject=subject,
@@ -158,6 +261,12 @@ class Redmine(redminelib.Redmine):
             events=new_events,
             event_log=event_log,
             issue_id=to_update_issue_id,
+            sources=sources,
+            event_log_reference=self.get_event_log_reference(
+                event_log_digests=event_log_digests or [],
+                event_log_digest=event_log_digest,
+                uploads=uploads,
+            ),
         )
 
         self.issue.update(
@@ -165,26 +274,154 @@ class Redmine(redminelib.Redmine):
             status_id=1,
             priority_id=priority_id,
             notes=description,
+            **({"uploads": uploads} if uploads else {}),
         )
 
-    def get_last_issue_id(self) -> int:
-        """Get the last issue id to use in the issue template.
+    def get_event_log_uploads(self, event_id: str, event_log_digests: list[str]) -> list[dict]:
+        """Build the compressed attachment of the raw logs, if REDMINE_EVENT_LOG_ATTACHMENT is enabled.
+
+        All the raw logs of an upsert are uploaded as one gzip file, a log per line with its digest.
+
+        Parameters
+        ----------
+        event_id : str
+            Windows Security Event ID.
+        event_log_digests : list[str]
+            Digests of the raw logs in the event log store.
+
+        Returns
+        -------
+        list[dict]
+            Uploads of the issue create/update, empty if disabled or none of the logs is in the store.
+        """
+
+        if not EVENT_LOG_CONFIG["attach_to_issues"] or not event_log_digests:
+            return []
+
+        if self._event_log_store is None:
+            self._event_log_store = EventLogStore()
+
+        archive: bytes | None = self._event_log_store.build_archive(digests=event_log_digests)
+        if archive is None:
+            log_message(
+                mode="warning",
+                msg=f"raw logs of event id ⊱ {event_id} ⊰ are not in the event log store, they are not attached",
+            )
+            return []
+
+        return [
+            {
+                "path": BytesIO(archive),
+                "filename": f"event_logs_{event_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log.gz",
+                "content_type": "application/gzip",
+                "description": f"{len(event_log_digests)} raw logs of event id {event_id}",
+            }
+        ]
+
+    def warm_up(
+        self, issue_subjects: list[str], should_stop: Callable[[], bool] | None = None
+    ) -> User | None:
+        """Authenticate and prefetch the lookups of the upsert phase, so it can run while qradar is searching.
+
+        Parameters
+        ----------
+        issue_subjects : list[str]
+            Issue subjects of the windows security events that may be upserted.
+        should_stop : Callable[[], bool] | None, optional
+            Checked between the prefetch requests, the warm up stops without a prefetch when it returns True,
+            e.g. when the run has nothing to deliver. Default is None.
 
         Returns
         -------
-        int
-            Last issue id if exists else 0
+        User | None
+            Current redmine user if the authentication succeeded, None otherwise.
+        """
+
+        with trace_span("redmine_auth"):
+            redmine_user: User | None = self.auth()
+        if not redmine_user or (should_stop and should_stop()):
+            return redmine_user
+
+        try:
+            with trace_span("redmine_prefetch", subjects=len(issue_subjects)) as span:
+                self.get_issue_priorities()
+                self.prefetch_wse_issues(issue_subjects=issue_subjects, should_stop=should_stop)
+                span["issues"] = sum(map(len, (self.prefetched_wse_issues or {}).values()))
+        except (BaseRedmineError, RequestException) as e:
+            # warm up is best effort, the upsert phase falls back to the regular lookups
+            log_message(
+                mode="warning",
+                msg=f"redmine error occured ⊱ {e} ⊰ while warming up",
+            )
+
+        return redmine_user
+
+    def prefetch_wse_issues(
+        self, issue_subjects: list[str], should_stop: Callable[[], bool] | None = None
+    ) -> None:
+        """Fetch today's **Windows Security Events** issues with journals for the given subjects in advance.
+
+        Parameters
+        ----------
+        issue_subjects : list[str]
+            Issue subjects to prefetch, subjects without an issue today are cached as not exists.
+        should_stop : Callable[[], bool] | None, optional
+            Checked before each issue request, a stopped prefetch is not kept since its subjects
+            would be cached as not exists. Default is None.
         """
-        issues: list[Issue] = list(self.issue.all(sort="created_on:desc", limit=1))
-        return issues[0].id if issues else 0
 
-    def upsert_wse_event(self, redmine_user: User, event_to_upsert: dict[str,]) -> None:
+        subjects: set[str] = set(issue_subjects)
+        prefetched_wse_issues: dict[str, list[Issue]] = {s: [] for s in subjects}
+
+        today_wse_issues: list[Issue] = list(
+            self.issue.filter(
+                project_id=REDMINE_PROJECT.id,
+                tracker_id=REDMINE_WINDOWS_SECURITY_EVENT_TRACKER_ID,
+                status_id="*",
+                created_on=datetime.now().strftime("%Y-%m-%d"),
+            )
+        )
+        today_wse_issues = [i for i in today_wse_issues if i.subject in subjects]
+        if self._async_redmine:
+            if should_stop and should_stop():
+                return
+
+            # journals are only returned when the issue is requested by its id, the issues are requested concurrently
+            issues: list[dict | None] = self._async_redmine.get_issues(
+                issue_ids=[wse_issue.id for wse_issue in today_wse_issues], include=["journals"]
+            )
+            # a missing issue would be cached as not exists and created again
+            if any(issue is None for issue in issues):
+                return
+
+            for issue in issues:
+                prefetched_wse_issues[issue["subject"]].append(self.issue.to_resource(issue))
+            self.prefetched_wse_issues = prefetched_wse_issues
+            return
+
+        for wse_issue in today_wse_issues:
+            if should_stop and should_stop():
+                return
+
+            # journals are only returned when the issue is requested by its id
+            prefetched_wse_issues[wse_issue.subject].append(
+                self.issue.get(resource_id=wse_issue.id, include=["journals"])
+            )
+
+        self.prefetched_wse_issues = prefetched_wse_issues
+
+    def upsert_wse_event(self, redmine_user: User, event_to_upsert: dict[str,]) -> bool:
         """Update or create the wse issue on redmine for the given event."
 
         Parameters
         ----------
         event_to_upsert : dict[str, Any]
             The event to update or create the wse issue
+
+        Returns
+        -------
+        bool
+            True if the event is delivered (created, updated or already exists), False if redmine failed.
         """
 
         pe_priority_id: int = int(
@@ -197,10 +434,14 @@ class Redmine(redminelib.Redmine):
         pe_issue_description: str = event_to_upsert.get("redmine_issue_description")
         pe_events: list[str] = event_to_upsert.get("events", [])
         pe_log: str = event_to_upsert.get("event_log")
+        pe_log_digests: list[str] = event_to_upsert.get("event_log_digests", [])
+        pe_log_digest: str | None = event_to_upsert.get("event_log_digest")
+        pe_sources: list[str] = event_to_upsert.get("sources", [])
 
         log_message(
             mode="info",
             msg=f"upserting ⊱ {len(pe_events)} ⊰ events for event id ⊱ {pe_event_id} ⊰",
+            sample_key="upsert",
         )
 
         try:
@@ -217,12 +458,17 @@ class Redmine(redminelib.Redmine):
                     event_desc=pe_issue_description,
                     events=pe_events,
                     event_log=pe_log,
+                    sources=pe_sources,
+                    event_log_digests=pe_log_digests,
+                    event_log_digest=pe_log_digest,
                 )
                 log_message(
                     mode="info",
                     msg=f"⊱ {self.url}/issues/{created_issue.id} ⊰ issue created for event id ⊱ {pe_event_id} ⊰",
+                    sample_key="upsert_created",
                 )
-                return
+                UPSERTS.labels(result="created").inc()
+                return True
 
             wse_issue: Issue = is_wse_issue_exists[0]
 
@@ -236,8 +482,10 @@ class Redmine(redminelib.Redmine):
                 log_message(
                     mode="warning",
                     msg=f"⊱ {self.url}/issues/{wse_issue.id} ⊰ event already exists in description for event id ⊱ {pe_event_id} ⊰",
+                    sample_key="upsert_skipped",
                 )
-                return
+                UPSERTS.labels(result="skipped").inc()
+                return True
 
             # check if the new events are in the journal notes
             is_pe_in_notes = [
@@ -255,8 +503,10 @@ class Redmine(redminelib.Redmine):
                 log_message(
                     mode="warning",
                     msg=f"⊱ {self.url}/issues/{wse_issue.id} ⊰ event already exists in journal for event ⊱ {pe_event_id} ⊰",
+                    sample_key="upsert_skipped",
                 )
-                return
+                UPSERTS.labels(result="skipped").inc()
+                return True
 
             # if the event is not in the description or journal, update the wse_issue
             self.update_wse_issue(
@@ -268,19 +518,32 @@ class Redmine(redminelib.Redmine):
                 new_events=is_pe_in_notes,
                 event_log=pe_log,
                 to_update_issue_id=wse_issue.id,
+                sources=pe_sources,
+                event_log_digests=pe_log_digests,
+                event_log_digest=pe_log_digest,
             )
             log_message(
                 mode="info",
                 msg=f"⊱ {self.url}/issues/{wse_issue.id} ⊰ issue updated for event id ⊱ {pe_event_id} ⊰",
+                sample_key="upsert_updated",
             )
-        except BaseRedmineError as e:
+            UPSERTS.labels(result="updated").inc()
+            return True
+        except (BaseRedmineError, RequestException) as e:
             log_message(
                 mode="error",
                 msg=f"redmine error occured ⊱ {e} ⊰ while upserting for event id ⊱ {pe_event_id} ⊰",
             )
+            UPSERTS.labels(result="failed").inc()
+            # the failures without a response are not seen by the response hook, the refused requests are not sent at all
+            if isinstance(e, RequestException) and not isinstance(
+                e, (CircuitOpenError, DeadlineExceededError)
+            ):
+                self.rate_controller.record_failure()
             MsTeams.send_message(
                 msg=f"redmine error occured ⊱ {e} ⊰ while upserting for event id ⊱ {pe_event_id} ⊰"
             )
+            return False
 
     def get_priority_name_by_id(self, priority_id: int) -> str:
         """Get the priority name by the given priority id.
@@ -296,14 +559,26 @@ class Redmine(redminelib.Redmine):
             Priority name
         """
 
-        issue_priorities: list[dict] = list(
-            self.enumeration.filter(resource="issue_priorities")
-        )
         return next(
-            (p.name for p in issue_priorities if p.id == priority_id),
+            (p.name for p in self.get_issue_priorities() if p.id == priority_id),
             self.CUSTOM_DEFAULT_PRIORITY["name"],
         )
 
+    def get_issue_priorities(self) -> list[dict]:
+        """Get the issue priorities, they are requested once per instance.
+
+        Returns
+        -------
+        list[dict]
+            Issue priority enumerations.
+        """
+
+        if self.issue_priorities is None:
+            self.issue_priorities = list(
+                self.enumeration.filter(resource="issue_priorities")
+            )
+        return self.issue_priorities
+
     def load_issue_template(
         self,
         subject: str,
@@ -312,8 +587,10 @@ class Redmine(redminelib.Redmine):
         event_id: str,
         event_desc: str,
         events: list[str],
-        event_log: str,
-        issue_id: int,
+        event_log: str | None,
+        issue_id: int | None,
+        sources: list[str] | None = None,
+        event_log_reference: str = "",
     ) -> str | None:
         """Load the issue description template to format the issue description with the given parameters.
 
@@ -331,10 +608,14 @@ class Redmine(redminelib.Redmine):
             Windows Security Event Description.
         events : list[str]
             List of Windows Security Events.
-        event_log : str
-            Windows Security Event Log.
-        issue_id : int
-            Issue id to pass to the issue template.
+        event_log : str | None
+            Sample of the Windows Security Event Log, shown as **( not exists )** if None.
+        issue_id : int | None
+            Issue id of the template's issue link, None for a new issue whose id is not known before it is created.
+        sources : list[str] | None, optional
+            QRadar targets the events come from, shown in the template if given. Default is None.
+        event_log_reference : str, optional
+            Reference of the raw logs in the event log store, shown under the sample if given. Default is "".
 
         Returns
         -------
@@ -370,8 +651,11 @@ class Redmine(redminelib.Redmine):
                 event_id=event_id,
                 event_description=event_desc,
                 events="".join(events),
-                event_log=html_escape(s=event_log),
-                issue_id=issue_id,
+                # the events matched by the lean searches may have no log sample
+                event_log=html_escape(s=event_log or EMPTY_FIELD_VALUE),
+                issue_url=html_escape(s=self.get_issue_url(subject=subject, issue_id=issue_id)),
+                sources=", ".join(sources) if sources else "",
+                event_log_reference=html_escape(s=event_log_reference),
             )
 
             return "{{html\n" + template_content + "\n}}"
@@ -379,3 +663,51 @@ class Redmine(redminelib.Redmine):
             raise BaseRedmineError(
                 f"{issue_template_file_name} not found in redmine/templates directory"
             )
+
+    def get_issue_url(self, subject: str, issue_id: int | None = None) -> str:
+        """Get the link of the issue, today's issues filtered by its subject if its id is not known yet.
+
+        The new issues are created in parallel, so a new issue's link is rendered by its subject
+        (unique per day) instead of predicting its id or updating its description once it is created.
+
+        Returns
+        -------
+        str
+            e.g. **https://redmine.example.com/issues/42** or
+            **https://redmine.example.com/issues?set_filter=1&status_id=%2A&created_on=2025-01-01&subject=~Event+%28Event+Id%3A+4720%29**
+        """
+
+        if issue_id is not None:
+            return f"{self.url}/issues/{issue_id}"
+
+        # the subject is a text filter, "~" is its contains operator
+        return f"{self.url}/issues?" + urlencode(
+            {
+                "set_filter": 1,
+                "status_id": "*",
+                "created_on": datetime.now().strftime("%Y-%m-%d"),
+                "subject": f"~{subject}",
+            }
+        )
+
+    @staticmethod
+    def get_event_log_reference(
+        event_log_digests: list[str], event_log_digest: str | None, uploads: list[dict]
+    ) -> str:
+        """Format the reference of the raw logs shown under the event log sample.
+
+        Returns
+        -------
+        str
+            e.g. **sha256:9f86d0… sample of 12 raw logs kept in the event log store, attached as event_logs_4720_20250101_120000.log.gz**
+        """
+
+        if not event_log_digests:
+            return ""
+
+        reference: str = f"sample of {len(event_log_digests)} raw logs kept in the event log store"
+        if event_log_digest:
+            reference = f"sha256:{event_log_digest} {reference}"
+        if uploads:
+            reference += f", attached as {uploads[0]['filename']}"
+        return reference
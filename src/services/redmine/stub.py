@@ -0,0 +1,97 @@
+from itertools import count
+from types import SimpleNamespace
+from typing import Any, Iterator
+
+from .redmine import Redmine
+
+
+class StubUser(SimpleNamespace):
+    """In-memory redmine user of the StubRedmine."""
+
+    def __str__(self) -> str:
+        return f"{self.firstname} {self.lastname}"
+
+
+class StubIssueManager:
+    """In-memory replacement of redminelib's issue resource manager, only the methods used by the Redmine class."""
+
+    def __init__(self) -> None:
+        self.issues: dict[int, SimpleNamespace] = {}
+        self._ids: Iterator[int] = count(start=1)
+
+    def create(self, **fields) -> SimpleNamespace:
+        issue: SimpleNamespace = SimpleNamespace(
+            id=next(self._ids), journals=[], **fields
+        )
+        self.issues[issue.id] = issue
+        return issue
+
+    def update(self, resource_id: int, **fields) -> bool:
+        issue: SimpleNamespace = self.issues[resource_id]
+        notes: str | None = fields.pop("notes", None)
+        if notes:
+            issue.journals.append(SimpleNamespace(notes=notes))
+        vars(issue).update(fields)
+        return True
+
+    def get(self, resource_id: int, **_) -> SimpleNamespace:
+        return self.issues[resource_id]
+
+    def filter(self, subject: str | None = None, **_) -> list[SimpleNamespace]:
+        return [
+            issue
+            for issue in self.issues.values()
+            if subject is None or issue.subject == subject
+        ]
+
+    def all(self, limit: int | None = None, **_) -> list[SimpleNamespace]:
+        issues: list[SimpleNamespace] = sorted(
+            self.issues.values(), key=lambda issue: issue.id, reverse=True
+        )
+        return issues[:limit] if limit else issues
+
+
+class StubEnumerationManager:
+    """In-memory replacement of redminelib's enumeration resource manager with the default issue priorities."""
+
+    ISSUE_PRIORITIES: list[SimpleNamespace] = [
+        SimpleNamespace(id=1, name="Low"),
+        SimpleNamespace(id=2, name="Medium"),
+        SimpleNamespace(id=3, name="High"),
+        SimpleNamespace(id=4, name="Urgent"),
+        SimpleNamespace(id=5, name="Immediate"),
+    ]
+
+    def filter(self, resource: str, **_) -> list[SimpleNamespace]:
+        return self.ISSUE_PRIORITIES if resource == "issue_priorities" else []
+
+
+class StubRedmine(Redmine):
+    """Redmine without network calls, issues are kept in memory.
+
+    The real upsert path (dedup against the description and journals, template rendering) runs unchanged,
+    only redminelib's resource managers are replaced, so captured production volumes can be replayed and profiled offline.
+
+    Attributes
+    ----------
+    issue : StubIssueManager
+        In-memory issues.
+    enumeration : StubEnumerationManager
+        In-memory enumerations.
+    """
+
+    def __init__(self, url: str = "http://redmine.stub", **redmine_kwargs) -> None:
+        super().__init__(url=url, **redmine_kwargs)
+        self.issue: StubIssueManager = StubIssueManager()
+        self.enumeration: StubEnumerationManager = StubEnumerationManager()
+
+    def auth(self) -> StubUser:
+        return StubUser(id=1, firstname="Replay", lastname="User")
+
+    def get_issue_stats(self) -> dict[str, Any]:
+        """Get the number of issues and journals written to the stub."""
+
+        return {
+            "issues": len(self.issue.issues),
+            "journals": sum(len(i.journals) for i in self.issue.issues.values()),
+        }
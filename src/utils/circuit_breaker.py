@@ -0,0 +1,169 @@
+from pathlib import Path
+from threading import Lock
+from time import time
+import sqlite3
+
+from .constants import CIRCUIT_BREAKER_CONFIG
+from .logger import log_message
+from .metrics import CIRCUIT_BREAKER_STATE
+from .state import connect_state_db, get_state_folder_path
+
+
+class CircuitBreaker:
+    """Fail fast on a degraded service instead of waiting for each of its requests to time out.
+
+    - **closed**: the requests are sent, the circuit opens after **failure_threshold** consecutive failures.
+    - **open**: the requests fail without being sent until **reset_seconds** pass.
+    - **half_open**: one probe request is sent, the circuit closes if it succeeds and opens again if it fails.
+
+    The state is kept in the state folder, so the next runs and the other worker shards don't retry an open circuit.
+
+    Attributes
+    ----------
+    name : str
+        Name of the protected service, e.g. **http:qradar.example.com**
+    failure_threshold : int
+        Consecutive failures to open the circuit.
+    reset_seconds : float
+        Seconds to wait in the open state before the probe request.
+    state : str
+        Circuit state, **closed**, **open** or **half_open**
+    failures : int
+        Consecutive failures since the last success.
+    opened_at : float
+        Unix time when the circuit is opened.
+
+    Methods
+    -------
+    - allow_request() -> bool
+    - is_open() -> bool
+    - record_success() -> None
+    - record_failure() -> None
+    """
+
+    STATE_VALUES: dict[str, int] = {"closed": 0, "half_open": 1, "open": 2}
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = CIRCUIT_BREAKER_CONFIG["failure_threshold"],
+        reset_seconds: float = CIRCUIT_BREAKER_CONFIG["reset_seconds"],
+    ) -> None:
+        self.name: str = name
+        self.failure_threshold: int = failure_threshold
+        self.reset_seconds: float = reset_seconds
+        self.state: str = "closed"
+        self.failures: int = 0
+        self.opened_at: float = 0.0
+        self._is_probing: bool = False
+        self._lock: Lock = Lock()
+
+        self.connection: sqlite3.Connection = connect_state_db(
+            file_name="circuit_breakers.sqlite3"
+        )
+        with self.connection:
+            self.connection.execute(
+                "create table if not exists circuit_breakers (name text primary key, state text not null, failures integer not null, opened_at real not null)"
+            )
+            row: sqlite3.Row | None = self.connection.execute(
+                "select state, failures, opened_at from circuit_breakers where name = ?",
+                (name,),
+            ).fetchone()
+        if row:
+            self.state, self.failures, self.opened_at = (
+                row["state"],
+                row["failures"],
+                row["opened_at"],
+            )
+        CIRCUIT_BREAKER_STATE.labels(name=name).set(self.STATE_VALUES[self.state])
+
+    def allow_request(self) -> bool:
+        """Check if a request can be sent, the first request after the reset seconds is the probe."""
+
+        with self._lock:
+            if self.state == "closed":
+                return True
+
+            # a half open circuit allows only one probe at a time, the others fail fast until its result
+            if self._is_probing or time() - self.opened_at < self.reset_seconds:
+                return False
+
+            self._is_probing = True
+            self._set_state(state="half_open")
+            log_message(
+                mode="info",
+                msg=f"circuit ⊱ {self.name} ⊰ is half open, probing the service",
+            )
+            return True
+
+    def is_open(self) -> bool:
+        """Check if the requests fail fast, without starting a probe."""
+
+        with self._lock:
+            if self.state == "closed":
+                return False
+            return self._is_probing or time() - self.opened_at < self.reset_seconds
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._is_probing = False
+            if self.state == "closed" and not self.failures:
+                return
+
+            if self.state != "closed":
+                log_message(mode="info", msg=f"circuit ⊱ {self.name} ⊰ is closed")
+            self.failures = 0
+            self._set_state(state="closed")
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._is_probing = False
+            self.failures += 1
+            if self.state == "half_open" or (
+                self.state == "closed" and self.failures >= self.failure_threshold
+            ):
+                self.opened_at = time()
+                self._set_state(state="open")
+                log_message(
+                    mode="warning",
+                    msg=f"circuit ⊱ {self.name} ⊰ is open after ⊱ {self.failures} ⊰ failures, requests fail fast for ⊱ {self.reset_seconds} ⊰ seconds",
+                )
+                return
+
+            self._set_state(state=self.state)
+
+    def _set_state(self, state: str) -> None:
+        """Set & persist the state, the caller must hold the lock."""
+
+        self.state = state
+        CIRCUIT_BREAKER_STATE.labels(name=self.name).set(self.STATE_VALUES[state])
+        with self.connection:
+            self.connection.execute(
+                "insert or replace into circuit_breakers (name, state, failures, opened_at) values (?, ?, ?, ?)",
+                (self.name, self.state, self.failures, self.opened_at),
+            )
+
+
+_circuit_breakers: dict[tuple[Path, str], CircuitBreaker] = {}
+_circuit_breakers_lock: Lock = Lock()
+
+
+def get_circuit_breaker(name: str) -> CircuitBreaker:
+    """Get the circuit breaker of a service, the clients of the same service share it.
+
+    Parameters
+    ----------
+    name : str
+        Name of the protected service, e.g. **redmine:redmine.example.com**
+
+    Returns
+    -------
+    CircuitBreaker
+        Circuit breaker of the service in the current state folder.
+    """
+
+    key: tuple[Path, str] = (get_state_folder_path(), name)
+    with _circuit_breakers_lock:
+        if key not in _circuit_breakers:
+            _circuit_breakers[key] = CircuitBreaker(name=name)
+        return _circuit_breakers[key]
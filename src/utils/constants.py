@@ -1,9 +1,11 @@
-from src.config.config import Path, load_config, ROOT_FOLDER_PATH
+from src.config.config import Path, is_config_enabled, load_config, ROOT_FOLDER_PATH
 from src.services.redmine.types import CustomProject
 
 
 LOG_FOLDER_PATH: Path = ROOT_FOLDER_PATH / "logs"
 
+STATE_FOLDER_PATH: Path = ROOT_FOLDER_PATH / "state"
+
 CONFIG: dict[str, str | None] = load_config()
 
 DEFAULT_ENV: str = "dev"
@@ -17,6 +19,12 @@ TEAMS_WORKFLOW_CONFIG: dict[str, str | None] = {
     "title": f"{ROOT_FOLDER_PATH.name}-wse-automation",
 }
 
+TEAMS_NOTIFIER_CONFIG: dict[str, int] = {
+    "digest_window_seconds": int(CONFIG.get("TEAMS_DIGEST_WINDOW_SECONDS") or 10),
+    "min_interval_seconds": int(CONFIG.get("TEAMS_MIN_INTERVAL_SECONDS") or 5),
+    "queue_size": int(CONFIG.get("TEAMS_QUEUE_SIZE") or 100),
+}
+
 REDMINE_PROJECT: CustomProject = (
     CustomProject(
         id=int(CONFIG.get("REDMINE_PROD_PROJECT_ID", 0)),
@@ -36,3 +44,82 @@ REDMINE_WINDOWS_SECURITY_EVENT_TRACKER_ID: int = int(
 REDMINE_ISSUE_DESC_TEMPLATE_MODE: str = CONFIG.get(
     "REDMINE_ISSUE_DESC_TEMPLATE_MODE", "light"
 )
+
+OUTBOX_CONFIG: dict[str, int] = {
+    "max_attempts": int(CONFIG.get("OUTBOX_MAX_ATTEMPTS", 10)),
+    "backoff_seconds": int(CONFIG.get("OUTBOX_BACKOFF_SECONDS", 60)),
+    "max_backoff_seconds": int(CONFIG.get("OUTBOX_MAX_BACKOFF_SECONDS", 3600)),
+}
+
+WORKER_CONFIG: dict[str, int] = {
+    "shard_index": int(CONFIG.get("WORKER_SHARD_INDEX", 0)),
+    "shard_count": int(CONFIG.get("WORKER_SHARD_COUNT", 1)),
+}
+
+EVENT_LOG_CONFIG: dict[str, int | bool] = {
+    "sample_chars": int(CONFIG.get("EVENT_LOG_SAMPLE_CHARS") or 1000),
+    "retention_days": int(CONFIG.get("EVENT_LOG_RETENTION_DAYS") or 30),
+    "max_digests": int(CONFIG.get("EVENT_LOG_MAX_DIGESTS") or 100),
+    "attach_to_issues": is_config_enabled(config=CONFIG, key="REDMINE_EVENT_LOG_ATTACHMENT"),
+}
+
+EVENT_SPILL_THRESHOLD: int = int(CONFIG.get("EVENT_SPILL_THRESHOLD", 50000) or 0)
+
+FIELD_NORMALIZATION_CONFIG: dict[str, bool | str | dict[str, str] | tuple[str, ...] | int] = {
+    "case_fold": is_config_enabled(config=CONFIG, key="FIELD_CASE_FOLD"),
+    "user_format": (CONFIG.get("FIELD_USER_FORMAT") or "as_is").lower(),
+    "domain_map": {
+        suffix.strip(): domain.strip()
+        for suffix, _, domain in (
+            item.partition("=") for item in (CONFIG.get("FIELD_DOMAIN_MAP") or "").split(",")
+        )
+        if suffix.strip() and domain.strip()
+    },
+    "empty_values": tuple(
+        value for value in (CONFIG.get("FIELD_EMPTY_VALUES") or "").split(",") if value.strip()
+    ),
+    "memo_size": int(CONFIG.get("FIELD_NORMALIZER_MEMO_SIZE") or 65536),
+}
+
+RULE_PRIORITY_CADENCE: dict[int, int] = {
+    int(priority_id): int(minutes)
+    for priority_id, _, minutes in (
+        item.partition("=") for item in (CONFIG.get("RULE_PRIORITY_CADENCE") or "").split(",")
+    )
+    if priority_id.strip() and minutes.strip()
+}
+
+REFERENCE_SET_TTL_SECONDS: int = int(CONFIG.get("REFERENCE_SET_TTL_SECONDS") or 3600)
+
+RUN_DEADLINE_SECONDS: int = int(CONFIG.get("RUN_DEADLINE_SECONDS", 600) or 0)
+
+CIRCUIT_BREAKER_CONFIG: dict[str, int] = {
+    "failure_threshold": int(CONFIG.get("CIRCUIT_BREAKER_FAILURES") or 5),
+    "reset_seconds": int(CONFIG.get("CIRCUIT_BREAKER_RESET_SECONDS") or 300),
+}
+
+REDMINE_RATE_CONFIG: dict[str, int | float] = {
+    "initial_concurrency": int(CONFIG.get("REDMINE_INITIAL_CONCURRENCY") or 2),
+    "min_concurrency": int(CONFIG.get("REDMINE_MIN_CONCURRENCY") or 1),
+    "max_concurrency": int(CONFIG.get("REDMINE_MAX_CONCURRENCY") or 8),
+    "target_p95_seconds": float(CONFIG.get("REDMINE_TARGET_P95_SECONDS") or 2.0),
+    "max_error_rate": float(CONFIG.get("REDMINE_MAX_ERROR_RATE") or 0.05),
+    "window_size": int(CONFIG.get("REDMINE_RATE_WINDOW_SIZE") or 20),
+}
+
+METRICS_CONFIG: dict[str, int | str | None] = {
+    "port": int(CONFIG.get("METRICS_PORT") or 9108),
+    "textfile_path": CONFIG.get("METRICS_TEXTFILE_PATH") or None,
+}
+
+LOG_CONFIG: dict[str, int] = {
+    "max_bytes": int(CONFIG.get("LOG_MAX_BYTES") or 10 * 1024 * 1024),
+    "backup_count": int(CONFIG.get("LOG_BACKUP_COUNT") or 5),
+    "sample_burst": int(CONFIG.get("LOG_SAMPLE_BURST") or 20),
+    "sample_interval": int(CONFIG.get("LOG_SAMPLE_INTERVAL") or 60),
+}
+
+PROFILE_CONFIG: dict[str, bool | int] = {
+    "enabled": is_config_enabled(config=CONFIG, key="PROFILE"),
+    "top_count": int(CONFIG.get("PROFILE_TOP_COUNT") or 30),
+}
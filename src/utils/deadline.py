@@ -0,0 +1,69 @@
+from contextlib import contextmanager
+from time import monotonic
+from typing import Iterator
+
+
+# monotonic time of the active run's deadline, shared by the threads of the run (searches, warm up, upserts)
+_deadline: float | None = None
+
+
+@contextmanager
+def run_deadline(seconds: float | None) -> Iterator[None]:
+    """Limit the run to the given seconds, the HTTP timeouts, QRadar polling and Redmine upserts stop at the deadline.
+
+    It can be used as a decorator as well, e.g. **@run_deadline(seconds=600)**
+
+    Parameters
+    ----------
+    seconds : float | None
+        Maximum seconds of the run, no deadline if None or 0. A nested deadline can't extend the outer one.
+    """
+
+    global _deadline
+
+    previous_deadline: float | None = _deadline
+    if seconds:
+        deadline: float = monotonic() + seconds
+        _deadline = min(deadline, previous_deadline) if previous_deadline else deadline
+    try:
+        yield
+    finally:
+        _deadline = previous_deadline
+
+
+def get_remaining_seconds() -> float | None:
+    """Get the seconds until the active run's deadline, None if there is no deadline."""
+
+    if _deadline is None:
+        return None
+
+    return max(_deadline - monotonic(), 0.0)
+
+
+def is_deadline_exceeded() -> bool:
+    """Check if the active run's deadline is passed."""
+
+    return _deadline is not None and monotonic() >= _deadline
+
+
+def get_timeout(timeout: float | None) -> float | None:
+    """Limit a timeout (HTTP request, search polling) with the seconds until the deadline.
+
+    Parameters
+    ----------
+    timeout : float | None
+        Timeout in seconds, no timeout if None.
+
+    Returns
+    -------
+    float | None
+        The smaller of the timeout and the remaining seconds, None if both are unlimited.
+    """
+
+    remaining_seconds: float | None = get_remaining_seconds()
+    if remaining_seconds is None:
+        return timeout
+    if timeout is None:
+        return remaining_seconds
+
+    return min(timeout, remaining_seconds)
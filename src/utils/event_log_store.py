@@ -0,0 +1,236 @@
+from gzip import compress as gzip_compress, decompress as gzip_decompress
+from hashlib import sha256
+from threading import Lock
+from time import time
+import sqlite3
+
+try:
+    import zstandard
+except ImportError:  # zstandard is optional, the event logs are stored with gzip without it
+    zstandard = None
+
+from .constants import EVENT_LOG_CONFIG
+from .logger import log_message
+from .state import connect_state_db
+
+
+def get_event_log_digest(event_log: str) -> str:
+    """Get the content address of a raw event log, the sha256 of its UTF-8 bytes."""
+
+    return sha256(event_log.encode("utf-8")).hexdigest()
+
+
+def get_event_log_sample(
+    event_log: str, sample_chars: int = EVENT_LOG_CONFIG["sample_chars"]
+) -> str:
+    """Shorten a raw event log to the sample shown in the issues, the full log is kept in the event log store."""
+
+    if len(event_log) <= sample_chars:
+        return event_log
+
+    return event_log[:sample_chars] + f"… ({len(event_log) - sample_chars} more characters)"
+
+
+class EventLogStore:
+    """Content-addressed store of the matched events' raw logs in the state folder.
+
+    Each raw log is compressed (zstd if zstandard is installed, gzip otherwise) and stored once by its sha256 digest,
+    the identical logs of the searched rows and the next runs are deduplicated. The matched events keep only the
+    digests and a short sample of their last log, so the outbox and the Redmine payloads stay small.
+
+    Attributes
+    ----------
+    retention_seconds : int
+        Seconds to keep a log since it is last stored, 0 keeps them forever.
+    connection : sqlite3.Connection
+        Connection to the event logs database.
+
+    Methods
+    -------
+    - put_many(event_logs: dict[str, str]) -> int
+    - get_many(digests: list[str]) -> dict[str, str]
+    - build_archive(digests: list[str]) -> bytes | None
+    - prune() -> int
+    """
+
+    def __init__(
+        self,
+        file_name: str = "event_logs.sqlite3",
+        retention_seconds: int = EVENT_LOG_CONFIG["retention_days"] * 86400,
+    ) -> None:
+        self.retention_seconds: int = retention_seconds
+        self._lock: Lock = Lock()
+
+        self.connection: sqlite3.Connection = connect_state_db(file_name=file_name)
+        with self.connection:
+            self.connection.execute(
+                """
+                create table if not exists event_logs (
+                    digest text primary key,
+                    codec text not null,
+                    data blob not null,
+                    stored_at real not null
+                )
+                """
+            )
+            self.connection.execute(
+                "create index if not exists event_logs_stored_at on event_logs (stored_at)"
+            )
+
+    def put_many(self, event_logs: dict[str, str]) -> int:
+        """Store the raw logs by their digests, the stored ones are only refreshed for the retention.
+
+        Parameters
+        ----------
+        event_logs : dict[str, str]
+            Raw logs by their digest (see get_event_log_digest).
+
+        Returns
+        -------
+        int
+            Number of the newly stored logs.
+        """
+
+        if not event_logs:
+            return 0
+
+        stored_at: float = time()
+        with self._lock, self.connection:
+            stored_digests: set[str] = self._get_stored_digests(digests=list(event_logs))
+            self.connection.executemany(
+                "update event_logs set stored_at = ? where digest = ?",
+                ((stored_at, digest) for digest in stored_digests),
+            )
+
+            compressor = zstandard.ZstdCompressor() if zstandard is not None else None
+            self.connection.executemany(
+                "insert or ignore into event_logs (digest, codec, data, stored_at) values (?, ?, ?, ?)",
+                (
+                    (
+                        digest,
+                        "zstd" if compressor else "gzip",
+                        (
+                            compressor.compress(event_log.encode("utf-8"))
+                            if compressor
+                            else gzip_compress(event_log.encode("utf-8"))
+                        ),
+                        stored_at,
+                    )
+                    for digest, event_log in event_logs.items()
+                    if digest not in stored_digests
+                ),
+            )
+        return len(event_logs) - len(stored_digests)
+
+    def get_many(self, digests: list[str]) -> dict[str, str]:
+        """Get the raw logs of the digests, the missing (pruned) ones are skipped.
+
+        Parameters
+        ----------
+        digests : list[str]
+            Digests of the raw logs.
+
+        Returns
+        -------
+        dict[str, str]
+            Raw logs by their digest, in the order of the digests.
+        """
+
+        rows: dict[str, sqlite3.Row] = {}
+        with self._lock:
+            # sqlite limits the number of the query parameters, the digests are read in batches
+            for index in range(0, len(digests), 500):
+                batch: list[str] = digests[index : index + 500]
+                rows.update(
+                    (row["digest"], row)
+                    for row in self.connection.execute(
+                        f"select digest, codec, data from event_logs where digest in ({', '.join('?' * len(batch))})",
+                        batch,
+                    )
+                )
+
+        event_logs: dict[str, str] = {}
+        for digest in digests:
+            row: sqlite3.Row | None = rows.get(digest)
+            if row is None:
+                continue
+            if row["codec"] == "zstd" and zstandard is None:
+                log_message(
+                    mode="warning",
+                    msg=f"event log ⊱ {digest} ⊰ is stored with zstd, zstandard must be installed to read it",
+                    sample_key="event_log_codec",
+                )
+                continue
+
+            data: bytes = (
+                zstandard.ZstdDecompressor().decompress(row["data"])
+                if row["codec"] == "zstd"
+                else gzip_decompress(row["data"])
+            )
+            event_logs[digest] = data.decode("utf-8")
+        return event_logs
+
+    def build_archive(self, digests: list[str]) -> bytes | None:
+        """Build one gzip compressed text file of the raw logs to attach to an issue, a log per line.
+
+        Parameters
+        ----------
+        digests : list[str]
+            Digests of the raw logs.
+
+        Returns
+        -------
+        bytes | None
+            Gzip compressed logs, None if none of the logs is in the store.
+        """
+
+        event_logs: dict[str, str] = self.get_many(digests=digests)
+        if not event_logs:
+            return None
+
+        return gzip_compress(
+            "".join(
+                f"sha256:{digest} {event_log.replace(chr(10), ' ')}\n"
+                for digest, event_log in event_logs.items()
+            ).encode("utf-8")
+        )
+
+    def prune(self) -> int:
+        """Delete the logs not stored again for the retention seconds.
+
+        Returns
+        -------
+        int
+            Number of the deleted logs.
+        """
+
+        if not self.retention_seconds:
+            return 0
+
+        with self._lock, self.connection:
+            deleted_count: int = self.connection.execute(
+                "delete from event_logs where stored_at < ?",
+                (time() - self.retention_seconds,),
+            ).rowcount
+
+        if deleted_count:
+            log_message(
+                mode="info",
+                msg=f"⊱ {deleted_count} ⊰ event logs older than ⊱ {self.retention_seconds // 86400} ⊰ days are pruned",
+            )
+        return deleted_count
+
+    def _get_stored_digests(self, digests: list[str]) -> set[str]:
+        """Get the digests already in the store, the caller must hold the lock."""
+
+        stored_digests: set[str] = set()
+        for index in range(0, len(digests), 500):
+            batch: list[str] = digests[index : index + 500]
+            stored_digests.update(
+                row["digest"]
+                for row in self.connection.execute(
+                    f"select digest from event_logs where digest in ({', '.join('?' * len(batch))})",
+                    batch,
+                )
+            )
+        return stored_digests
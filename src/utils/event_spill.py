@@ -0,0 +1,255 @@
+from glob import escape as glob_escape, glob
+from os import (
+    close as os_close,
+    getpid,
+    kill as os_kill,
+    makedirs as os_makedirs,
+    remove as os_remove,
+)
+from os.path import basename, join as path_join
+from socket import gethostname
+from tempfile import mkstemp
+from threading import Lock
+from typing import Any, Iterator
+from weakref import WeakValueDictionary
+import sqlite3
+
+from .logger import log_message
+from .state import get_state_folder_path
+
+# open spills of this process by their file, a spill of a run that raised is dropped when it is collected
+_OPEN_SPILLS: WeakValueDictionary[str, "EventSpill"] = WeakValueDictionary()
+_OPEN_SPILLS_LOCK: Lock = Lock()
+
+
+class EventSpill:
+    """Temporary on-disk run of the matched event texts of the rules over the in-memory budget.
+
+    Each run (or backfill chunk) owns its spill. The spilled texts are kept in a SQLite file in the state folder,
+    sorted & deduplicated by the rule and the text (the first spill of a text keeps its position), and read back
+    in pages in their matched order when the events are enqueued. The file is created on the first spill, named
+    by the host & the process id, and deleted when the spill is closed. The files left by the dead processes
+    of the host (or by the runs of this process that raised before closing their spill) are deleted
+    when a new spill file is created.
+
+    Attributes
+    ----------
+    spilled_rules : dict[int, dict[str, Any]]
+        Spilled windows security events by their id.
+    file_path : str | None
+        Path of the spill file, **/path/to/state/event_spill_<host>_<pid>_*.sqlite3**, None before the first spill.
+    connection : sqlite3.Connection | None
+        Connection to the spill file, None before the first spill.
+
+    Methods
+    -------
+    - spill(wse: dict[str, Any], event_texts: list[str]) -> int
+    - is_spilled(wse: dict[str, Any]) -> bool
+    - read_pages(wse: dict[str, Any], page_size: int) -> Iterator[list[str]]
+    - merge(wse: dict[str, Any]) -> list[str]
+    - close() -> None
+    """
+
+    def __init__(self) -> None:
+        self._lock: Lock = Lock()
+        self._sequence: int = 0
+
+        self.spilled_rules: dict[int, dict[str, Any]] = {}
+        self.file_path: str | None = None
+        self.connection: sqlite3.Connection | None = None
+
+    def _open(self) -> sqlite3.Connection:
+        if self.connection is not None:
+            return self.connection
+
+        os_makedirs(name=get_state_folder_path(), exist_ok=True)
+        with _OPEN_SPILLS_LOCK:
+            _remove_stale_spill_files()
+            file_descriptor, self.file_path = mkstemp(
+                prefix=f"{get_spill_file_prefix()}{getpid()}_",
+                suffix=".sqlite3",
+                dir=get_state_folder_path(),
+            )
+            os_close(file_descriptor)
+            _OPEN_SPILLS[self.file_path] = self
+
+        self.connection = sqlite3.connect(database=self.file_path, check_same_thread=False)
+        # the spill is rebuilt by the next search if the process dies, it doesn't need a journal
+        self.connection.execute("PRAGMA journal_mode=OFF")
+        self.connection.execute("PRAGMA synchronous=OFF")
+        with self.connection:
+            self.connection.execute(
+                """
+                create table spilled_events (
+                    rule_key integer not null,
+                    event_text text not null,
+                    sequence integer not null,
+                    primary key (rule_key, event_text)
+                ) without rowid
+                """
+            )
+            self.connection.execute(
+                "create index spilled_events_order on spilled_events (rule_key, sequence)"
+            )
+        return self.connection
+
+    def spill(self, wse: dict[str, Any], event_texts: list[str]) -> int:
+        """Write the event texts of the rule to the spill, the already spilled texts are skipped.
+
+        Parameters
+        ----------
+        wse : dict[str, Any]
+            The rule whose events are spilled.
+        event_texts : list[str]
+            Matched event texts of the rule, in their matched order.
+
+        Returns
+        -------
+        int
+            Number of the newly spilled texts.
+        """
+
+        with self._lock:
+            connection: sqlite3.Connection = self._open()
+            self.spilled_rules[id(wse)] = wse
+            with connection:
+                spilled_count: int = connection.executemany(
+                    "insert or ignore into spilled_events (rule_key, event_text, sequence) values (?, ?, ?)",
+                    (
+                        (id(wse), event_text, sequence)
+                        for sequence, event_text in enumerate(event_texts, start=self._sequence)
+                    ),
+                ).rowcount
+            self._sequence += len(event_texts)
+        return spilled_count
+
+    def is_spilled(self, wse: dict[str, Any]) -> bool:
+        """Check if the rule's events are spilled, its events are read from the spill instead of its events list."""
+
+        return id(wse) in self.spilled_rules
+
+    def read_pages(self, wse: dict[str, Any], page_size: int) -> Iterator[list[str]]:
+        """Read the spilled texts of the rule in their matched order, at most page_size texts at a time.
+
+        Parameters
+        ----------
+        wse : dict[str, Any]
+            The spilled rule.
+        page_size : int
+            Number of the texts per page.
+
+        Yields
+        ------
+        list[str]
+            The next page of the rule's spilled texts.
+        """
+
+        if self.connection is None:
+            return
+
+        last_sequence: int = -1
+        while True:
+            with self._lock:
+                rows: list[tuple[str, int]] = self.connection.execute(
+                    "select event_text, sequence from spilled_events where rule_key = ? and sequence > ? order by sequence limit ?",
+                    (id(wse), last_sequence, page_size),
+                ).fetchall()
+            if not rows:
+                return
+
+            last_sequence = rows[-1][1]
+            yield [row[0] for row in rows]
+
+    def merge(self, wse: dict[str, Any]) -> list[str]:
+        """Read all spilled texts of the rule back in their matched order and remove them from the spill."""
+
+        if self.connection is None:
+            return []
+
+        with self._lock, self.connection:
+            event_texts: list[str] = [
+                row[0]
+                for row in self.connection.execute(
+                    "select event_text from spilled_events where rule_key = ? order by sequence",
+                    (id(wse),),
+                )
+            ]
+            self.connection.execute("delete from spilled_events where rule_key = ?", (id(wse),))
+            self.spilled_rules.pop(id(wse), None)
+        return event_texts
+
+    def close(self) -> None:
+        """Close the connection and delete the spill file."""
+
+        with self._lock:
+            self.spilled_rules.clear()
+            if self.connection is None:
+                return
+
+            self.connection.close()
+            self.connection = None
+            with _OPEN_SPILLS_LOCK:
+                _OPEN_SPILLS.pop(self.file_path, None)
+            try:
+                os_remove(self.file_path)
+            except OSError as e:
+                log_message(
+                    mode="warning",
+                    msg=f"event spill file ⊱ {self.file_path} ⊰ could not be deleted: {e}",
+                )
+
+
+def get_spill_file_prefix() -> str:
+    """Get the spill file name prefix of the host, the state folder may be shared by the hosts' containers."""
+
+    return f"event_spill_{gethostname()}_"
+
+
+def is_process_alive(pid: int) -> bool:
+    """Check if the process of the host is running, a process of another user is running too."""
+
+    try:
+        os_kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _remove_stale_spill_files() -> int:
+    """Delete the spill files of the host's dead processes (e.g. left by a killed run) and of this process' lost spills.
+
+    It is called with _OPEN_SPILLS_LOCK held, so a spill file of this process is not deleted while it is created.
+
+    Returns
+    -------
+    int
+        Number of the deleted spill files.
+    """
+
+    prefix: str = get_spill_file_prefix()
+    removed_count: int = 0
+    pattern: str = path_join(glob_escape(get_state_folder_path()), f"{glob_escape(prefix)}*.sqlite3")
+    for file_path in glob(pattern):
+        pid: str = basename(file_path)[len(prefix) :].split("_", 1)[0]
+        if not pid.isdigit():
+            continue
+        if int(pid) == getpid():
+            if file_path in _OPEN_SPILLS:
+                continue
+        elif is_process_alive(pid=int(pid)):
+            continue
+
+        try:
+            os_remove(file_path)
+        except OSError as e:
+            log_message(
+                mode="warning",
+                msg=f"stale event spill file ⊱ {file_path} ⊰ could not be deleted: {e}",
+            )
+            continue
+
+        removed_count += 1
+        log_message(mode="info", msg=f"stale event spill file ⊱ {file_path} ⊰ is deleted")
+    return removed_count
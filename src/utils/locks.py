@@ -0,0 +1,32 @@
+from contextlib import contextmanager
+from fcntl import flock, LOCK_EX, LOCK_UN
+from hashlib import sha256
+from os import makedirs as os_makedirs
+from pathlib import Path
+from typing import Iterator
+
+from .state import get_state_folder_path
+
+
+@contextmanager
+def file_lock(name: str) -> Iterator[None]:
+    """Hold an exclusive lock, shared by all the processes using the same state folder, while in the context.
+
+    Parameters
+    ----------
+    name : str
+        Name of the locked resource (e.g. issue subject), it is hashed to build the lock file name.
+
+    - Lock file path: **/path/to/state/locks/<sha256 of the name>.lock**
+    """
+
+    lock_folder_path: Path = get_state_folder_path() / "locks"
+    os_makedirs(name=lock_folder_path, exist_ok=True)
+    lock_file_name: str = f"{sha256(name.encode('utf-8')).hexdigest()[:32]}.lock"
+
+    with open(file=lock_folder_path / lock_file_name, mode="a") as lock_file:
+        flock(lock_file.fileno(), LOCK_EX)
+        try:
+            yield
+        finally:
+            flock(lock_file.fileno(), LOCK_UN)
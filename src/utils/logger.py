@@ -1,10 +1,16 @@
+from atexit import register as atexit_register, unregister as atexit_unregister
 from os import path as os_path, makedirs as os_makedirs
 from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from queue import SimpleQueue
+from threading import Lock
+from time import monotonic
 import logging
 
 from pythonjsonlogger.json import JsonFormatter
 
-from .constants import LOG_FOLDER_PATH, ENV, IS_PROD, REDMINE_PROJECT
+from .constants import LOG_CONFIG, LOG_FOLDER_PATH, ENV, IS_PROD, REDMINE_PROJECT
+from .tracing import get_run_id
 
 
 class ColoredFormatter(logging.Formatter):
@@ -44,12 +50,153 @@ class ColoredFormatter(logging.Formatter):
         log_level: str = record.levelname
         log_color: str = self.LOG_COLORS.get(log_level, "reset")
 
+        # the record is shared with the file handler, so the colored level name is set on a copy
+        record = logging.makeLogRecord(record.__dict__)
         record.levelname = (
             f"{self.ANSI_COLORS[log_color]}[{log_level}]{self.ANSI_COLORS['reset']}"
         )
         return super().format(record=record)
 
 
+class RunIdFilter(logging.Filter):
+    """Add the run id of the active run to the records which don't have it, to correlate them with the run's spans.
+
+    It is added to the queue handler, so the run id is read in the logging thread instead of the writer thread.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "run_id"):
+            record.run_id = get_run_id()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Rate limit the repetitive records, so their logging cost doesn't grow with the event volume.
+
+    Only the records logged with a **sample_key** (e.g. log_message(..., sample_key="upsert")) below the
+    ERROR level are sampled, the errors are always logged. The first **burst** records of each key pass in each **interval**, the others
+    are dropped before they are queued and their count is added to the next passing record of the key.
+
+    Attributes
+    ----------
+    burst : int
+        Number of records of a key to pass in each interval, 0 disables the sampling.
+    interval : float
+        Sampling window in seconds.
+
+    Methods
+    -------
+    - filter(record: logging.LogRecord) -> bool
+    """
+
+    def __init__(self, burst: int, interval: float) -> None:
+        super().__init__()
+        self.burst: int = burst
+        self.interval: float = interval
+        # sample key > [window start, passed records, suppressed records]
+        self._windows: dict[str, list[float | int]] = {}
+        self._lock: Lock = Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        sample_key: str | None = getattr(record, "sample_key", None)
+        if sample_key is None or self.burst <= 0 or record.levelno >= logging.ERROR:
+            return True
+
+        now: float = monotonic()
+        with self._lock:
+            window: list[float | int] = self._windows.setdefault(sample_key, [now, 0, 0])
+            if now - window[0] >= self.interval:
+                window[0], window[1] = now, 0
+
+            if window[1] >= self.burst:
+                window[2] += 1
+                return False
+
+            window[1] += 1
+            suppressed: int = int(window[2])
+            window[2] = 0
+
+        if suppressed:
+            record.suppressed = suppressed
+            record.msg = f"{record.msg} (⊱ {suppressed} ⊰ similar messages suppressed)"
+        return True
+
+
+class MonthlyRotatingFileHandler(RotatingFileHandler):
+    """File handler writing to the current month's log file, rotated by size as well.
+
+    - Log file path: **/path/to/logs/2025/log_01.log**, the rotated files are **log_01.log.1**, **log_01.log.2**, ...
+    - A long-running process continues in the new month's file when the month changes.
+
+    Methods
+    -------
+    - get_month_file_path() -> str
+    - shouldRollover(record: logging.LogRecord) -> bool
+    """
+
+    def __init__(self, max_bytes: int, backup_count: int) -> None:
+        super().__init__(
+            filename=self.get_month_file_path(),
+            mode="a",
+            maxBytes=max_bytes,
+            backupCount=backup_count,
+            encoding="utf-8",
+        )
+
+    @staticmethod
+    def get_month_file_path() -> str:
+        """Get the current month's log file path, its year folder is created if not exists."""
+
+        now: datetime = datetime.now()
+        log_folder_path: str = os_path.join(LOG_FOLDER_PATH, str(now.year))
+        os_makedirs(name=log_folder_path, exist_ok=True)
+        return os_path.abspath(os_path.join(log_folder_path, f"log_{now.month:02d}.log"))
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        month: str = f"{datetime.now().month:02d}.log"
+        if not self.baseFilename.endswith(month):
+            # the month is changed, continue in the new month's file instead of rotating the old one
+            if self.stream:
+                self.stream.close()
+                self.stream = None
+            self.baseFilename = self.get_month_file_path()
+            return False
+
+        return super().shouldRollover(record)
+
+
+class TraceRecordFilter(logging.Filter):
+    """Filter the handler's records by the level, the tracing records (spans, run summaries) are filtered by their kind.
+
+    Attributes
+    ----------
+    level : int
+        Minimum log level of the records which are not tracing records.
+    traces : tuple[str, ...]
+        Kinds of the tracing records to pass, e.g. **("span", "run_summary")**
+
+    Methods
+    -------
+    - filter(record: logging.LogRecord) -> bool
+    """
+
+    def __init__(self, level: int, traces: tuple[str, ...]) -> None:
+        super().__init__()
+        self.level: int = level
+        self.traces: tuple[str, ...] = traces
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        trace: str | None = getattr(record, "trace", None)
+        if trace is None:
+            return record.levelno >= self.level
+        return trace in self.traces
+
+
+_queue_listener: QueueListener | None = None
+# the queue handler of the listener and its logger, replaced when the logger is set up again
+_queue_handler: tuple[logging.Logger, QueueHandler] | None = None
+
+
 def setup_console_handler() -> logging.Handler:
     """Create and return the console handler for colored log output."""
 
@@ -59,23 +206,18 @@ def setup_console_handler() -> logging.Handler:
         fmt="%(levelname)s %(message)s"
     )
     console_handler.setFormatter(fmt=ColoredFormatter(fmt=console_formatter._fmt))
+    # only the run summaries of the tracing records are shown, the spans are for the log file
+    console_handler.addFilter(
+        filter=TraceRecordFilter(level=logging.NOTSET, traces=("run_summary",))
+    )
     return console_handler
 
 
 def setup_file_handler() -> logging.Handler:
-    """Create and return the file handler for JSON formatted logs."""
+    """Create and return the file handler for JSON formatted logs, rotated by month & size."""
 
-    # create log folder if not exists
-    now: datetime = datetime.now()
-    log_folder_path: str = os_path.join(LOG_FOLDER_PATH, str(now.year))
-    os_makedirs(name=log_folder_path, exist_ok=True)
-
-    # create log file path based on the current month
-    log_file_name: str = f"log_{now.month:02d}.log"
-    log_file_path: str = os_path.join(log_folder_path, log_file_name)
-
-    file_handler: logging.FileHandler = logging.FileHandler(
-        filename=log_file_path, mode="a", encoding="utf-8"
+    file_handler: MonthlyRotatingFileHandler = MonthlyRotatingFileHandler(
+        max_bytes=LOG_CONFIG["max_bytes"], backup_count=LOG_CONFIG["backup_count"]
     )
     file_formatter: JsonFormatter = JsonFormatter(
         fmt="%(asctime)s %(levelname)s %(message)s",
@@ -88,7 +230,11 @@ def setup_file_handler() -> logging.Handler:
         },
     )
     file_handler.setFormatter(fmt=file_formatter)
-    file_handler.setLevel(level=logging.WARNING)
+    # warnings & errors and the tracing records (spans, run summaries) with their structured fields
+    file_handler.setLevel(level=logging.INFO)
+    file_handler.addFilter(
+        filter=TraceRecordFilter(level=logging.WARNING, traces=("span", "run_summary"))
+    )
     return file_handler
 
 
@@ -102,25 +248,71 @@ def setup_logger(name: str | None = None, level: int = logging.INFO) -> None:
     level : int, optional
         Log level for the logger, by default logging.INFO (20)
 
-    - Log level: **INFO** for console, **WARNING** for file
+    - Log level: **INFO** for console, **WARNING** for file (and the tracing spans & run summaries)
     - Log format: **'%(levelname)s %(message)s'** (console), **formatted with JSON** (file)
     - Log date format: **'%Y-%m-%d %H:%M:%S'**
-    - Log file name: **log_01.log**, **log_02.log**, ...
+    - Log file name: **log_01.log**, **log_02.log**, ... rotated by size as **log_01.log.1**, ...
     - Log file path: **/path/to/logs/2025/log_01.log**
+    - The records are queued and written by a background thread, the queue is flushed at exit.
+    - The records logged with a sample_key are rate limited before they are queued.
+    - Setting up the logger again replaces the previous queue & listener after their records are written.
     """
 
+    global _queue_listener, _queue_handler
+
+    # a listener left running would write the records of its queue twice and keep its files open
+    stop_logger()
+
     # create logger
     logger: logging.Logger = logging.getLogger(name=name)
     # set minimum log level
     logger.setLevel(level=level)
     # add console and file handlers based on the environment
+    handlers: list[logging.Handler] = []
     if IS_PROD:
-        logger.addHandler(hdlr=setup_file_handler())
+        handlers.append(setup_file_handler())
+
+    handlers.append(setup_console_handler())
 
-    logger.addHandler(hdlr=setup_console_handler())
+    # the handlers are called by the listener's thread, the logging threads only put the records to the queue
+    log_queue: SimpleQueue = SimpleQueue()
+    queue_handler: QueueHandler = QueueHandler(queue=log_queue)
+    queue_handler.addFilter(
+        filter=SamplingFilter(
+            burst=LOG_CONFIG["sample_burst"], interval=LOG_CONFIG["sample_interval"]
+        )
+    )
+    queue_handler.addFilter(filter=RunIdFilter())
+    logger.addHandler(hdlr=queue_handler)
+    _queue_handler = (logger, queue_handler)
 
+    _queue_listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _queue_listener.start()
+    # registered once, however many times the logger is set up
+    atexit_unregister(stop_logger)
+    atexit_register(stop_logger)
 
-def log_message(mode: str, msg: str, **log_kwargs) -> None:
+
+def stop_logger() -> None:
+    """Stop the queue listener after the queued records are written, and remove its queue handler & close its handlers."""
+
+    global _queue_listener, _queue_handler
+
+    if _queue_handler is not None:
+        logger, queue_handler = _queue_handler
+        logger.removeHandler(hdlr=queue_handler)
+        _queue_handler = None
+
+    if _queue_listener is not None:
+        _queue_listener.stop()
+        for handler in _queue_listener.handlers:
+            handler.close()
+        _queue_listener = None
+
+
+def log_message(
+    mode: str, msg: str, sample_key: str | None = None, **log_kwargs
+) -> None:
     """Log a message with the given mode & message.
 
     Parameters
@@ -129,10 +321,15 @@ def log_message(mode: str, msg: str, **log_kwargs) -> None:
         Log level mode (notset, debug, info, warning, error, critical)
     msg : str
         Log message to log.
+    sample_key : str | None, optional
+        Key of a repetitive message (e.g. per event) to rate limit it, errors are never rate limited, by default None.
     **log_kwargs
         Additional log keyword arguments to pass to the logger (e.g. extra, stack_info, exc_info etc.)
     """
 
+    if sample_key:
+        log_kwargs["extra"] = {**log_kwargs.get("extra", {}), "sample_key": sample_key}
+
     levels: dict[str, int] = {
         "info": logging.INFO,
         "warning": logging.WARNING,
@@ -0,0 +1,235 @@
+from os import makedirs as os_makedirs
+from pathlib import Path
+from time import time
+from typing import Iterator
+from weakref import WeakSet
+
+from prometheus_client import (
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    start_http_server,
+    write_to_textfile,
+)
+from prometheus_client.core import GaugeMetricFamily, Metric
+from prometheus_client.registry import Collector
+from requests import Response, Session
+
+
+# the app's own registry, so the textfile of a one-shot run has only the app metrics
+METRICS_REGISTRY: CollectorRegistry = CollectorRegistry()
+
+QRADAR_SEARCH_POLL_SECONDS: Histogram = Histogram(
+    name="wse_qradar_search_poll_seconds",
+    documentation="Seconds waited for the ariel searches to complete",
+    labelnames=["qradar"],
+    buckets=(1, 2, 5, 10, 30, 60, 120, 300, 600, 1800),
+    registry=METRICS_REGISTRY,
+)
+
+QRADAR_SEARCH_FETCH_SECONDS: Histogram = Histogram(
+    name="wse_qradar_search_fetch_seconds",
+    documentation="Seconds to download the ariel search results",
+    labelnames=["qradar"],
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+    registry=METRICS_REGISTRY,
+)
+
+QRADAR_SEARCH_ROWS: Counter = Counter(
+    name="wse_qradar_search_rows",
+    documentation="Rows downloaded from the ariel search results",
+    labelnames=["qradar"],
+    registry=METRICS_REGISTRY,
+)
+
+REDMINE_REQUEST_SECONDS: Histogram = Histogram(
+    name="wse_redmine_request_seconds",
+    documentation="Seconds until the redmine responses are received",
+    labelnames=["method", "status"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+    registry=METRICS_REGISTRY,
+)
+
+MATCHED_ROWS: Counter = Counter(
+    name="wse_matched_rows",
+    documentation="Searched rows matched per windows security event rule",
+    labelnames=["event_id"],
+    registry=METRICS_REGISTRY,
+)
+
+EVENT_SPILLS: Counter = Counter(
+    name="wse_event_spills",
+    documentation="Spills of a rule's matched events to disk when they exceed the in-memory budget",
+    labelnames=["event_id"],
+    registry=METRICS_REGISTRY,
+)
+
+SPILLED_EVENTS: Counter = Counter(
+    name="wse_spilled_events",
+    documentation="Matched event texts spilled to disk per windows security event rule",
+    labelnames=["event_id"],
+    registry=METRICS_REGISTRY,
+)
+
+UPSERTS: Counter = Counter(
+    name="wse_upserts",
+    documentation="Redmine upserts of the matched events by result (created, updated, skipped, failed)",
+    labelnames=["result"],
+    registry=METRICS_REGISTRY,
+)
+
+HTTP_CLIENT_RETRIES: Counter = Counter(
+    name="wse_http_client_retries",
+    documentation="Requests of the HttpClient retried on connection errors or retryable status codes",
+    labelnames=["host"],
+    registry=METRICS_REGISTRY,
+)
+
+CIRCUIT_BREAKER_STATE: Gauge = Gauge(
+    name="wse_circuit_breaker_state",
+    documentation="State of the service circuit breakers (0 closed, 1 half open, 2 open)",
+    labelnames=["name"],
+    registry=METRICS_REGISTRY,
+)
+
+RATE_CONTROLLER_LIMIT: Gauge = Gauge(
+    name="wse_rate_controller_limit",
+    documentation="Current concurrency limit of the adaptive rate controllers (e.g. redmine writes)",
+    labelnames=["name"],
+    registry=METRICS_REGISTRY,
+)
+
+RATE_CONTROLLER_IN_FLIGHT: Gauge = Gauge(
+    name="wse_rate_controller_in_flight",
+    documentation="Requests in flight under the adaptive rate controllers",
+    labelnames=["name"],
+    registry=METRICS_REGISTRY,
+)
+
+RUN_DURATION_SECONDS: Histogram = Histogram(
+    name="wse_run_duration_seconds",
+    documentation="Seconds of the runs by run name & status",
+    labelnames=["run", "status"],
+    buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600),
+    registry=METRICS_REGISTRY,
+)
+
+LAST_RUN_TIMESTAMP: Gauge = Gauge(
+    name="wse_last_run_timestamp_seconds",
+    documentation="Unix time of the last finished run by run name & status",
+    labelnames=["run", "status"],
+    registry=METRICS_REGISTRY,
+)
+
+
+class HttpPoolCollector(Collector):
+    """Collect the connection pool usage of the registered requests sessions on each scrape.
+
+    Attributes
+    ----------
+    sessions : WeakSet[Session]
+        Sessions of the HttpClient & redmine instances, they are dropped when the instances are removed.
+
+    Methods
+    -------
+    - register(session: Session) -> None
+    - collect() -> Iterator[Metric]
+    """
+
+    def __init__(self) -> None:
+        self.sessions: WeakSet[Session] = WeakSet()
+
+    def register(self, session: Session) -> None:
+        self.sessions.add(session)
+
+    def collect(self) -> Iterator[Metric]:
+        pool_size: GaugeMetricFamily = GaugeMetricFamily(
+            name="wse_http_client_pool_size",
+            documentation="Maximum number of kept connections of the connection pools",
+            labels=["host"],
+        )
+        in_use_connections: GaugeMetricFamily = GaugeMetricFamily(
+            name="wse_http_client_pool_in_use_connections",
+            documentation="Connections of the connection pools in use by a request",
+            labels=["host"],
+        )
+        opened_connections: GaugeMetricFamily = GaugeMetricFamily(
+            name="wse_http_client_pool_opened_connections",
+            documentation="Connections opened by the connection pools since they are created",
+            labels=["host"],
+        )
+        pool_requests: GaugeMetricFamily = GaugeMetricFamily(
+            name="wse_http_client_pool_requests",
+            documentation="Requests made through the connection pools since they are created",
+            labels=["host"],
+        )
+
+        for session in list(self.sessions):
+            for adapter in session.adapters.values():
+                pools = adapter.poolmanager.pools
+                for pool_key in pools.keys():
+                    pool = pools.get(pool_key)
+                    if pool is None or pool.pool is None:
+                        continue
+
+                    host: list[str] = [f"{pool.host}:{pool.port}" if pool.port else pool.host]
+                    pool_size.add_metric(labels=host, value=pool.pool.maxsize)
+                    # the pool queue holds the idle connections & the free slots, the rest is in use
+                    in_use_connections.add_metric(
+                        labels=host, value=pool.pool.maxsize - pool.pool.qsize()
+                    )
+                    opened_connections.add_metric(labels=host, value=pool.num_connections)
+                    pool_requests.add_metric(labels=host, value=pool.num_requests)
+
+        yield from (pool_size, in_use_connections, opened_connections, pool_requests)
+
+
+HTTP_POOL_COLLECTOR: HttpPoolCollector = HttpPoolCollector()
+METRICS_REGISTRY.register(HTTP_POOL_COLLECTOR)
+
+
+def observe_redmine_response(response: Response, *_, **__) -> None:
+    """Response hook of the redmine session to observe the request latency."""
+
+    REDMINE_REQUEST_SECONDS.labels(
+        method=response.request.method, status=str(response.status_code)
+    ).observe(response.elapsed.total_seconds())
+
+
+def observe_run(run: str, status: str, duration: float) -> None:
+    """Observe the duration & finish time of a run.
+
+    Parameters
+    ----------
+    run : str
+        Run name, e.g. **main**, **backfill**
+    status : str
+        Run status, **completed** or **failed**
+    duration : float
+        Run duration in seconds.
+    """
+
+    RUN_DURATION_SECONDS.labels(run=run, status=status).observe(duration)
+    LAST_RUN_TIMESTAMP.labels(run=run, status=status).set(time())
+
+
+def start_metrics_server(port: int, address: str = "0.0.0.0") -> None:
+    """Serve the metrics on http://<address>:<port>/metrics from a daemon thread, for the long-running mode."""
+
+    start_http_server(port=port, addr=address, registry=METRICS_REGISTRY)
+
+
+def write_metrics_textfile(file_path: Path) -> None:
+    """Write the metrics in the text format for the node exporter's textfile collector, for the one-shot runs.
+
+    Parameters
+    ----------
+    file_path : Path
+        Metrics file, it must have the .prom extension to be collected, e.g. **/var/lib/node_exporter/wse.prom**
+
+    - The file is written to a temporary file first and renamed, so the node exporter never reads a partial file.
+    """
+
+    os_makedirs(name=file_path.parent, exist_ok=True)
+    write_to_textfile(path=str(file_path), registry=METRICS_REGISTRY)
@@ -0,0 +1,168 @@
+from contextlib import contextmanager
+from cProfile import Profile
+from datetime import datetime
+from io import StringIO
+from os import makedirs as os_makedirs
+from pathlib import Path
+from threading import Lock
+from typing import Iterator
+import pstats
+import sys
+import threading
+import tracemalloc
+
+try:
+    from pyinstrument import Profiler
+except ImportError:  # pyinstrument is optional, the runs are profiled with cProfile without it
+    Profiler = None
+
+from .constants import LOG_FOLDER_PATH
+from .logger import log_message
+from .tracing import span_end_listeners
+
+
+class PhaseAllocations:
+    """Memory allocated by each traced phase, read from tracemalloc when its spans are finished.
+
+    The traced memory is read at each span end instead of a snapshot, the snapshots of a large process take
+    seconds and would be measured as the phase's time. The spans of the concurrent threads (searches, redmine
+    warm up) finish in any order, so a phase may include the other threads' allocations since the previous span end.
+
+    Attributes
+    ----------
+    phases : dict[str, dict[str, int]]
+        Number of spans, net allocated bytes and the peak traced bytes of each phase.
+
+    Methods
+    -------
+    - on_span_end(name: str) -> None
+    - format_report() -> str
+    """
+
+    def __init__(self) -> None:
+        self.phases: dict[str, dict[str, int]] = {}
+        self._current_size: int = tracemalloc.get_traced_memory()[0]
+        self._lock: Lock = Lock()
+
+    def on_span_end(self, name: str) -> None:
+        with self._lock:
+            current_size, peak_size = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+
+            phase: dict[str, int] = self.phases.setdefault(
+                name, {"spans": 0, "net_bytes": 0, "peak_bytes": 0}
+            )
+            phase["spans"] += 1
+            phase["net_bytes"] += current_size - self._current_size
+            phase["peak_bytes"] = max(phase["peak_bytes"], peak_size)
+            self._current_size = current_size
+
+    def format_report(self) -> str:
+        """Format the phases in KiB, in the order they are finished first."""
+
+        return "\n".join(
+            f"{name:<24} spans {phase['spans']:>6}  net {phase['net_bytes'] / 1024:>12.1f} KiB  peak {phase['peak_bytes'] / 1024:>12.1f} KiB"
+            for name, phase in self.phases.items()
+        )
+
+
+def take_snapshot() -> tracemalloc.Snapshot:
+    """Take a tracemalloc snapshot without the allocations of tracemalloc & the profiler."""
+
+    return tracemalloc.take_snapshot().filter_traces(
+        (
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        )
+    )
+
+
+@contextmanager
+def profile_run(name: str = "main", top_count: int = 30) -> Iterator[Path]:
+    """Profile the CPU time and the memory allocations of a run, the reports are written when it is finished.
+
+    - CPU: cProfile of all the run's threads, or the pyinstrument sampling profiler of the calling thread when it is installed.
+    - Memory: tracemalloc allocations of each traced phase (spans) and the source lines allocated the most
+      of the memory kept at the end of the run.
+
+    Parameters
+    ----------
+    name : str, optional
+        Run name in the report file names, by default "main".
+    top_count : int, optional
+        Number of the functions & source lines in the reports, by default 30.
+
+    - Report file paths: **/path/to/logs/profiles/20250101_120000_main.prof** (cProfile stats, e.g. for snakeviz),
+      **..._cpu.txt** (or **..._cpu.html** with pyinstrument) and **..._memory.txt**
+    """
+
+    profile_folder_path: Path = LOG_FOLDER_PATH / "profiles"
+    os_makedirs(name=profile_folder_path, exist_ok=True)
+    file_prefix: Path = (
+        profile_folder_path / f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{name}"
+    )
+
+    tracemalloc.start()
+    started_snapshot: tracemalloc.Snapshot = take_snapshot()
+    phase_allocations: PhaseAllocations = PhaseAllocations()
+    span_end_listeners.append(phase_allocations.on_span_end)
+
+    profiles: list[Profile] = []
+    sampling_profiler = Profiler() if Profiler else None
+
+    def start_thread_profile(*_) -> None:
+        # called once in each new thread, the thread's own profile is enabled instead of this hook
+        sys.setprofile(None)
+        profile: Profile = Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # cProfile is interpreter-wide since python 3.12, the main profile already covers the thread
+            return
+        profiles.append(profile)
+
+    if sampling_profiler:
+        sampling_profiler.start()
+    else:
+        profile: Profile = Profile()
+        profile.enable()
+        profiles.append(profile)
+        threading.setprofile(start_thread_profile)
+
+    log_message(mode="info", msg=f"profiling the run, reports are written to ⊱ {file_prefix}_* ⊰")
+    try:
+        yield file_prefix
+    finally:
+        threading.setprofile(None)
+        for profile in profiles:
+            profile.disable()
+        span_end_listeners.remove(phase_allocations.on_span_end)
+        top_allocations: list[tracemalloc.StatisticDiff] = take_snapshot().compare_to(
+            started_snapshot, key_type="lineno"
+        )[:top_count]
+        current_size, peak_size = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        if sampling_profiler:
+            sampling_profiler.stop()
+            with open(file=f"{file_prefix}_cpu.html", mode="w", encoding="utf-8") as f:
+                f.write(sampling_profiler.output_html())
+        else:
+            stream: StringIO = StringIO()
+            stats: pstats.Stats = pstats.Stats(*profiles, stream=stream)
+            stats.dump_stats(filename=f"{file_prefix}.prof")
+            stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(top_count)
+            with open(file=f"{file_prefix}_cpu.txt", mode="w", encoding="utf-8") as f:
+                f.write(stream.getvalue())
+
+        with open(file=f"{file_prefix}_memory.txt", mode="w", encoding="utf-8") as f:
+            f.write(
+                f"current {current_size / 1024:.1f} KiB, peak {peak_size / 1024:.1f} KiB\n\n"
+            )
+            f.write("allocations per phase\n\n")
+            f.write(phase_allocations.format_report())
+            f.write("\n\ntop allocations kept at the end of the run\n\n")
+            f.write("\n".join(str(statistic) for statistic in top_allocations))
+            f.write("\n")
+
+        log_message(mode="info", msg=f"profile reports written to ⊱ {file_prefix}_* ⊰")
@@ -0,0 +1,227 @@
+from threading import Condition, Lock
+from time import monotonic
+
+from requests import Response
+
+from .constants import REDMINE_RATE_CONFIG
+from .logger import log_message
+from .metrics import RATE_CONTROLLER_IN_FLIGHT, RATE_CONTROLLER_LIMIT
+
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD (additive increase, multiplicative decrease) limit of the concurrent requests to a throttled service.
+
+    The responses are observed in windows of **window_size** requests. When a window's p95 latency and error rate
+    are under the targets and the limit was reached in the window, the limit is increased by one. On a 429 or 5xx
+    response, a latency spike (twice the p95 target) or an unhealthy window, the limit is halved, at most once in
+    **target_p95_seconds**, so the responses of the requests sent before the decrease don't halve it again.
+    A **Retry-After** of a 429 response pauses the new requests as well.
+
+    Attributes
+    ----------
+    name : str
+        Name of the limited service, e.g. **redmine:redmine.example.com**
+    limit : float
+        Current limit of the concurrent requests, between **min_limit** and **max_limit**.
+    min_limit : int
+        Lower bound of the limit.
+    max_limit : int
+        Upper bound of the limit.
+    target_p95_seconds : float
+        Target of the p95 latency of a window.
+    max_error_rate : float
+        Target of the 429/5xx & failed requests ratio of a window.
+    window_size : int
+        Number of the observed requests of a window.
+    in_flight : int
+        Number of the acquired slots.
+
+    Methods
+    -------
+    - acquire(timeout: float | None = None) -> bool
+    - release() -> None
+    - observe_response(response: Response, *_, **__) -> None
+    - record_failure() -> None
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial_limit: int = REDMINE_RATE_CONFIG["initial_concurrency"],
+        min_limit: int = REDMINE_RATE_CONFIG["min_concurrency"],
+        max_limit: int = REDMINE_RATE_CONFIG["max_concurrency"],
+        target_p95_seconds: float = REDMINE_RATE_CONFIG["target_p95_seconds"],
+        max_error_rate: float = REDMINE_RATE_CONFIG["max_error_rate"],
+        window_size: int = REDMINE_RATE_CONFIG["window_size"],
+    ) -> None:
+        self.name: str = name
+        self.min_limit: int = max(min_limit, 1)
+        self.max_limit: int = max(max_limit, self.min_limit)
+        self.limit: float = float(min(max(initial_limit, self.min_limit), self.max_limit))
+        self.target_p95_seconds: float = target_p95_seconds
+        self.max_error_rate: float = max_error_rate
+        self.window_size: int = window_size
+        self.in_flight: int = 0
+
+        self._condition: Condition = Condition()
+        self._latencies: list[float] = []
+        self._error_count: int = 0
+        # the limit is increased only if the window needed it, a few sequential requests say nothing about more
+        self._max_in_flight: int = 0
+        self._decreased_at: float = 0.0
+        self._paused_until: float = 0.0
+
+        RATE_CONTROLLER_LIMIT.labels(name=name).set(int(self.limit))
+        RATE_CONTROLLER_IN_FLIGHT.labels(name=name).set(0)
+
+    def __enter__(self) -> "AdaptiveConcurrencyLimiter":
+        self.acquire()
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.release()
+
+    def acquire(self, timeout: float | None = None) -> bool:
+        """Wait for a free slot under the current limit.
+
+        Parameters
+        ----------
+        timeout : float | None, optional
+            Seconds to wait for a slot, waits until a slot is free if None. Default is None.
+
+        Returns
+        -------
+        bool
+            True if a slot is acquired, False if the timeout is passed.
+        """
+
+        deadline: float | None = monotonic() + timeout if timeout is not None else None
+        with self._condition:
+            while True:
+                now: float = monotonic()
+                if now >= self._paused_until and self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    self._max_in_flight = max(self._max_in_flight, self.in_flight)
+                    RATE_CONTROLLER_IN_FLIGHT.labels(name=self.name).set(self.in_flight)
+                    return True
+
+                if deadline is not None and now >= deadline:
+                    return False
+
+                # wake up at the end of a pause even if no slot is released
+                wait_seconds: float | None = (
+                    self._paused_until - now if now < self._paused_until else None
+                )
+                if deadline is not None:
+                    wait_seconds = min(wait_seconds or deadline - now, deadline - now)
+                self._condition.wait(timeout=wait_seconds)
+
+    def release(self) -> None:
+        with self._condition:
+            self.in_flight = max(self.in_flight - 1, 0)
+            RATE_CONTROLLER_IN_FLIGHT.labels(name=self.name).set(self.in_flight)
+            self._condition.notify()
+
+    def observe_response(self, response: Response, *_, **__) -> None:
+        """Response hook of the service's session to observe the latency & the status of each request."""
+
+        latency: float = response.elapsed.total_seconds()
+        is_throttled: bool = response.status_code == 429 or response.status_code >= 500
+        with self._condition:
+            if response.status_code == 429:
+                retry_after: str | None = response.headers.get("Retry-After")
+                if retry_after and retry_after.isdigit():
+                    # a long retry after is left to the outbox backoff, the run's drain pauses only briefly
+                    self._paused_until = max(
+                        self._paused_until, monotonic() + min(int(retry_after), 60)
+                    )
+
+            if is_throttled or latency > 2 * self.target_p95_seconds:
+                self._decrease(
+                    reason=(
+                        f"status ⊱ {response.status_code} ⊰"
+                        if is_throttled
+                        else f"latency spike ⊱ {latency:.2f} ⊰ seconds"
+                    )
+                )
+
+            self._observe(latency=latency, is_error=is_throttled)
+
+    def record_failure(self) -> None:
+        """Observe a failed request without a response, e.g. a connection error or a timeout."""
+
+        with self._condition:
+            self._decrease(reason="request failure")
+            self._observe(latency=self.target_p95_seconds, is_error=True)
+
+    def _observe(self, latency: float, is_error: bool) -> None:
+        """Add a request to the window and adjust the limit when the window is full, the caller must hold the lock."""
+
+        self._latencies.append(latency)
+        self._error_count += is_error
+        if len(self._latencies) < self.window_size:
+            return
+
+        latencies: list[float] = sorted(self._latencies)
+        p95_latency: float = latencies[int(0.95 * (len(latencies) - 1))]
+        error_rate: float = self._error_count / len(latencies)
+        is_limited: bool = self._max_in_flight >= int(self.limit)
+        self._latencies, self._error_count, self._max_in_flight = [], 0, self.in_flight
+
+        if p95_latency > self.target_p95_seconds or error_rate > self.max_error_rate:
+            self._decrease(
+                reason=f"p95 latency ⊱ {p95_latency:.2f} ⊰ seconds, error rate ⊱ {error_rate:.0%} ⊰"
+            )
+        elif is_limited and self.limit < self.max_limit:
+            self._set_limit(limit=self.limit + 1)
+            log_message(
+                mode="info",
+                msg=f"concurrency limit of ⊱ {self.name} ⊰ is increased to ⊱ {int(self.limit)} ⊰ (p95 latency ⊱ {p95_latency:.2f} ⊰ seconds)",
+                sample_key="rate_controller_increase",
+            )
+
+    def _decrease(self, reason: str) -> None:
+        """Halve the limit, at most once in the p95 target, the caller must hold the lock."""
+
+        now: float = monotonic()
+        if now - self._decreased_at < self.target_p95_seconds:
+            return
+
+        self._decreased_at = now
+        previous_limit: int = int(self.limit)
+        self._set_limit(limit=max(self.limit / 2, self.min_limit))
+        if int(self.limit) < previous_limit:
+            log_message(
+                mode="warning",
+                msg=f"concurrency limit of ⊱ {self.name} ⊰ is decreased to ⊱ {int(self.limit)} ⊰ on {reason}",
+                sample_key="rate_controller_decrease",
+            )
+
+    def _set_limit(self, limit: float) -> None:
+        self.limit = min(max(limit, self.min_limit), self.max_limit)
+        RATE_CONTROLLER_LIMIT.labels(name=self.name).set(int(self.limit))
+        self._condition.notify_all()
+
+
+_rate_controllers: dict[str, AdaptiveConcurrencyLimiter] = {}
+_rate_controllers_lock: Lock = Lock()
+
+
+def get_rate_controller(name: str) -> AdaptiveConcurrencyLimiter:
+    """Get the rate controller of a service, the learned limit is kept for the next runs of the process (daemon mode).
+
+    Parameters
+    ----------
+    name : str
+        Name of the limited service, e.g. **redmine:redmine.example.com**
+
+    Returns
+    -------
+    AdaptiveConcurrencyLimiter
+        Rate controller of the service.
+    """
+
+    with _rate_controllers_lock:
+        if name not in _rate_controllers:
+            _rate_controllers[name] = AdaptiveConcurrencyLimiter(name=name)
+        return _rate_controllers[name]
@@ -0,0 +1,152 @@
+from math import ceil
+from threading import Lock
+from time import time
+from typing import Any
+import sqlite3
+
+from .constants import RULE_PRIORITY_CADENCE
+from .state import connect_state_db
+
+
+def get_rule_cadences(
+    windows_security_events: list[dict[str, Any]],
+    default_minutes: int,
+    priority_cadences: dict[int, int] = RULE_PRIORITY_CADENCE,
+) -> dict[str, int]:
+    """Get the search cadence of each event id, the shortest cadence of its rules.
+
+    A rule's cadence is its **query_interval_minutes** field, or the cadence of its **redmine_issue_priority_id**
+    in RULE_PRIORITY_CADENCE, or the default minutes.
+
+    Parameters
+    ----------
+    windows_security_events : list[dict[str, Any]]
+        The windows security event rules.
+    default_minutes : int
+        Cadence of the rules without a cadence.
+    priority_cadences : dict[int, int], optional
+        Cadences in minutes by the redmine issue priority id. Default is RULE_PRIORITY_CADENCE.
+
+    Returns
+    -------
+    dict[str, int]
+        Cadences in minutes by the event id, empty if none of the rules has a cadence (all run at every run).
+    """
+
+    if not priority_cadences and not any(
+        wse.get("query_interval_minutes") for wse in windows_security_events
+    ):
+        return {}
+
+    cadences: dict[str, int] = {}
+    for wse in windows_security_events:
+        cadence: int = max(
+            int(
+                wse.get("query_interval_minutes")
+                or priority_cadences.get(int(wse.get("redmine_issue_priority_id") or 0))
+                or default_minutes
+            ),
+            1,
+        )
+        cadences[wse["event_id"]] = min(cadence, cadences.get(wse["event_id"], cadence))
+    return cadences
+
+
+class RuleSchedule:
+    """Last search times of the event ids with their cadences, kept in the state folder.
+
+    Each run searches only the event ids which are due, all together in one AQL search. The search window covers
+    the longest time since a due event id was last searched, so no rule misses the rows between its searches.
+
+    Attributes
+    ----------
+    cadences : dict[str, int]
+        Cadences in minutes by the event id.
+    connection : sqlite3.Connection
+        Connection to the rule schedule database.
+
+    Methods
+    -------
+    - get_due_event_ids(now: float | None = None) -> set[str]
+    - get_window_minutes(event_ids: set[str], now: float | None = None) -> int
+    - mark_searched(event_ids: set[str], searched_at: float) -> None
+    - get_seconds_until_due(now: float | None = None) -> float
+    """
+
+    # a run started a little before the cadence (cron & sleep jitter) doesn't skip the rule until the next run
+    DUE_GRACE_SECONDS: int = 30
+    # a window is at most 1 day, as the empty searches' query interval
+    MAX_WINDOW_MINUTES: int = 1440
+
+    def __init__(self, cadences: dict[str, int], file_name: str = "rule_schedule.sqlite3") -> None:
+        self.cadences: dict[str, int] = cadences
+
+        self._lock: Lock = Lock()
+        self.connection: sqlite3.Connection = connect_state_db(file_name=file_name)
+        with self.connection:
+            self.connection.execute(
+                """
+                create table if not exists rule_schedule (
+                    event_id text primary key,
+                    searched_at real not null
+                )
+                """
+            )
+
+    def get_due_event_ids(self, now: float | None = None) -> set[str]:
+        """Get the event ids whose cadence is passed since they were last searched, the never searched ones are due."""
+
+        now = now or time()
+        searched_ats: dict[str, float] = self._get_searched_ats()
+        return {
+            event_id
+            for event_id, cadence in self.cadences.items()
+            if now - searched_ats.get(event_id, 0) >= cadence * 60 - self.DUE_GRACE_SECONDS
+        }
+
+    def get_window_minutes(self, event_ids: set[str], now: float | None = None) -> int:
+        """Get the minutes to search for the event ids, since the earliest of them was last searched.
+
+        The never searched event ids are searched for their cadence.
+        """
+
+        now = now or time()
+        searched_ats: dict[str, float] = self._get_searched_ats()
+        window_seconds: float = max(
+            (
+                now - searched_ats[event_id]
+                if event_id in searched_ats
+                else self.cadences.get(event_id, 0) * 60
+            )
+            for event_id in event_ids
+        )
+        return min(max(ceil(window_seconds / 60), 1), self.MAX_WINDOW_MINUTES)
+
+    def mark_searched(self, event_ids: set[str], searched_at: float) -> None:
+        """Keep the time the event ids' search is created, the next window starts from it."""
+
+        with self._lock, self.connection:
+            self.connection.executemany(
+                "insert or replace into rule_schedule (event_id, searched_at) values (?, ?)",
+                ((event_id, searched_at) for event_id in event_ids),
+            )
+
+    def get_seconds_until_due(self, now: float | None = None) -> float:
+        """Get the seconds until the next event id is due, 0 if one is already due."""
+
+        now = now or time()
+        searched_ats: dict[str, float] = self._get_searched_ats()
+        return max(
+            min(
+                searched_ats.get(event_id, 0) + cadence * 60 - self.DUE_GRACE_SECONDS - now
+                for event_id, cadence in self.cadences.items()
+            ),
+            0,
+        )
+
+    def _get_searched_ats(self) -> dict[str, float]:
+        with self._lock:
+            return {
+                row["event_id"]: row["searched_at"]
+                for row in self.connection.execute("select event_id, searched_at from rule_schedule")
+            }
@@ -0,0 +1,160 @@
+from statistics import median
+from threading import Lock
+from time import time
+import sqlite3
+
+from .state import connect_state_db
+
+
+class SearchStats:
+    """Observed volume & latency of the completed searches of each qradar target, kept in the state folder.
+
+    Each search records its window, its number of rows (**record_count**), the console's execution time
+    (**query_execution_time**) and the seconds to fetch its results. The recent searches size the next window
+    toward a target search latency, and the result pages toward a target fetch latency per request.
+
+    Attributes
+    ----------
+    history_size : int
+        Number of the recent searches kept per target.
+    connection : sqlite3.Connection
+        Connection to the search stats database.
+
+    Methods
+    -------
+    - record(qradar_url: str, window_minutes: float, record_count: int, query_execution_ms: int, fetch_seconds: float) -> None
+    - get_window_minutes(qradar_url: str, current_minutes: int, target_seconds: float, min_minutes: int, max_minutes: int) -> int | None
+    - get_page_size(qradar_url: str, target_seconds: float, min_size: int = 100, max_size: int = 50000) -> int | None
+    """
+
+    # a window grows or shrinks at most 2 times per run, one slow or empty search doesn't swing it to a limit
+    MAX_WINDOW_FACTOR: float = 2
+
+    def __init__(self, file_name: str = "search_stats.sqlite3", history_size: int = 20) -> None:
+        self.history_size: int = history_size
+
+        self._lock: Lock = Lock()
+        self.connection: sqlite3.Connection = connect_state_db(file_name=file_name)
+        with self.connection:
+            self.connection.execute(
+                """
+                create table if not exists search_stats (
+                    qradar_url text not null,
+                    searched_at real not null,
+                    window_minutes real not null,
+                    record_count integer not null,
+                    query_execution_ms integer not null,
+                    fetch_seconds real not null
+                )
+                """
+            )
+            self.connection.execute(
+                "create index if not exists search_stats_target on search_stats (qradar_url, searched_at)"
+            )
+
+    def record(
+        self,
+        qradar_url: str,
+        window_minutes: float,
+        record_count: int,
+        query_execution_ms: int,
+        fetch_seconds: float,
+    ) -> None:
+        """Record a completed search of the target, only the target's recent searches are kept.
+
+        Parameters
+        ----------
+        qradar_url : str
+            URL of the searched qradar target.
+        window_minutes : float
+            Minutes searched by the query's time clause.
+        record_count : int
+            Number of the searched rows.
+        query_execution_ms : int
+            Milliseconds the console executed the search.
+        fetch_seconds : float
+            Seconds to fetch the search results.
+        """
+
+        with self._lock, self.connection:
+            self.connection.execute(
+                "insert into search_stats (qradar_url, searched_at, window_minutes, record_count, query_execution_ms, fetch_seconds) values (?, ?, ?, ?, ?, ?)",
+                (qradar_url, time(), window_minutes, record_count, query_execution_ms, fetch_seconds),
+            )
+            self.connection.execute(
+                "delete from search_stats where qradar_url = ? and rowid not in (select rowid from search_stats where qradar_url = ? order by searched_at desc limit ?)",
+                (qradar_url, qradar_url, self.history_size),
+            )
+
+    def get_window_minutes(
+        self,
+        qradar_url: str,
+        current_minutes: int,
+        target_seconds: float,
+        min_minutes: int,
+        max_minutes: int,
+    ) -> int | None:
+        """Get the window of the target's next search to complete & fetch it in about the target seconds.
+
+        The seconds per window minute is the median of the recent searches (execution & fetch), the next window
+        is the target seconds over it, limited to MAX_WINDOW_FACTOR times the current window and the min/max minutes.
+
+        Returns
+        -------
+        int | None
+            Minutes of the next window, None if the target has no recorded search.
+        """
+
+        rows: list[sqlite3.Row] = self._get_recent(qradar_url=qradar_url)
+        seconds_per_minute: list[float] = [
+            (row["query_execution_ms"] / 1000 + row["fetch_seconds"]) / row["window_minutes"]
+            for row in rows
+            if row["window_minutes"] > 0
+        ]
+        if not seconds_per_minute:
+            return None
+
+        cost: float = median(seconds_per_minute)
+        window_minutes: float = target_seconds / cost if cost > 0 else max_minutes
+        window_minutes = min(
+            max(window_minutes, current_minutes / self.MAX_WINDOW_FACTOR),
+            current_minutes * self.MAX_WINDOW_FACTOR,
+        )
+        return int(min(max(round(window_minutes), min_minutes), max_minutes))
+
+    def get_page_size(
+        self,
+        qradar_url: str,
+        target_seconds: float,
+        min_size: int = 100,
+        max_size: int = 50000,
+    ) -> int | None:
+        """Get the number of results per request to fetch a page in about the target seconds.
+
+        The page size is the target's recent fetch throughput (rows per second) times the target seconds.
+
+        Returns
+        -------
+        int | None
+            Results per request, None if the target has no recorded fetch of rows.
+        """
+
+        rows: list[sqlite3.Row] = [
+            row
+            for row in self._get_recent(qradar_url=qradar_url)
+            if row["record_count"] > 0 and row["fetch_seconds"] > 0
+        ]
+        if not rows:
+            return None
+
+        rows_per_second: float = sum(row["record_count"] for row in rows) / sum(
+            row["fetch_seconds"] for row in rows
+        )
+        return int(min(max(rows_per_second * target_seconds, min_size), max_size))
+
+    def _get_recent(self, qradar_url: str) -> list[sqlite3.Row]:
+        with self._lock:
+            return self.connection.execute(
+                "select window_minutes, record_count, query_execution_ms, fetch_seconds from search_stats where qradar_url = ? order by searched_at desc limit ?",
+                (qradar_url, self.history_size),
+            ).fetchall()
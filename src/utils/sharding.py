@@ -0,0 +1,83 @@
+from bisect import bisect
+from hashlib import md5
+from typing import Any
+
+
+class ShardRing:
+    """Consistent hashing ring to partition the windows security events between the worker shards.
+
+    Each shard is placed on the ring with virtual nodes, so changing the shard count moves only a small part
+    of the event ids to other shards.
+
+    Attributes
+    ----------
+    shard_count : int
+        Number of shards on the ring.
+    virtual_nodes : int
+        Number of points of each shard on the ring.
+
+    Methods
+    -------
+    - get_shard_index(key: str) -> int
+    - filter_owned_events(windows_security_events: list[dict[str, Any]], shard_index: int) -> list[dict[str, Any]]
+    """
+
+    def __init__(self, shard_count: int, virtual_nodes: int = 64) -> None:
+        if shard_count < 1:
+            raise ValueError(f"shard count must be at least 1, got {shard_count}")
+
+        self.shard_count: int = shard_count
+        self.virtual_nodes: int = virtual_nodes
+
+        ring: list[tuple[int, int]] = sorted(
+            (self._hash(key=f"shard-{shard_index}-{node}"), shard_index)
+            for shard_index in range(shard_count)
+            for node in range(virtual_nodes)
+        )
+        self._points: list[int] = [point for point, _ in ring]
+        self._shard_indexes: list[int] = [shard_index for _, shard_index in ring]
+
+    def get_shard_index(self, key: str) -> int:
+        """Get the index of the shard which owns the given key.
+
+        Parameters
+        ----------
+        key : str
+            Key to locate on the ring (e.g. event id).
+
+        Returns
+        -------
+        int
+            Owner shard index, between 0 and shard_count - 1.
+        """
+
+        position: int = bisect(self._points, self._hash(key=key)) % len(self._points)
+        return self._shard_indexes[position]
+
+    def filter_owned_events(
+        self, windows_security_events: list[dict[str, Any]], shard_index: int
+    ) -> list[dict[str, Any]]:
+        """Filter the windows security events owned by the given shard by their event ids.
+
+        Parameters
+        ----------
+        windows_security_events : list[dict[str, Any]]
+            All windows security events.
+        shard_index : int
+            Index of the shard.
+
+        Returns
+        -------
+        list[dict[str, Any]]
+            Windows security events whose event ids are owned by the shard.
+        """
+
+        return [
+            wse
+            for wse in windows_security_events
+            if self.get_shard_index(key=wse["event_id"]) == shard_index
+        ]
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(md5(key.encode("utf-8")).digest()[:8], "big")
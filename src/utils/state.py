@@ -0,0 +1,65 @@
+from contextlib import contextmanager
+from os import makedirs as os_makedirs
+from pathlib import Path
+from typing import Iterator
+import sqlite3
+
+from .constants import STATE_FOLDER_PATH
+
+
+_state_folder_path: Path = STATE_FOLDER_PATH
+
+
+def get_state_folder_path() -> Path:
+    """Get the folder of the local state (outbox, searches, locks, checkpoints, etc.)."""
+
+    return _state_folder_path
+
+
+@contextmanager
+def use_state_folder(folder_path: Path) -> Iterator[Path]:
+    """Use another state folder while in the context, e.g. to keep the load tests away from the real state.
+
+    Parameters
+    ----------
+    folder_path : Path
+        State folder to use.
+    """
+
+    global _state_folder_path
+
+    previous_folder_path: Path = _state_folder_path
+    _state_folder_path = folder_path
+    try:
+        yield folder_path
+    finally:
+        _state_folder_path = previous_folder_path
+
+
+def connect_state_db(file_name: str) -> sqlite3.Connection:
+    """Open (or create) a SQLite database in the state folder with WAL journaling.
+
+    Parameters
+    ----------
+    file_name : str
+        Database file name inside the state folder (e.g. "outbox.sqlite3").
+
+    Returns
+    -------
+    sqlite3.Connection
+        Connection with autocommit disabled, WAL journal mode and rows returned as sqlite3.Row.
+
+    - State folder path: **/path/to/state/**
+    - The connection is not bound to the creating thread, callers must serialize writes themselves.
+    """
+
+    state_folder_path: Path = get_state_folder_path()
+    os_makedirs(name=state_folder_path, exist_ok=True)
+
+    connection: sqlite3.Connection = sqlite3.connect(
+        database=state_folder_path / file_name, timeout=30, check_same_thread=False
+    )
+    connection.row_factory = sqlite3.Row
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
@@ -0,0 +1,183 @@
+from contextlib import contextmanager
+from threading import Lock, local
+from time import perf_counter
+from typing import Any, Callable, Iterator
+from uuid import uuid4
+import logging
+
+from .metrics import observe_run
+
+
+# span & run summary records are logged with the "trace" attribute, the handlers filter them by it
+trace_logger: logging.Logger = logging.getLogger(name="trace")
+
+
+class RunTrace:
+    """Spans & counters of a run, summarized in the run summary record when the run is finished.
+
+    Attributes
+    ----------
+    run_id : str
+        Unique id of the run, added to each span & log record of the run.
+    name : str
+        Run name, e.g. **main**, **backfill**
+    phases : dict[str, dict[str, int | float]]
+        Number of spans, total duration and summed numeric fields (rows, bytes, requests, etc.) per span name.
+    counts : dict[str, int]
+        Run totals of the counters (requests, bytes, errors) added while the run is active.
+
+    Methods
+    -------
+    - add_span(name: str, duration_ms: float, fields: dict[str, Any]) -> None
+    - add_counts(**counts: int) -> None
+    """
+
+    def __init__(self, name: str) -> None:
+        self.run_id: str = uuid4().hex[:16]
+        self.name: str = name
+        self.phases: dict[str, dict[str, int | float]] = {}
+        self.counts: dict[str, int] = {}
+        self._lock: Lock = Lock()
+
+    def add_span(self, name: str, duration_ms: float, fields: dict[str, Any]) -> None:
+        with self._lock:
+            phase: dict[str, int | float] = self.phases.setdefault(
+                name, {"spans": 0, "duration_ms": 0.0}
+            )
+            phase["spans"] += 1
+            phase["duration_ms"] = round(phase["duration_ms"] + duration_ms, 3)
+            for key, value in fields.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    phase[key] = phase.get(key, 0) + value
+
+    def add_counts(self, **counts: int) -> None:
+        with self._lock:
+            for key, value in counts.items():
+                self.counts[key] = self.counts.get(key, 0) + value
+
+
+_run: RunTrace | None = None
+_spans: local = local()
+
+# called with the span name when a span is finished, e.g. the profiler takes the allocation snapshot of the phase
+span_end_listeners: list[Callable[[str], None]] = []
+
+
+def get_run_id() -> str | None:
+    """Get the id of the active run, None if no run is traced."""
+
+    return _run.run_id if _run else None
+
+
+@contextmanager
+def trace_run(name: str = "main", **fields) -> Iterator[RunTrace]:
+    """Trace a run, its spans are logged with the run id and a run summary record is logged when it is finished.
+
+    It can be used as a decorator as well, e.g. **@trace_run(name="main")**
+
+    Parameters
+    ----------
+    name : str, optional
+        Run name, by default "main".
+    **fields
+        Additional fields of the run summary record.
+    """
+
+    global _run
+
+    previous_run: RunTrace | None = _run
+    run: RunTrace = RunTrace(name=name)
+    _run = run
+    status: str = "failed"
+    started_at: float = perf_counter()
+    try:
+        yield run
+        status = "completed"
+    finally:
+        _run = previous_run
+        duration_ms: float = round((perf_counter() - started_at) * 1000, 3)
+        observe_run(run=run.name, status=status, duration=duration_ms / 1000)
+        trace_logger.info(
+            msg=f"run ⊱ {run.name} ⊰ {status} in ⊱ {duration_ms / 1000:.2f} ⊰ seconds with ⊱ {run.counts.get('requests', 0)} ⊰ requests",
+            extra={
+                "trace": "run_summary",
+                "run_id": run.run_id,
+                "run": run.name,
+                "status": status,
+                "duration_ms": duration_ms,
+                "phases": run.phases,
+                "counts": run.counts,
+                **fields,
+            },
+        )
+
+
+@contextmanager
+def trace_span(name: str, **fields) -> Iterator[dict[str, Any]]:
+    """Trace a phase of the active run, it is a no-op if no run is traced.
+
+    The yielded fields can be updated in the span (e.g. the row count), the counters added while the span is
+    active (requests, bytes, errors) are added to them and the span record is logged with its duration.
+
+    Parameters
+    ----------
+    name : str
+        Span name, e.g. **search_fetch**
+    **fields
+        Fields of the span record, e.g. **target="eu"**
+
+    Examples
+    --------
+    >>> with trace_span("search_fetch", search_id=search_id) as span:
+    ...     events = qradar.get_search_results_by_search_id(search_id=search_id)
+    ...     span["rows"] = len(events)
+    """
+
+    run: RunTrace | None = _run
+    if run is None:
+        yield fields
+        return
+
+    stack: list[tuple[str, dict[str, Any]]] = _spans.__dict__.setdefault("stack", [])
+    stack.append((name, fields))
+    started_at: float = perf_counter()
+    try:
+        yield fields
+    finally:
+        stack.pop()
+        duration_ms: float = round((perf_counter() - started_at) * 1000, 3)
+        run.add_span(name=name, duration_ms=duration_ms, fields=fields)
+        for listener in span_end_listeners:
+            listener(name)
+        trace_logger.info(
+            msg=f"span ⊱ {name} ⊰ took ⊱ {duration_ms} ⊰ ms",
+            extra={
+                "trace": "span",
+                "run_id": run.run_id,
+                "span": name,
+                "parent_span": stack[-1][0] if stack else None,
+                "duration_ms": duration_ms,
+                **fields,
+            },
+        )
+
+
+def add_trace_counts(**counts: int) -> None:
+    """Add the counters (requests, bytes, errors) to the active spans of the thread and to the run totals."""
+
+    if _run is None:
+        return
+
+    for _, fields in _spans.__dict__.get("stack", []):
+        for key, value in counts.items():
+            fields[key] = fields.get(key, 0) + value
+    _run.add_counts(**counts)
+
+
+def count_traced_response(response, *_, **__) -> None:
+    """Response hook of the requests sessions to count the requests & response bytes of the active run."""
+
+    if _run is None:
+        return
+
+    add_trace_counts(requests=1, bytes=len(response.content or b""))